@@ -0,0 +1,445 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import math
+import signal
+import argparse
+import multiprocessing
+from collections import namedtuple
+from multiprocessing.connection import wait
+from pathlib import Path
+
+from build_plan import MEMORY_BASE_MB, MEMORY_PER_CONTENT_BYTE, plan_resource
+from image_pipeline import default_cache_dir
+from metrics import collect_in_worker, merge_snapshot, metrics_enabled
+from progress import Progress, as_progress
+
+try:
+    import resource
+except ImportError:  # Windows: 작업자별 메모리 한도를 두지 않음
+    resource = None
+
+# --memory-budget 옵션 값: auto 또는 크기 (단위가 없으면 MB)
+MEMORY_SIZE_PATTERN = re.compile(r"(\d+)\s*(m|mb|g|gb)?", re.IGNORECASE)
+MEMORY_SIZE_UNITS = {"m": 1, "mb": 1, "g": 1024, "gb": 1024}
+
+# auto일 때 사용 가능한 메모리(MemAvailable) 중 빌드에 쓸 비율
+MEMORY_BUDGET_RATIO = 0.8
+
+# 지난 실행의 최대 메모리로 예상할 때 더하는 여유
+MEMORY_HISTORY_MARGIN = 1.1
+
+# 작업자의 주소 공간 한도 = 시작할 때 주소 공간 + 예상 메모리 × 이 비율
+# (RLIMIT_AS는 실제 사용량(RSS)이 아니라 예약한 주소 공간까지 세므로 여유를 크게 둠)
+MEMORY_ADDRESS_RATIO = 2.0
+
+# 책별 최대 메모리 기록 파일 (~/.cache/md_to_epub/memory/peaks.json)
+MEMORY_HISTORY_NAME = "peaks.json"
+
+# memory_mb: 예상 최대 메모리(MB), source: 예상 근거 (plan: 비용 모델, history: 지난 실행 기록)
+BatchTitle = namedtuple(
+    "BatchTitle",
+    ["resource_dir", "output_file", "memory_mb", "content_bytes", "source"],
+)
+
+# status: ok, error, oom (메모리 부족), peak_mb: 작업 프로세스가 빌드하며 늘린 최대 메모리(MB)
+BatchResult = namedtuple(
+    "BatchResult",
+    ["resource_dir", "output_file", "status", "error", "peak_mb", "retried"],
+)
+
+
+def parse_memory_size(value):
+    """
+    --memory-budget 옵션 값을 MB 단위 정수로 변환합니다. auto이면 default_memory_budget()입니다.
+    """
+    if value.strip().lower() == "auto":
+        return default_memory_budget()
+    match = MEMORY_SIZE_PATTERN.fullmatch(value.strip())
+    if not match or int(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(
+            f"메모리 예산은 auto 또는 크기(예: 6g, 4096m)여야 합니다: {value}"
+        )
+    return int(match.group(1)) * MEMORY_SIZE_UNITS[(match.group(2) or "m").lower()]
+
+
+def available_memory_mb():
+    """
+    지금 새 프로세스가 쓸 수 있는 메모리(MB)를 반환합니다. (/proc/meminfo가 없으면 전체 메모리)
+    """
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 1024**2
+
+
+def default_memory_budget():
+    return int(available_memory_mb() * MEMORY_BUDGET_RATIO)
+
+
+def default_history_file():
+    return default_cache_dir("memory") / MEMORY_HISTORY_NAME
+
+
+def _history_key(resource_dir):
+    return str(Path(resource_dir).resolve())
+
+
+def read_history(history_file):
+    """
+    책별 최대 메모리 기록을 읽습니다. 파일이 없거나 읽을 수 없으면 빈 사전을 반환합니다.
+    """
+    try:
+        with open(history_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_history(history_file, history):
+    history_file = Path(history_file)
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = history_file.with_name(f".{history_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_file, history_file)
+
+
+def estimate_title(resource_dir, output_file, history):
+    """
+    책 하나의 최대 메모리를 예상하여 BatchTitle을 만듭니다.
+    지난 실행 기록이 있으면 그 최대 메모리에 원고 크기의 변화만큼을 더하고,
+    없으면 build_plan의 비용 모델로 원고 크기에서 계산합니다.
+    리소스 디렉토리를 읽을 수 없으면 최소 메모리로 예상합니다. (오류는 빌드할 때 알림)
+    """
+    try:
+        plan = plan_resource(resource_dir)
+    except (OSError, ValueError):
+        return BatchTitle(resource_dir, output_file, MEMORY_BASE_MB, 0, "plan")
+    content_bytes = plan["content"]["bytes"]
+    record = history.get(_history_key(resource_dir))
+    if record is None:
+        return BatchTitle(
+            resource_dir,
+            output_file,
+            plan["estimate"]["memory_mb"],
+            content_bytes,
+            "plan",
+        )
+    memory_mb = (
+        record["peak_mb"]
+        + MEMORY_PER_CONTENT_BYTE * (content_bytes - record["content_bytes"]) / 1024**2
+    )
+    return BatchTitle(
+        resource_dir,
+        output_file,
+        math.ceil(max(memory_mb, MEMORY_BASE_MB) * MEMORY_HISTORY_MARGIN),
+        content_bytes,
+        "history",
+    )
+
+
+def _address_space_bytes():
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def set_memory_limit(limit_mb):
+    """
+    이 프로세스의 주소 공간(RLIMIT_AS)을 지금 크기 + limit_mb × MEMORY_ADDRESS_RATIO로 제한합니다.
+    한도를 넘는 할당은 MemoryError가 되므로 커널 OOM killer보다 먼저 멈춥니다.
+    """
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = _address_space_bytes() + int(limit_mb * MEMORY_ADDRESS_RATIO * 1024**2)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def peak_memory_mb(baseline_mb=0.0):
+    """
+    이 프로세스의 최대 메모리 사용량(RSS, MB)에서 baseline_mb를 뺀 값을 반환합니다.
+    fork한 작업 프로세스는 부모의 메모리를 물려받은 채 시작하므로, 시작할 때의 값을
+    baseline_mb로 주면 빌드하며 늘어난 만큼만 얻습니다.
+    """
+    if resource is None:
+        return None
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return round(max(peak_mb - baseline_mb, 0.0), 1)
+
+
+def _build_title(title, builder_options, limit_mb, streaming):
+    """
+    책 하나를 만듭니다. (작업 프로세스에서 실행)
+    streaming이 True이면 압축 결과 캐시 없이 항목을 바로 파일로 내보냅니다.
+    ((결과 사전, 진행 이벤트 목록)을 반환)
+    """
+    from builder import Builder
+
+    events = []
+    # fork 직후의 값 (부모에게서 물려받은 메모리)
+    baseline_mb = peak_memory_mb() or 0.0
+    set_memory_limit(limit_mb)
+    options = dict(builder_options, workers=1)
+    if streaming:
+        options["compressed_cache_bytes"] = 0
+    try:
+        with Builder(**options) as builder:
+            builder.build(title.resource_dir, title.output_file, Progress(events.append))
+    except MemoryError:
+        status, error = "oom", f"메모리 한도({limit_mb}MB)를 넘었습니다"
+    except Exception as e:
+        status, error = "error", str(e)
+    else:
+        status, error = "ok", None
+    return {"status": status, "error": error, "peak_mb": peak_memory_mb(baseline_mb)}, events
+
+
+def _run_title(conn, title, builder_options, limit_mb, streaming, metrics):
+    """
+    작업 프로세스의 시작 함수입니다. 결과와 지표를 conn으로 부모 프로세스에 보냅니다.
+    """
+    result = collect_in_worker(
+        metrics, _build_title, title, builder_options, limit_mb, streaming
+    )
+    conn.send(result)
+    conn.close()
+
+
+class _Job:
+    """
+    책 하나를 만드는 작업 프로세스입니다. index는 titles에서의 순서입니다.
+    """
+
+    def __init__(self, index, title, builder_options, limit_mb, streaming):
+        context = multiprocessing.get_context("fork")
+        self.index = index
+        self.title = title
+        self.conn, child_conn = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_run_title,
+            args=(
+                child_conn,
+                title,
+                builder_options,
+                limit_mb,
+                streaming,
+                metrics_enabled(),
+            ),
+        )
+        self.process.start()
+        child_conn.close()
+
+    def finish(self):
+        """
+        작업 프로세스가 끝나기를 기다려 (결과 사전, 진행 이벤트 목록)을 반환합니다.
+        결과를 보내지 못하고 죽었으면 종료 상태로 결과를 만듭니다. (SIGKILL은 커널 OOM killer로 봄)
+        """
+        try:
+            (result, events), snapshot = self.conn.recv()
+        except EOFError:
+            result, events, snapshot = None, [], None
+        self.conn.close()
+        self.process.join()
+        merge_snapshot(snapshot)
+        if result is None:
+            exitcode = self.process.exitcode
+            if exitcode == -signal.SIGKILL:
+                result = {
+                    "status": "oom",
+                    "error": "작업 프로세스가 강제 종료되었습니다 (메모리 부족)",
+                    "peak_mb": None,
+                }
+            else:
+                result = {
+                    "status": "error",
+                    "error": f"작업 프로세스가 비정상 종료되었습니다 (종료 코드 {exitcode})",
+                    "peak_mb": None,
+                }
+        return result, events
+
+
+def _report(progress, result):
+    if result.status == "ok":
+        progress.message(f"EPUB 파일이 성공적으로 생성되었습니다: {result.output_file}")
+    else:
+        progress.message(
+            f"EPUB 파일 생성 중 오류가 발생했습니다: {result.resource_dir} ({result.error})",
+            "error",
+        )
+
+
+def run_batch(
+    titles,
+    builder_options=None,
+    budget_mb=None,
+    workers=None,
+    history_file=None,
+    progress=None,
+    on_finish=None,
+):
+    """
+    여러 책을 메모리 예산 안에서 병렬로 만듭니다.
+    titles는 (리소스 디렉토리, 출력 파일) 목록이고, builder_options는 Builder에 넘길 인자입니다.
+    책마다 새 작업 프로세스 하나(원고 처리도 그 프로세스 안에서)를 띄우고, 예상 최대 메모리의 합이
+    budget_mb(None이면 사용 가능한 메모리의 MEMORY_BUDGET_RATIO)를 넘지 않을 때만 다음 책을 시작합니다.
+    큰 책부터 시작하며, 동시에 만드는 책은 최대 workers권(None이면 CPU 수)입니다.
+    작업 프로세스의 주소 공간은 예상 메모리에 맞춰 제한하고, 메모리가 부족했던 책은 다른 책이 모두
+    끝난 뒤 예산 전체를 주고 하나씩 다시 만듭니다. (압축 결과 캐시 없이 바로 파일로 내보냄)
+    성공한 책의 최대 메모리는 history_file(None이면 ~/.cache/md_to_epub/memory/peaks.json)에
+    기록하여 다음 실행의 예상에 씁니다.
+    책마다 on_finish(BatchResult)를 호출하고, BatchResult 목록을 titles 순서로 반환합니다.
+    """
+    progress = as_progress(progress)
+    builder_options = builder_options or {}
+    budget_mb = budget_mb or default_memory_budget()
+    workers = workers or os.cpu_count() or 1
+    history_file = Path(history_file) if history_file else default_history_file()
+    history = read_history(history_file)
+
+    planned = [
+        estimate_title(resource_dir, output_file, history)
+        for resource_dir, output_file in titles
+    ]
+    from_history = sum(title.source == "history" for title in planned)
+    progress.message(
+        f"책 {len(planned)}권을 메모리 예산 {budget_mb}MB 안에서 최대 {workers}권씩 만듭니다. "
+        f"(지난 실행 기록으로 예상 {from_history}권)"
+    )
+    for title in planned:
+        if title.memory_mb > budget_mb:
+            progress.message(
+                f"예상 메모리({title.memory_mb}MB)가 예산보다 커서 혼자 만듭니다: "
+                f"{title.resource_dir}",
+                "warning",
+            )
+
+    results = [None] * len(planned)
+
+    def finish(index, result, events, retried):
+        title = planned[index]
+        progress.forward(events)
+        results[index] = BatchResult(
+            title.resource_dir,
+            title.output_file,
+            result["status"],
+            result["error"],
+            result["peak_mb"],
+            retried,
+        )
+        _report(progress, results[index])
+        if on_finish is not None:
+            on_finish(results[index])
+
+    retry = []
+    with progress.stage("batch.titles", len(planned)) as stage:
+        # 큰 책부터: 예산이 남아 있는 동안 들어가는 책을 차례로 시작
+        pending = sorted(
+            range(len(planned)), key=lambda i: planned[i].memory_mb, reverse=True
+        )
+        running = []
+        while pending or running:
+            used_mb = sum(job.title.memory_mb for job in running)
+            for index in list(pending):
+                title = planned[index]
+                if len(running) >= workers:
+                    break
+                if running and used_mb + title.memory_mb > budget_mb:
+                    continue
+                pending.remove(index)
+                running.append(
+                    _Job(index, title, builder_options, title.memory_mb, False)
+                )
+                used_mb += title.memory_mb
+
+            ready = wait(
+                [job.conn for job in running] + [job.process.sentinel for job in running]
+            )
+            for job in [
+                job
+                for job in running
+                if job.conn in ready or job.process.sentinel in ready
+            ]:
+                running.remove(job)
+                result, events = job.finish()
+                if result["status"] == "oom":
+                    progress.forward(events)
+                    progress.message(
+                        f"메모리가 부족하여 나중에 다시 만듭니다: {job.title.resource_dir} "
+                        f"(예상 {job.title.memory_mb}MB)",
+                        "warning",
+                    )
+                    retry.append(job.index)
+                    continue
+                finish(job.index, result, events, False)
+                stage.advance(nbytes=job.title.content_bytes)
+
+        # 메모리가 부족했던 책은 하나씩, 예산 전체를 한도로 다시 만듦
+        for index in retry:
+            title = planned[index]
+            progress.message(f"혼자 다시 만듭니다: {title.resource_dir}")
+            result, events = _Job(
+                index, title, builder_options, budget_mb, True
+            ).finish()
+            finish(index, result, events, True)
+            stage.advance(nbytes=title.content_bytes)
+
+    # 다음 실행을 위해 최대 메모리 기록 (예산 안에서도 부족했던 책은 예산 전체로 기록하여 혼자 만듦)
+    for title, result in zip(planned, results):
+        if result.status == "ok" and result.peak_mb is not None:
+            peak_mb = result.peak_mb
+        elif result.status == "oom":
+            peak_mb = budget_mb
+        else:
+            continue
+        history[_history_key(title.resource_dir)] = {
+            "peak_mb": peak_mb,
+            "content_bytes": title.content_bytes,
+        }
+    try:
+        write_history(history_file, history)
+    except OSError as e:
+        progress.message(f"메모리 기록을 저장하지 못했습니다: {e}", "warning")
+
+    return results
+
+
+def add_batch_arguments(parser):
+    """
+    메모리 예산 기반 일괄 빌드 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_memory_size,
+        default=None,
+        help="책마다 작업 프로세스를 띄워 예상 최대 메모리의 합이 이 예산(예: 6g, 4096m)을 넘지 "
+        "않도록 병렬로 만듭니다. auto이면 사용 가능한 메모리의 80%%. "
+        "동시에 만드는 책 수는 --workers가 제한합니다",
+    )
+    parser.add_argument(
+        "--memory-history",
+        default=None,
+        help="책별 최대 메모리 기록 파일 (기본값: ~/.cache/md_to_epub/memory/peaks.json)",
+    )
+
+
+def batch_from_args(args):
+    """
+    메모리 예산(MB)을 반환합니다. 예산 없이 한 프로세스에서 차례로 만들면 None을 반환합니다.
+    """
+    return args.memory_budget
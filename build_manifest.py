@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import html
+import json
+import hashlib
+from pathlib import Path
+
+from image_pipeline import IMAGE_DIR_NAME, IMAGE_MEDIA_TYPES
+from page_map import PAGE_MAP_FILENAME
+from search_index import SEARCH_INDEX_FILENAME
+from toc_tree import label_headings, toc_page_filename
+
+# HTML 단계가 출력 디렉토리에 남기는 빌드 목록 (HTML 단계와 EPUB 단계 사이의 약속)
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+MEDIA_TYPES = {
+    ".html": "application/xhtml+xml",
+    ".xhtml": "application/xhtml+xml",
+    ".css": "text/css",
+    ".json": "application/json",
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    **IMAGE_MEDIA_TYPES,
+}
+
+# 페이지 역할 (스파인 순서대로)
+PAGE_ROLES = ("title", "colophon", "toc", "chapter")
+# 리소스 역할 (EPUB 매니페스트에 추가하는 순서대로)
+ASSET_ROLES = ("style", "font", "image", "search_index", "page_map", "cover")
+
+TITLE_TAG_PATTERN = re.compile(r"<title>(.*?)</title>")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+CHAPTER_FILE_PATTERN = re.compile(r"chapter_(\d+)\.html")
+
+
+def heading_text(title_html):
+    """
+    헤딩 안의 HTML에서 태그를 지우고 엔티티를 풀어 목차에 쓸 텍스트를 만듭니다.
+    """
+    return html.unescape(TAG_PATTERN.sub("", title_html)).strip()
+
+
+def media_type_for(file_name):
+    """
+    파일 확장자로 미디어 타입을 정합니다.
+    """
+    return MEDIA_TYPES.get(Path(file_name).suffix.lower(), "application/octet-stream")
+
+
+class ManifestBuilder:
+    """
+    HTML 단계에서 만든 페이지와 리소스를 순서대로 기록하여 manifest.json을 만듭니다.
+    EPUB 단계는 이 목록만 읽으면 되므로 디렉토리를 훑거나 페이지를 파싱하지 않아도 됩니다.
+    """
+
+    def __init__(self, output_dir, metadata=None):
+        self.output_dir = Path(output_dir)
+        self.metadata = metadata or {}
+        self.pages = []
+        self.assets = []
+
+    def add_page(self, file_name, role, title, headings=None):
+        """
+        스파인에 들어갈 페이지를 추가합니다.
+        headings는 label_headings가 반환한 [(단계, 제목 HTML, ID), ...]이며,
+        페이지 HTML의 헤딩에는 이미 ID가 붙어 있어야 합니다. 제목은 텍스트로 저장됩니다.
+        """
+        page = {"file": file_name, "role": role, "title": title}
+        if headings is not None:
+            page["headings"] = [
+                [level, heading_text(text), header_id]
+                for level, text, header_id in headings
+            ]
+        self.pages.append(page)
+
+    def add_asset(self, file_name, role):
+        """
+        스타일, 폰트, 이미지 등 리소스 파일을 추가합니다.
+        """
+        self.assets.append({"file": file_name, "role": role})
+
+    def finish(self):
+        """
+        파일마다 SHA-256 해시, 크기, 미디어 타입을 채워 직렬화 가능한 사전을 반환합니다.
+        """
+        for entry in self.pages + self.assets:
+            path = self.output_dir / entry["file"]
+            with open(path, "rb") as f:
+                data = f.read()
+            entry["sha256"] = hashlib.sha256(data).hexdigest()
+            entry["size"] = len(data)
+            entry["media_type"] = media_type_for(entry["file"])
+
+        return {
+            "version": MANIFEST_VERSION,
+            "heading_ids": True,
+            "metadata": self.metadata,
+            "pages": self.pages,
+            "assets": self.assets,
+        }
+
+    def write(self):
+        """
+        manifest.json을 저장하고 그 경로를 반환합니다.
+        """
+        manifest_file = self.output_dir / MANIFEST_FILENAME
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            json.dump(self.finish(), f, ensure_ascii=False, indent=1)
+        return manifest_file
+
+
+def scan_html_dir(html_dir):
+    """
+    manifest.json이 없는 HTML 디렉토리(직접 만들었거나 이전 버전의 출력)에서 빌드 목록을 만듭니다.
+    챕터는 번호 순으로 정렬하고 제목은 <title>에서 가져옵니다.
+    헤딩에 ID가 없을 수 있으므로 heading_ids는 False이며, 읽는 쪽에서 label_headings로 ID를 붙입니다.
+    """
+    html_path = Path(html_dir)
+    manifest = ManifestBuilder(html_path)
+
+    def add_page_if_exists(file_name, role, title):
+        if (html_path / file_name).exists():
+            manifest.add_page(file_name, role, title)
+
+    add_page_if_exists("title.html", "title", "제목")
+    add_page_if_exists("colophon.html", "colophon", "판권")
+    page_num = 1
+    while (html_path / toc_page_filename(page_num)).exists():
+        manifest.add_page(toc_page_filename(page_num), "toc", "목차")
+        page_num += 1
+
+    chapter_files = sorted(
+        (
+            path.name
+            for path in html_path.glob("chapter_*.html")
+            if CHAPTER_FILE_PATTERN.fullmatch(path.name)
+        ),
+        key=lambda name: int(CHAPTER_FILE_PATTERN.fullmatch(name).group(1)),
+    )
+    for chapter_file in chapter_files:
+        with open(html_path / chapter_file, "r", encoding="utf-8") as f:
+            content = f.read()
+        chapter_num = int(CHAPTER_FILE_PATTERN.fullmatch(chapter_file).group(1))
+        title_match = TITLE_TAG_PATTERN.search(content)
+        _, headings = label_headings(content, chapter_num)
+        manifest.add_page(
+            chapter_file,
+            "chapter",
+            title_match.group(1) if title_match else f"Chapter {chapter_num}",
+            headings,
+        )
+
+    if (html_path / "style.css").exists():
+        manifest.add_asset("style.css", "style")
+    for directory, role in (("fonts", "font"), (IMAGE_DIR_NAME, "image")):
+        if (html_path / directory).is_dir():
+            for path in sorted((html_path / directory).iterdir()):
+                if path.is_file():
+                    manifest.add_asset(f"{directory}/{path.name}", role)
+    for file_name, role in (
+        (SEARCH_INDEX_FILENAME, "search_index"),
+        (PAGE_MAP_FILENAME, "page_map"),
+        ("cover.jpg", "cover"),
+    ):
+        if (html_path / file_name).exists():
+            manifest.add_asset(file_name, role)
+
+    result = manifest.finish()
+    result["heading_ids"] = False
+    return result
+
+
+def load_manifest(html_dir):
+    """
+    HTML 디렉토리의 manifest.json을 읽습니다. 없으면 scan_html_dir로 만듭니다.
+    """
+    manifest_file = Path(html_dir) / MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return scan_html_dir(html_dir)
+
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(
+            f"지원하지 않는 manifest.json 버전입니다: {manifest.get('version')}"
+        )
+    return manifest
+
+
+def read_page(html_dir, manifest, page):
+    """
+    페이지 HTML을 읽습니다. 헤딩 ID가 없는 빌드 목록이면 읽으면서 ID를 붙입니다.
+    """
+    with open(Path(html_dir) / page["file"], "r", encoding="utf-8") as f:
+        content = f.read()
+    if page["role"] == "chapter" and not manifest.get("heading_ids"):
+        chapter_num = int(CHAPTER_FILE_PATTERN.fullmatch(page["file"]).group(1))
+        content, _ = label_headings(content, chapter_num)
+    return content
+
+
+def pages_with_role(manifest, role):
+    return [page for page in manifest["pages"] if page["role"] == role]
+
+
+def assets_with_role(manifest, role):
+    return [asset for asset in manifest["assets"] if asset["role"] == role]
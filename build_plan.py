@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import math
+import argparse
+from pathlib import Path
+
+from image_pipeline import IMAGE_SRC_PATTERN, local_image_file
+from markdown_engines import IMAGE_PATTERN
+from page_map import DEFAULT_PAGE_CHARS
+from resource_to_html import find_content_files, read_metadata, resolve_fonts_dir
+
+PLAN_VERSION = 1
+
+# 빌드 비용 모델 계수 (참고 빌드에서 잰 값, 작업 프로세스 하나 기준)
+# 시간(초) = 기본 + 원고 MB당 + 챕터당 + 이미지당
+COST_BASE_SECONDS = 0.4
+COST_SECONDS_PER_CONTENT_MB = 0.1
+COST_SECONDS_PER_CHAPTER = 0.0007
+COST_SECONDS_PER_IMAGE = 0.05
+# 최대 메모리(MB) = 기본 + 원고 바이트의 배수 + 챕터당
+MEMORY_BASE_MB = 40
+MEMORY_PER_CONTENT_BYTE = 3.5
+MEMORY_PER_CHAPTER_BYTES = 4096
+# 원고 바이트 대비 EPUB 안에 압축된 XHTML 크기 비율 (마크업 추가 후 deflate)
+EPUB_CONTENT_RATIO = 0.5
+
+# 보고서에 보여 줄 가장 큰 챕터 수
+LARGEST_CHAPTER_COUNT = 5
+
+FENCE_PREFIXES = (b"```", b"~~~")
+H1_PREFIXES = (b"# ", b"#\t")
+
+
+def _new_chapter(title):
+    return {"title": title, "bytes": 0, "chars": 0}
+
+
+def scan_content_file(content_file, chapters, image_sources):
+    """
+    원고 파일 하나를 렌더링하지 않고 바이트 단위로 훑습니다.
+    h1(# 제목) 줄마다 chapters에 새 챕터를 추가하고 챕터별 바이트 수와 글자 수(공백 제외)를 더하며,
+    이미지 참조(마크다운 ![](...), HTML <img src>)는 image_sources에 모읍니다.
+    첫 h1 이전의 내용은 chapters[0](제목 없는 머리말)에 들어갑니다.
+    """
+    fence = None
+    with open(content_file, "rb") as f:
+        for line in f:
+            stripped = line.strip()
+            if fence is not None:
+                if stripped == fence:
+                    fence = None
+            elif stripped.startswith(FENCE_PREFIXES):
+                fence = stripped[:3]
+            elif line.startswith(H1_PREFIXES):
+                chapters.append(
+                    _new_chapter(line[2:].strip().decode("utf-8", "replace"))
+                )
+
+            chapter = chapters[-1]
+            chapter["bytes"] += len(line)
+            text = line.decode("utf-8", "replace")
+            chapter["chars"] += len("".join(text.split()))
+            if b"![" in line:
+                image_sources.extend(m.group(2) for m in IMAGE_PATTERN.finditer(text))
+            if b"<img" in line:
+                image_sources.extend(
+                    m.group(2) for m in IMAGE_SRC_PATTERN.finditer(text)
+                )
+
+
+def _stat_files(paths):
+    paths = list(paths)
+    return {"count": len(paths), "bytes": sum(path.stat().st_size for path in paths)}
+
+
+def stat_image_sources(resource_path, image_sources):
+    """
+    본문 이미지 참조를 리소스 디렉토리 기준으로 찾아 크기를 셉니다. (image_pipeline.process_images와 같은 규칙)
+    외부 URL은 제외하고, 찾을 수 없거나 쓸 수 없는 파일은 missing 목록에 넣습니다.
+    """
+    found = {}
+    missing = []
+    for src in dict.fromkeys(image_sources):
+        try:
+            source_file = local_image_file(resource_path, src)
+        except ValueError:
+            missing.append(src)
+            continue
+        if source_file is None:
+            continue
+        if source_file.is_file():
+            found[source_file.resolve()] = source_file
+        else:
+            missing.append(src)
+    stats = _stat_files(found.values())
+    stats["missing"] = missing
+    return stats
+
+
+def estimate_cost(content_bytes, chapter_count, image_count, asset_bytes):
+    """
+    비용 모델 계수로 예상 빌드 시간(초), 최대 메모리(MB), EPUB 크기(바이트)를 계산합니다.
+    """
+    seconds = (
+        COST_BASE_SECONDS
+        + COST_SECONDS_PER_CONTENT_MB * content_bytes / 1024**2
+        + COST_SECONDS_PER_CHAPTER * chapter_count
+        + COST_SECONDS_PER_IMAGE * image_count
+    )
+    memory_mb = (
+        MEMORY_BASE_MB
+        + (MEMORY_PER_CONTENT_BYTE * content_bytes + MEMORY_PER_CHAPTER_BYTES * chapter_count)
+        / 1024**2
+    )
+    return {
+        "seconds": round(seconds, 2),
+        "memory_mb": math.ceil(memory_mb),
+        "epub_bytes": int(content_bytes * EPUB_CONTENT_RATIO) + asset_bytes,
+    }
+
+
+def plan_resource(resource_dir, page_chars=DEFAULT_PAGE_CHARS, fonts_dir=None):
+    """
+    리소스 디렉토리를 렌더링하지 않고 훑어 빌드 계획(직렬화 가능한 사전)을 만듭니다.
+    원고는 바이트 단위로 한 번 읽고, 글꼴·표지·이미지·스타일시트는 파일 크기만 확인합니다.
+    """
+    resource_path = Path(resource_dir)
+    metadata = read_metadata(resource_path / "metadata.json")
+    content_files = [
+        path for path in find_content_files(resource_path, metadata) if path.exists()
+    ]
+
+    chapters = [_new_chapter("")]
+    image_sources = []
+    for content_file in content_files:
+        scan_content_file(content_file, chapters, image_sources)
+
+    # 첫 h1 이전의 머리말은 h1이 하나도 없을 때만 챕터가 됨 (resource_to_html.extract_chapters)
+    preface = chapters.pop(0)
+    if not chapters:
+        preface["title"] = "내용"
+        chapters = [preface]
+    content_bytes = sum(path.stat().st_size for path in content_files)
+    chars = sum(chapter["chars"] for chapter in chapters)
+
+    fonts_path = resolve_fonts_dir(resource_path, fonts_dir)
+    assets = {
+        "font": _stat_files(
+            sorted(path for path in fonts_path.glob("*") if path.is_file())
+            if fonts_path.is_dir()
+            else []
+        ),
+        "cover": _stat_files(
+            path for path in [resource_path / "cover.jpg"] if path.is_file()
+        ),
+        "image": stat_image_sources(resource_path, image_sources),
+        "style": _stat_files(
+            path for path in [resource_path / "style.css"] if path.is_file()
+        ),
+    }
+    asset_bytes = sum(stats["bytes"] for stats in assets.values())
+
+    largest = sorted(
+        range(len(chapters)), key=lambda i: chapters[i]["bytes"], reverse=True
+    )[:LARGEST_CHAPTER_COUNT]
+
+    return {
+        "version": PLAN_VERSION,
+        "resource_dir": str(resource_dir),
+        "title": metadata.get("title", ""),
+        "content": {
+            "files": len(content_files),
+            "bytes": content_bytes,
+            "chars": chars,
+        },
+        "chapters": {
+            "count": len(chapters),
+            "largest": [
+                {
+                    "index": i + 1,
+                    "title": chapters[i]["title"],
+                    "bytes": chapters[i]["bytes"],
+                }
+                for i in largest
+            ],
+        },
+        "page_chars": page_chars,
+        "pages": math.ceil(chars / page_chars) if chars else 0,
+        "assets": assets,
+        "estimate": estimate_cost(
+            content_bytes, len(chapters), assets["image"]["count"], asset_bytes
+        ),
+    }
+
+
+def format_bytes(size):
+    """
+    바이트 수를 읽기 쉬운 단위로 표시합니다.
+    """
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def print_plan(plan):
+    """
+    빌드 계획을 사람이 읽기 쉬운 형식으로 출력합니다.
+    """
+    content = plan["content"]
+    estimate = plan["estimate"]
+    print(f"빌드 계획: {plan['resource_dir']} ({plan['title']})")
+    print(
+        f"  원고: 파일 {content['files']}개, {format_bytes(content['bytes'])}, "
+        f"{content['chars']}자 (공백 제외)"
+    )
+    print(
+        f"  챕터: {plan['chapters']['count']}개, "
+        f"예상 쪽 수: {plan['pages']}쪽 ({plan['page_chars']}자 기준)"
+    )
+    print("  가장 큰 챕터:")
+    for chapter in plan["chapters"]["largest"]:
+        print(
+            f"    {chapter['index']:>6}. {chapter['title']} ({format_bytes(chapter['bytes'])})"
+        )
+    print("  리소스:")
+    for role, label in (
+        ("font", "글꼴"),
+        ("cover", "표지"),
+        ("image", "이미지"),
+        ("style", "스타일"),
+    ):
+        stats = plan["assets"][role]
+        print(f"    {label}: {stats['count']}개, {format_bytes(stats['bytes'])}")
+    for src in plan["assets"]["image"]["missing"]:
+        print(f"    찾을 수 없는 이미지: {src}")
+    print(
+        f"  예상 비용: {estimate['seconds']}초, 최대 메모리 {estimate['memory_mb']}MB, "
+        f"EPUB 약 {format_bytes(estimate['epub_bytes'])}"
+    )
+
+
+def add_plan_arguments(parser):
+    """
+    빌드 계획 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--plan",
+        nargs="?",
+        const="text",
+        choices=("text", "json"),
+        default=None,
+        help="빌드하지 않고 예상 쪽 수, 큰 챕터, 리소스 크기, 예상 비용만 출력합니다 (json이면 JSON으로)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="리소스 디렉토리들을 빌드하지 않고 훑어 예상 크기와 비용을 보고합니다."
+    )
+    parser.add_argument(
+        "resource_dirs", nargs="+", help="리소스 디렉토리 경로 (여러 개 가능)"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="예상 빌드 시간이 긴 순서로 정렬한 JSON 목록을 출력합니다",
+    )
+    parser.add_argument(
+        "--page-chars",
+        type=int,
+        default=DEFAULT_PAGE_CHARS,
+        help=f"한 쪽의 글자 수, 공백 제외 (기본값: {DEFAULT_PAGE_CHARS})",
+    )
+
+    args = parser.parse_args()
+
+    plans = []
+    for resource_dir in args.resource_dirs:
+        if not os.path.exists(resource_dir):
+            print(f"오류: 리소스 디렉토리 '{resource_dir}'을 찾을 수 없습니다.")
+            return 1
+        plans.append(plan_resource(resource_dir, args.page_chars))
+
+    # 큰 책부터 (일괄 빌드에서 오래 걸리는 작업을 먼저 시작하도록)
+    plans.sort(key=lambda plan: plan["estimate"]["seconds"], reverse=True)
+    if args.json:
+        json.dump(plans, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    else:
+        for plan in plans:
+            print_plan(plan)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
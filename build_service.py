@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from build_workspace import create_workspace
+from builder import warm_process
+from markdown_engines import MARKDOWN_ENGINES
+from metrics import (
+    collect_in_worker,
+    enable_metrics,
+    get_registry,
+    merge_snapshot,
+    metrics_enabled,
+    observe,
+    record_build,
+    send_metrics,
+)
+
+# 작업 단계 이름 (단계별 지연 시간 통계에 사용)
+STAGES = ("queue", "extract", "html", "epub", "total")
+
+# 완료된 작업을 몇 개까지 보관할지 (오래된 작업의 작업 공간부터 삭제)
+MAX_FINISHED_JOBS = 100
+
+
+def _find_resource_dir(extract_dir):
+    """
+    압축을 푼 디렉토리에서 metadata.json이 있는 리소스 디렉토리를 찾습니다.
+    zip 최상위에 resource/ 같은 폴더가 하나 더 있는 경우도 처리합니다.
+    """
+    if (extract_dir / "metadata.json").exists():
+        return extract_dir
+    for child in sorted(extract_dir.iterdir()):
+        if child.is_dir() and (child / "metadata.json").exists():
+            return child
+    raise FileNotFoundError("리소스 묶음에서 metadata.json을 찾을 수 없습니다.")
+
+
+def run_build_job(workspace, options):
+    """
+    작업 공간의 리소스 묶음(bundle.zip)을 EPUB으로 변환합니다. (작업 프로세스에서 실행)
+    단계별 소요 시간(초)과 EPUB 경로를 반환합니다.
+    """
+    from resource_to_epub import convert_html_to_epub, read_resource_metadata
+    from resource_to_html import convert_resource_to_html
+
+    workspace = Path(workspace)
+    timings = {}
+
+    start = time.perf_counter()
+    extract_dir = workspace / "resource"
+    with zipfile.ZipFile(workspace / "bundle.zip") as bundle:
+        bundle.extractall(extract_dir)
+    resource_dir = _find_resource_dir(extract_dir)
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    html_dir = workspace / "html"
+    convert_resource_to_html(
+        resource_dir,
+        html_dir,
+        markdown_engine=options.get("markdown_engine", "native"),
+        workers=1,
+        page_chars=options.get("page_chars"),
+    )
+    timings["html"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output_file = workspace / "output.epub"
+    result = convert_html_to_epub(
+        str(html_dir), str(output_file), read_resource_metadata(resource_dir)
+    )
+    timings["epub"] = time.perf_counter() - start
+    if not result:
+        raise RuntimeError("EPUB 파일 생성에 실패했습니다.")
+
+    # 중간 파일 정리 (EPUB만 남김)
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    shutil.rmtree(html_dir, ignore_errors=True)
+    (workspace / "bundle.zip").unlink()
+
+    return {"epub": str(output_file), "timings": timings}
+
+
+class StageStats:
+    """
+    단계별 지연 시간 통계(횟수, 합계, 최대, 마지막 값)를 모읍니다.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "last": self.last,
+        }
+
+
+class BuildService:
+    """
+    리소스 묶음을 받아 작업 큐에 넣고, 미리 띄워 둔 작업 프로세스에서 EPUB으로 변환합니다.
+    작업마다 별도의 작업 공간(임시 디렉토리)을 사용하므로 동시에 여러 작업을 처리해도 충돌하지 않습니다.
+    """
+
+    def __init__(self, workers=None, workspace_dir=None):
+        self.workspace_dir = workspace_dir
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=warm_process
+        )
+        self.workers = self.executor._max_workers
+        self.jobs = OrderedDict()
+        self.stats = {stage: StageStats() for stage in STAGES}
+        self.counts = {"completed": 0, "failed": 0}
+        self.lock = threading.Lock()
+
+    def submit(self, bundle_data, options=None):
+        """
+        리소스 묶음(zip 바이트)을 작업 큐에 넣고 작업 ID를 반환합니다.
+        """
+        workspace = create_workspace(self.workspace_dir)
+        with open(workspace / "bundle.zip", "wb") as f:
+            f.write(bundle_data)
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "workspace": workspace,
+            "submitted": time.time(),
+            "timings": {},
+            "error": None,
+            "epub": None,
+            "done": threading.Event(),
+            "future": None,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            # 작업 프로세스에서 모은 지표는 _finish에서 이 프로세스의 레지스트리에 더함
+            job["future"] = self.executor.submit(
+                collect_in_worker,
+                metrics_enabled(),
+                run_build_job,
+                str(workspace),
+                options or {},
+            )
+        job["future"].add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    @staticmethod
+    def _job_state(job):
+        if job["status"] == "queued" and job["future"].running():
+            return "running"
+        return job["status"]
+
+    def _finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs[job_id]
+            total = time.time() - job["submitted"]
+            try:
+                result, snapshot = future.result()
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self.counts["failed"] += 1
+                shutil.rmtree(job["workspace"], ignore_errors=True)
+                record_build(total, False)
+            else:
+                merge_snapshot(snapshot)
+                job["status"] = "done"
+                job["epub"] = result["epub"]
+                job["timings"] = dict(result["timings"])
+                job["timings"]["queue"] = max(total - sum(result["timings"].values()), 0.0)
+                job["timings"]["total"] = total
+                for stage, seconds in job["timings"].items():
+                    self.stats[stage].add(seconds)
+                self.counts["completed"] += 1
+                observe("md_to_epub_queue_wait_seconds", job["timings"]["queue"])
+                record_build(total, True)
+            job["done"].set()
+            self._evict_finished()
+
+    def _evict_finished(self):
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["status"] in ("done", "failed")
+        ]
+        for job_id in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            self._remove(job_id)
+
+    def _remove(self, job_id):
+        job = self.jobs.pop(job_id)
+        shutil.rmtree(job["workspace"], ignore_errors=True)
+
+    def remove(self, job_id):
+        """
+        완료된 작업과 작업 공간을 삭제합니다.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] not in ("done", "failed"):
+                return False
+            self._remove(job_id)
+            return True
+
+    def wait(self, job_id, timeout=None):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job["done"].wait(timeout)
+        return self.job_status(job_id)
+
+    def job_status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "id": job["id"],
+                "status": self._job_state(job),
+                "timings": job["timings"],
+                "error": job["error"],
+            }
+
+    def epub_path(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job["epub"] if job and job["status"] == "done" else None
+
+    def status(self):
+        """
+        큐 길이, 작업 수, 단계별 지연 시간 통계를 반환합니다.
+        """
+        with self.lock:
+            states = [self._job_state(job) for job in self.jobs.values()]
+            return {
+                "workers": self.workers,
+                "queue_depth": states.count("queued"),
+                "running": states.count("running"),
+                "completed": self.counts["completed"],
+                "failed": self.counts["failed"],
+                "stages": {stage: stats.to_dict() for stage, stats in self.stats.items()},
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            for job_id in list(self.jobs):
+                self._remove(job_id)
+
+
+def read_bundle(content_type, body):
+    """
+    요청 본문에서 리소스 묶음(zip)을 꺼냅니다.
+    application/zip 본문 또는 multipart/form-data의 첫 번째 파일 필드를 지원합니다.
+    """
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        for part in message.iter_parts():
+            if part.get_filename():
+                return part.get_payload(decode=True)
+        raise ValueError("multipart 요청에 파일이 없습니다.")
+    return body
+
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """
+    빌드 서비스 HTTP API
+
+    POST   /jobs            리소스 묶음(zip)을 올려 작업 생성 (?wait=1이면 완료 후 EPUB 반환)
+    GET    /jobs/<id>       작업 상태
+    GET    /jobs/<id>/epub  완성된 EPUB
+    DELETE /jobs/<id>       완료된 작업 삭제
+    GET    /status          큐 길이와 단계별 지연 시간
+    GET    /metrics         Prometheus 텍스트 형식 지표 (--metrics로 실행한 경우)
+    """
+
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_epub(self, path):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/epub+zip")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def _job_path(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) >= 2 and parts[0] == "jobs":
+            return parts[1], parts[2:]
+        return None, parts
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            bundle = read_bundle(
+                self.headers.get("Content-Type", "application/zip"),
+                self.rfile.read(length),
+            )
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        options = {}
+        if "markdown_engine" in query:
+            markdown_engine = query["markdown_engine"][0]
+            if markdown_engine not in MARKDOWN_ENGINES:
+                self._send_json(
+                    400,
+                    {
+                        "error": "markdown_engine은 "
+                        + ", ".join(sorted(MARKDOWN_ENGINES))
+                        + " 중 하나여야 합니다."
+                    },
+                )
+                return
+            options["markdown_engine"] = markdown_engine
+        if "page_chars" in query:
+            try:
+                options["page_chars"] = int(query["page_chars"][0])
+            except ValueError:
+                self._send_json(400, {"error": "page_chars는 정수여야 합니다."})
+                return
+        job_id = self.service.submit(bundle, options)
+
+        if query.get("wait", ["0"])[0] in ("1", "true"):
+            status = self.service.wait(job_id)
+            epub_path = self.service.epub_path(job_id)
+            if epub_path:
+                self._send_epub(epub_path)
+            else:
+                self._send_json(500, status)
+            # 결과를 바로 돌려준 작업은 보관할 필요가 없으므로 삭제
+            self.service.remove(job_id)
+            return
+
+        self._send_json(202, self.service.job_status(job_id))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/status":
+            self._send_json(200, self.service.status())
+            return
+        if path == "/metrics" and get_registry() is not None:
+            send_metrics(self, get_registry())
+            return
+
+        job_id, rest = self._job_path()
+        status = self.service.job_status(job_id) if job_id else None
+        if status is None:
+            self._send_json(404, {"error": "not found"})
+        elif rest == ["epub"]:
+            epub_path = self.service.epub_path(job_id)
+            if epub_path:
+                self._send_epub(epub_path)
+            else:
+                self._send_json(409, status)
+        else:
+            self._send_json(200, status)
+
+    def do_DELETE(self):
+        job_id, _ = self._job_path()
+        if job_id and self.service.remove(job_id):
+            self._send_json(200, {"id": job_id, "status": "deleted"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+def create_server(
+    host="127.0.0.1", port=8080, workers=None, workspace_dir=None, metrics=False
+):
+    """
+    빌드 서비스와 HTTP 서버를 만듭니다. port가 0이면 빈 포트를 사용합니다.
+    metrics가 True이면 지표를 모아 GET /metrics로 제공합니다.
+    """
+    if metrics:
+        enable_metrics()
+    service = BuildService(workers, workspace_dir)
+    handler = type("Handler", (BuildRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EPUB 빌드 서비스를 실행합니다.")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="접속을 받을 주소 (기본값: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8080, help="접속을 받을 포트 (기본값: 8080)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="작업 프로세스 수 (기본값: CPU 수)",
+    )
+    parser.add_argument(
+        "--workspace-dir",
+        default=None,
+        help="작업 공간을 만들 디렉토리. ram이면 /dev/shm, "
+        "auto이면 /dev/shm이 있을 때만 사용 (기본값: 시스템 임시 디렉토리)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="빌드 수, 단계별 시간, 캐시 적중률 등의 지표를 GET /metrics로 제공합니다 "
+        "(Prometheus 텍스트 형식)",
+    )
+
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port, args.workers, args.workspace_dir, args.metrics
+    )
+    host, port = server.server_address[:2]
+    print(f"빌드 서비스를 시작했습니다: http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
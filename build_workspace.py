@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from progress import as_progress
+
+# 메모리 기반 파일 시스템(tmpfs) 디렉토리. 중간 HTML을 디스크에 쓰지 않음
+RAM_WORKSPACE_ROOT = Path("/dev/shm")
+
+# --workspace-dir 옵션의 특별한 값
+# ram: RAM_WORKSPACE_ROOT, auto: RAM_WORKSPACE_ROOT가 있으면 그곳, 없으면 시스템 임시 디렉토리
+WORKSPACE_ROOT_ALIASES = ("ram", "auto")
+
+WORKSPACE_PREFIX = "md_to_epub_"
+
+
+def ram_workspace_available():
+    """
+    RAM_WORKSPACE_ROOT에 작업 공간을 만들 수 있는지 확인합니다.
+    """
+    return RAM_WORKSPACE_ROOT.is_dir() and os.access(RAM_WORKSPACE_ROOT, os.W_OK)
+
+
+def resolve_workspace_root(root=None):
+    """
+    작업 공간을 만들 상위 디렉토리를 반환합니다. None이면 시스템 임시 디렉토리를 사용합니다.
+    "ram"은 RAM_WORKSPACE_ROOT이며 사용할 수 없으면 오류입니다.
+    "auto"는 RAM_WORKSPACE_ROOT를 사용할 수 있으면 그곳, 없으면 시스템 임시 디렉토리입니다.
+    """
+    if root is None:
+        return None
+    if root == "ram":
+        if not ram_workspace_available():
+            raise FileNotFoundError(
+                f"메모리 기반 디렉토리를 사용할 수 없습니다: {RAM_WORKSPACE_ROOT}"
+            )
+        return RAM_WORKSPACE_ROOT
+    if root == "auto":
+        return RAM_WORKSPACE_ROOT if ram_workspace_available() else None
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def create_workspace(root=None, prefix=WORKSPACE_PREFIX):
+    """
+    빌드 하나가 혼자 쓰는 새 작업 공간 디렉토리를 만들고 경로를 반환합니다.
+    """
+    root = resolve_workspace_root(root)
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=root))
+
+
+def resolve_inside(base_dir, name):
+    """
+    base_dir 기준 경로 name을 base_dir 안의 경로로 반환합니다.
+    절대 경로나 "..", 심볼릭 링크로 base_dir 밖을 가리키면 ValueError를 올립니다.
+    (올린 리소스 묶음이 서버의 다른 파일을 책에 넣지 못하도록)
+    """
+    base_dir = Path(base_dir)
+    path = base_dir / name
+    if not path.resolve().is_relative_to(base_dir.resolve()):
+        raise ValueError(f"리소스 디렉토리 밖의 경로는 사용할 수 없습니다: {name}")
+    return path
+
+
+def cleanup_workspace(workspace, keep=False, progress=None):
+    """
+    작업 공간을 삭제합니다. keep이 True이면 삭제하지 않고 위치를 알려 줍니다.
+    """
+    if keep:
+        as_progress(progress).message(f"작업 공간을 남겨 두었습니다: {workspace}")
+    else:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+@contextmanager
+def build_workspace(root=None, keep=False, prefix=WORKSPACE_PREFIX):
+    """
+    빌드 하나가 혼자 쓰는 작업 공간을 만들어 넘겨 줍니다.
+    빌드가 성공하면 작업 공간을 삭제하고, 예외로 끝나면 원인을 살펴볼 수 있도록 남겨 둡니다.
+    (메모리 부족은 입력의 문제가 아니므로 삭제)
+    keep이 True이면 성공해도 남겨 둡니다.
+    """
+    workspace = create_workspace(root, prefix)
+    try:
+        yield workspace
+    except MemoryError:
+        cleanup_workspace(workspace, keep)
+        raise
+    except BaseException:
+        cleanup_workspace(workspace, keep=True)
+        raise
+    cleanup_workspace(workspace, keep)
+
+
+def add_workspace_arguments(parser):
+    """
+    작업 공간 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--workspace-dir",
+        default=None,
+        help="빌드마다 작업 공간을 만들 디렉토리. ram이면 /dev/shm, "
+        "auto이면 /dev/shm이 있을 때만 사용 (기본값: 시스템 임시 디렉토리)",
+    )
+    parser.add_argument(
+        "--keep-workspace",
+        action="store_true",
+        help="빌드가 성공해도 작업 공간(중간 HTML)을 삭제하지 않습니다",
+    )
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from batch_scheduler import add_batch_arguments, batch_from_args, run_batch
+from build_workspace import add_workspace_arguments, build_workspace
+from epub_validator import add_validation_arguments, check_epub, validation_from_args
+from epub_compress import (
+    COMPRESSION_LEVELS,
+    add_compression_arguments,
+    format_compression_report,
+    recompress_epub,
+    zlib_level,
+)
+from epub_zip import DEFAULT_CACHE_BYTES, CompressedEntryCache, write_epub_stream
+from image_pipeline import add_image_arguments, image_options_from_args
+from markdown_engines import MARKDOWN_ENGINES, get_markdown_engine
+from metrics import (
+    add_metrics_arguments,
+    metrics_from_args,
+    record_build,
+    write_metrics_from_args,
+)
+from output_targets import is_stream
+from page_map import add_page_map_arguments, page_chars_from_args
+from progress import add_progress_arguments, as_progress, progress_from_args
+from reproducible_build import add_reproducible_arguments, reproducible_build_time
+from resource_to_epub import (
+    build_epub_book,
+    default_identifier,
+    read_resource_metadata,
+)
+from resource_to_html import add_build_arguments, convert_resource_to_html
+from templates import DEFAULT_TEMPLATES, get_template
+from toc_tree import DEFAULT_TOC_OPTIONS, add_toc_arguments, toc_options_from_args
+
+BUILDER_WORKSPACE_PREFIX = "md_to_epub_builder_"
+
+
+def warm_process(markdown_engine="native"):
+    """
+    무거운 모듈과 기본 템플릿을 미리 불러옵니다.
+    작업 프로세스를 시작할 때(ProcessPoolExecutor의 initializer)와 Builder를 만들 때 사용합니다.
+    """
+    import ebooklib.epub  # noqa: F401
+    import bs4  # noqa: F401
+
+    get_markdown_engine(markdown_engine)
+    for name in DEFAULT_TEMPLATES:
+        get_template(name)
+
+
+class Builder:
+    """
+    한 프로세스에서 여러 책을 연달아 만들 때 쓰는 변환기입니다.
+    convert_resource_to_epub과 같은 과정으로 만들지만 다음을 빌드 사이에 유지합니다.
+    - 큰 항목(글꼴, 공통 이미지)의 압축 결과 (epub_zip.CompressedEntryCache)
+    - 원고와 이미지를 처리하는 작업 프로세스 풀 (처음 필요할 때 띄움)
+    - 불러온 마크다운 엔진과 컴파일된 기본 템플릿
+    여러 스레드에서 동시에 build를 호출할 수 있으며, 다 쓰면 close()로 작업 프로세스를 정리합니다.
+
+    with Builder(page_chars=700) as builder:
+        for resource_dir in resource_dirs:
+            data = builder.build(resource_dir)
+    """
+
+    def __init__(
+        self,
+        markdown_engine="native",
+        image_options=None,
+        image_cache_dir=None,
+        content_cache_dir=None,
+        workers=None,
+        page_chars=None,
+        toc_options=None,
+        search_index=False,
+        validate=True,
+        workspace_dir=None,
+        keep_workspace=False,
+        compressed_cache_bytes=DEFAULT_CACHE_BYTES,
+        reproducible=False,
+        compression="default",
+    ):
+        self.markdown_engine = markdown_engine
+        self.image_options = image_options
+        self.image_cache_dir = image_cache_dir
+        self.content_cache_dir = content_cache_dir
+        self.workers = workers
+        self.page_chars = page_chars
+        self.toc_options = toc_options or DEFAULT_TOC_OPTIONS
+        self.search_index = search_index
+        self.validate = validate
+        self.workspace_dir = workspace_dir
+        self.keep_workspace = keep_workspace
+        self.reproducible = reproducible
+        self.compression = compression
+        self.compressed_cache = CompressedEntryCache(compressed_cache_bytes)
+        self.executor = None
+        self.lock = threading.Lock()
+        warm_process(markdown_engine)
+
+    def _get_executor(self):
+        """
+        빌드 사이에 함께 쓰는 작업 프로세스 풀을 반환합니다. workers가 1이면 None입니다.
+        """
+        if self.workers == 1:
+            return None
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=warm_process,
+                    initargs=(self.markdown_engine,),
+                )
+            return self.executor
+
+    def build(self, resource_dir, output=None, progress=None, sample=None):
+        """
+        resource 폴더로 EPUB3를 만듭니다.
+        output이 None이면 EPUB 바이트를 반환하고, 쓰기 가능한 바이너리 스트림이면 그 스트림에
+        seek 없이 쓰며, 경로이면 그 파일에 저장합니다. (스트림과 경로는 그대로 반환)
+        validate가 True이면 바이트와 파일 출력은 구조를 검사하고, 오류가 있으면
+        epub_validator.EpubValidationError를 올립니다. (스트림은 다시 읽을 수 없어 건너뜀)
+        validate가 epub_validator.VALIDATE_WARN이면 오류를 알리기만 합니다.
+        reproducible이 True이면 같은 입력에서 바이트 단위로 같은 EPUB을 만듭니다.
+        compression이 max이면 메모리에 쓴 뒤 모든 항목을 다시 압축하여 내보냅니다.
+        변환에 실패하면 예외를 그대로 올립니다.
+        progress와 sample은 convert_resource_to_epub과 같습니다.
+        """
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = self._build(resource_dir, output, as_progress(progress), sample)
+            ok = True
+            return result
+        finally:
+            record_build(time.perf_counter() - started, ok)
+
+    def _build(self, resource_dir, output, progress, sample):
+        with build_workspace(
+            self.workspace_dir, self.keep_workspace, BUILDER_WORKSPACE_PREFIX
+        ) as workspace:
+            html_dir = workspace / "html"
+            convert_resource_to_html(
+                resource_dir,
+                html_dir,
+                search_index=self.search_index,
+                markdown_engine=self.markdown_engine,
+                image_options=self.image_options,
+                image_cache_dir=self.image_cache_dir,
+                content_cache_dir=self.content_cache_dir,
+                workers=self.workers,
+                page_chars=self.page_chars,
+                toc_options=self.toc_options,
+                sample=sample,
+                progress=progress,
+                executor=self._get_executor(),
+            )
+            book = build_epub_book(
+                html_dir,
+                read_resource_metadata(resource_dir),
+                embed_search_index=self.search_index,
+                default_identifier=default_identifier(output, self.reproducible),
+                toc_options=self.toc_options,
+                progress=progress,
+            )
+
+            with progress.stage("epub.write", 1) as stage:
+                if output is None or self.compression == "max":
+                    stream = io.BytesIO()
+                elif is_stream(output):
+                    stream = output
+                else:
+                    stream = open(output, "wb")
+                try:
+                    size = write_epub_stream(
+                        book,
+                        stream,
+                        compressed_cache=self.compressed_cache,
+                        build_time=(
+                            reproducible_build_time() if self.reproducible else None
+                        ),
+                        compress_level=zlib_level(
+                            COMPRESSION_LEVELS[self.compression]
+                        ),
+                    )
+                finally:
+                    if stream is not output and not isinstance(stream, io.BytesIO):
+                        stream.close()
+                stage.advance(nbytes=size)
+
+        if self.compression == "max":
+            with progress.stage("epub.compress", 1) as stage:
+                stream.seek(0)
+                written = io.BytesIO() if output is None else output
+                stats = recompress_epub(stream, written)
+                stream = written
+                stage.advance(nbytes=stats["uncompressed"])
+            progress.message(format_compression_report(self.compression, stats))
+
+        if self.validate and not is_stream(output):
+            with progress.stage("epub.validate", 1) as stage:
+                check_epub(stream if output is None else output, progress, self.validate)
+                stage.advance(nbytes=size)
+        return stream.getvalue() if output is None else output
+
+    def close(self):
+        """
+        작업 프로세스 풀을 정리하고 압축 결과 캐시를 비웁니다.
+        """
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+        self.compressed_cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="여러 resource 폴더를 한 프로세스에서 연달아 EPUB으로 변환합니다. "
+        "글꼴 압축 결과, 작업 프로세스, 템플릿을 책 사이에 재사용합니다."
+    )
+    parser.add_argument(
+        "resource_dirs", nargs="+", help="리소스 디렉토리 경로 (여러 개 가능)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=".",
+        help="EPUB을 저장할 디렉토리, 파일 이름은 <리소스 폴더 이름>.epub (기본값: 현재 디렉토리)",
+    )
+    parser.add_argument(
+        "--markdown-engine",
+        choices=sorted(MARKDOWN_ENGINES),
+        default="native",
+        help="마크다운 엔진: native(빠른 내장 엔진) 또는 markdown(확장 기능 지원) (기본값: native)",
+    )
+    parser.add_argument(
+        "--search-index",
+        action="store_true",
+        help="본문 검색 색인을 EPUB 안에 넣습니다",
+    )
+    parser.add_argument(
+        "--no-validate",
+        dest="validate",
+        action="store_false",
+        help="생성된 EPUB의 구조 검사를 건너뜁니다",
+    )
+    add_validation_arguments(parser)
+    add_image_arguments(parser)
+    add_build_arguments(parser)
+    add_page_map_arguments(parser)
+    add_toc_arguments(parser)
+    add_workspace_arguments(parser)
+    add_progress_arguments(parser)
+    add_reproducible_arguments(parser)
+    add_compression_arguments(parser)
+    add_metrics_arguments(parser)
+    add_batch_arguments(parser)
+
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    progress = progress_from_args(args)
+    metrics_from_args(args)
+    builder_options = dict(
+        markdown_engine=args.markdown_engine,
+        image_options=image_options_from_args(args),
+        image_cache_dir=args.image_cache_dir,
+        content_cache_dir=args.content_cache_dir,
+        workers=args.workers,
+        page_chars=page_chars_from_args(args),
+        toc_options=toc_options_from_args(args),
+        search_index=args.search_index,
+        validate=validation_from_args(args),
+        workspace_dir=args.workspace_dir,
+        keep_workspace=args.keep_workspace,
+        reproducible=args.reproducible,
+        compression=args.compression,
+    )
+    titles = [
+        (resource_dir, output_dir / f"{Path(resource_dir).resolve().name}.epub")
+        for resource_dir in args.resource_dirs
+    ]
+
+    memory_budget = batch_from_args(args)
+    if memory_budget is not None:
+        results = run_batch(
+            titles,
+            builder_options,
+            memory_budget,
+            args.workers,
+            args.memory_history,
+            progress,
+            on_finish=lambda result: write_metrics_from_args(args),
+        )
+        return 1 if any(result.status != "ok" for result in results) else 0
+
+    failed = 0
+    with Builder(**builder_options) as builder:
+        for resource_dir, output_file in titles:
+            try:
+                builder.build(resource_dir, output_file, progress)
+            except Exception as e:
+                progress.message(
+                    f"EPUB 파일 생성 중 오류가 발생했습니다: {resource_dir} ({e})", "error"
+                )
+                failed += 1
+                continue
+            finally:
+                # 긴 일괄 변환 중에도 수집기가 진행 상황을 볼 수 있도록 책마다 갱신
+                write_metrics_from_args(args)
+            progress.message(f"EPUB 파일이 성공적으로 생성되었습니다: {output_file}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
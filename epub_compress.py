@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import zlib
+import shutil
+import zipfile
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from build_plan import format_bytes
+from epub_zip import STORED_ENTRIES, ZipStreamWriter, read_raw_entry
+from metrics import inc
+
+# --compression 옵션 값: fast(개발용, 빠름), default(zlib 기본), max(배포용, 가장 작음)
+COMPRESSION_PROFILES = ("fast", "default", "max")
+
+# 프로필별로 EPUB을 쓸 때의 zlib 압축 수준 (None: 기본 수준)
+# max는 빠르게 쓴 뒤 recompress_epub으로 모든 항목을 다시 압축하므로 처음에는 1로 씀
+COMPRESSION_LEVELS = {"fast": 1, "default": None, "max": 1}
+
+# max 프로필에서 Zopfli로 다시 압축할 텍스트 항목 (나머지는 zlib 9)
+TEXT_EXTENSIONS = (
+    ".xhtml",
+    ".html",
+    ".htm",
+    ".css",
+    ".ncx",
+    ".opf",
+    ".xml",
+    ".json",
+    ".svg",
+    ".js",
+)
+
+# Zopfli 반복 횟수 (큰 항목은 시간이 오래 걸리므로 줄임)
+ZOPFLI_ITERATIONS = 15
+ZOPFLI_LARGE_ITERATIONS = 5
+ZOPFLI_LARGE_ENTRY_BYTES = 1024**2
+# 이보다 작은 항목은 블록 분할을 하지 않음 (분할 준비에 항목마다 0.3초쯤 걸리지만 작은 항목은 이득이 없음)
+ZOPFLI_BLOCK_SPLIT_BYTES = 16 * 1024
+
+
+def zlib_level(compress_level):
+    """
+    EPUB을 처음 쓸 때의 zlib 압축 수준을 반환합니다.
+    compress_level은 COMPRESSION_LEVELS의 값이며, None이면 zlib 기본 수준입니다.
+    """
+    return zlib.Z_DEFAULT_COMPRESSION if compress_level is None else compress_level
+
+
+def load_zopfli():
+    """
+    zopfli 모듈을 불러옵니다. 설치되어 있지 않으면 None을 반환합니다.
+    """
+    try:
+        import zopfli.zopfli
+    except ImportError:
+        return None
+    return zopfli.zopfli
+
+
+def _deflate_max(data, use_zopfli):
+    """
+    data를 가장 작은 raw deflate로 압축합니다.
+    use_zopfli가 True이면 Zopfli로도 압축하여 zlib 9와 비교해 더 작은 쪽을 씁니다.
+    """
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, 9)
+    compressed = compressor.compress(data) + compressor.flush()
+    zopfli = load_zopfli() if use_zopfli else None
+    if zopfli is None:
+        return compressed
+    iterations = (
+        ZOPFLI_LARGE_ITERATIONS
+        if len(data) > ZOPFLI_LARGE_ENTRY_BYTES
+        else ZOPFLI_ITERATIONS
+    )
+    # zlib 형식(헤더 2바이트, adler32 4바이트)에서 raw deflate만 꺼냄
+    zopfli_compressed = zopfli.compress(
+        data,
+        numiterations=iterations,
+        blocksplitting=int(len(data) >= ZOPFLI_BLOCK_SPLIT_BYTES),
+    )[2:-4]
+    return min(compressed, zopfli_compressed, key=len)
+
+
+def _recompress_entry(data, raw_size, use_zopfli):
+    """
+    항목 하나를 다시 압축합니다. 원래보다 작아지면 (압축 방식, 바이트), 아니면 None을 반환합니다.
+    압축하지 않고 저장하는 쪽이 더 작으면 저장합니다.
+    """
+    compressed = _deflate_max(data, use_zopfli)
+    if len(data) <= len(compressed):
+        method, compressed = zipfile.ZIP_STORED, data
+    else:
+        method = zipfile.ZIP_DEFLATED
+    if len(compressed) >= raw_size:
+        return None
+    return method, compressed
+
+
+def is_text_entry(name):
+    return name.lower().endswith(TEXT_EXTENSIONS)
+
+
+def compression_stats(source):
+    """
+    EPUB(경로 또는 바이너리 파일 객체)의 중앙 디렉토리에서 압축 통계를 읽습니다.
+    """
+    with zipfile.ZipFile(source) as zf:
+        infos = zf.infolist()
+    return {
+        "entries": len(infos),
+        "uncompressed": sum(info.file_size for info in infos),
+        "compressed": sum(info.compress_size for info in infos),
+    }
+
+
+def _open_output(output):
+    if hasattr(output, "write"):
+        return output, False
+    return open(output, "wb"), True
+
+
+def recompress_epub(source, output=None, workers=None, use_zopfli=True):
+    """
+    EPUB의 모든 항목을 가장 높은 압축 수준으로 다시 압축합니다. (배포용 max 프로필)
+    텍스트 항목(XHTML, CSS, 목차 등)은 zopfli가 설치되어 있으면 Zopfli로, 없으면 zlib 9로 압축하고
+    나머지는 zlib 9로 압축합니다. 더 작아지지 않는 항목은 원래 바이트를 그대로 씁니다.
+    항목 순서와 수정 시각을 유지하므로 재현 가능한 빌드는 다시 압축한 뒤에도 재현 가능합니다.
+    (같은 zlib, zopfli 버전일 때)
+    항목들은 workers개의 작업자가 나누어 압축합니다. (Zopfli는 프로세스, zlib은 스레드)
+    source는 경로 또는 seek 가능한 바이너리 파일 객체이고, output은 경로 또는 쓰기 가능한 바이너리
+    스트림입니다. output이 None이면 source 파일을 바꿉니다.
+    통계 사전(entries, recompressed, before, after, uncompressed, zopfli)을 반환합니다.
+    """
+    zopfli_used = use_zopfli and load_zopfli() is not None
+    if output is None:
+        source = Path(source)
+        fd, temp_name = tempfile.mkstemp(
+            prefix=f".{source.name}.", suffix=".tmp", dir=source.parent
+        )
+        os.close(fd)
+        try:
+            stats = recompress_epub(source, temp_name, workers, use_zopfli)
+            shutil.copymode(source, temp_name)
+            os.replace(temp_name, source)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+        return stats
+
+    with zipfile.ZipFile(source) as zf:
+        infos = zf.infolist()
+        raw_entries = [read_raw_entry(zf.fp, info) for info in infos]
+        contents = [zf.read(info) for info in infos]
+
+    jobs = [
+        (info, raw, data)
+        for info, raw, data in zip(infos, raw_entries, contents)
+        if info.filename not in STORED_ENTRIES
+    ]
+    executor_class = ProcessPoolExecutor if zopfli_used else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        results = executor.map(
+            _recompress_entry,
+            [data for _, _, data in jobs],
+            [len(raw) for _, raw, _ in jobs],
+            [zopfli_used and is_text_entry(info.filename) for info, _, _ in jobs],
+        )
+        recompressed = dict(
+            (info.filename, result)
+            for (info, _, _), result in zip(jobs, results)
+            if result is not None
+        )
+
+    inc(
+        "md_to_epub_deflate_input_bytes_total",
+        sum(len(data) for info, _, data in jobs if info.filename in recompressed),
+    )
+    inc(
+        "md_to_epub_deflate_output_bytes_total",
+        sum(len(result[1]) for result in recompressed.values()),
+    )
+
+    stream, should_close = _open_output(output)
+    try:
+        zip_writer = ZipStreamWriter(stream)
+        after = 0
+        for info, raw in zip(infos, raw_entries):
+            method, compressed = recompressed.get(
+                info.filename, (info.compress_type, raw)
+            )
+            zip_writer.add_raw(info, compressed, method)
+            after += len(compressed)
+        zip_writer.close()
+    finally:
+        if should_close:
+            stream.close()
+
+    return {
+        "entries": len(infos),
+        "recompressed": len(recompressed),
+        "before": sum(info.compress_size for info in infos),
+        "after": after,
+        "uncompressed": sum(info.file_size for info in infos),
+        "zopfli": zopfli_used,
+    }
+
+
+def format_compression_report(profile, stats):
+    """
+    압축 프로필의 결과를 한 줄로 표시합니다. 크기 비교 기준은 압축하지 않은 항목 크기의 합입니다.
+    """
+    uncompressed = stats["uncompressed"]
+    compressed = stats.get("after", stats.get("compressed"))
+    saved = 1 - compressed / uncompressed if uncompressed else 0
+    text = (
+        f"압축 프로필 {profile}: {format_bytes(uncompressed)} -> "
+        f"{format_bytes(compressed)} ({saved:.1%} 줄임"
+    )
+    if "recompressed" in stats:
+        encoder = "Zopfli" if stats["zopfli"] else "zlib 9"
+        text += f", 항목 {stats['recompressed']}개 다시 압축, {encoder}"
+    return text + ")"
+
+
+def add_compression_arguments(parser):
+    """
+    압축 프로필 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSION_PROFILES,
+        default="default",
+        help="EPUB 압축 프로필: fast(zlib 1, 개발용), default(zlib 기본), "
+        "max(배포용, 텍스트 항목은 Zopfli(설치된 경우) 또는 zlib 9로 병렬 재압축) "
+        "(기본값: default)",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="이미 만든 EPUB을 max 압축 프로필로 다시 압축합니다."
+    )
+    parser.add_argument("epub_file", help="다시 압축할 EPUB 파일")
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        help="저장할 EPUB 파일 (기본값: 입력 파일을 바꿈)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="동시에 압축할 작업자 수 (기본값: CPU 코어 수)",
+    )
+    parser.add_argument(
+        "--no-zopfli",
+        dest="zopfli",
+        action="store_false",
+        help="zopfli가 설치되어 있어도 zlib 9만 사용합니다",
+    )
+    args = parser.parse_args()
+
+    try:
+        stats = recompress_epub(
+            args.epub_file, args.output_file, args.workers, args.zopfli
+        )
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"EPUB을 다시 압축하지 못했습니다: {e}", file=sys.stderr)
+        return 1
+    print(format_compression_report("max", stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
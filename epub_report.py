@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+import json
+import zipfile
+import argparse
+import posixpath
+
+from build_plan import format_bytes
+from image_pipeline import IMAGE_MEDIA_TYPES
+
+REPORT_VERSION = 1
+
+# 항목 분류 (보고서에 표시하는 순서)
+CATEGORIES = ("font", "image", "xhtml", "css", "nav", "data", "package")
+CATEGORY_LABELS = {
+    "font": "글꼴",
+    "image": "표지/이미지",
+    "xhtml": "본문 XHTML",
+    "css": "스타일",
+    "nav": "목차/내비게이션",
+    "data": "데이터(JSON)",
+    "package": "패키지(OPF 등)",
+}
+
+FONT_EXTENSIONS = (".woff2", ".woff", ".ttf", ".otf")
+XHTML_EXTENSIONS = (".html", ".xhtml", ".htm")
+NAV_FILE_PATTERN = re.compile(r"^(nav\.xhtml|toc\.ncx|toc(_\d+)?\.html)$")
+
+# 본문 XHTML에서 생성기가 넣는 마크업 (ebooklib이 <br/>, <p>로 다시 씀)
+BR_PATTERN = re.compile(rb"<br\s*/?>")
+P_TAG_PATTERN = re.compile(rb"</?p(?:\s[^>]*)?>")
+TAG_PATTERN = re.compile(rb"<[^>]+>")
+
+# 보고서에 보여 줄 가장 큰 항목 수
+DEFAULT_TOP_COUNT = 10
+
+
+def entry_category(name):
+    """
+    EPUB 항목 이름으로 분류를 정합니다.
+    """
+    base = posixpath.basename(name)
+    extension = posixpath.splitext(base)[1].lower()
+    if extension in FONT_EXTENSIONS:
+        return "font"
+    if extension in IMAGE_MEDIA_TYPES:
+        return "image"
+    if NAV_FILE_PATTERN.match(base):
+        return "nav"
+    if extension in XHTML_EXTENSIONS:
+        return "xhtml"
+    if extension == ".css":
+        return "css"
+    if extension == ".json":
+        return "data"
+    return "package"
+
+
+def _ratio(compressed, uncompressed):
+    return round(compressed / uncompressed, 3) if uncompressed else 1.0
+
+
+def _size_summary(entries):
+    compressed = sum(entry["compressed"] for entry in entries)
+    uncompressed = sum(entry["uncompressed"] for entry in entries)
+    return {
+        "count": len(entries),
+        "compressed": compressed,
+        "uncompressed": uncompressed,
+        "ratio": _ratio(compressed, uncompressed),
+    }
+
+
+def markup_overhead(content):
+    """
+    XHTML 문서 하나에서 본문 글자와 마크업이 차지하는 바이트 수를 셉니다.
+    br은 <br/> 태그, p는 <p>와 </p> 태그, other_tags는 나머지 태그, text는 태그 밖의 내용입니다.
+    """
+    br = sum(len(match) for match in BR_PATTERN.findall(content))
+    p = sum(len(match) for match in P_TAG_PATTERN.findall(content))
+    tags = sum(len(match) for match in TAG_PATTERN.findall(content))
+    return {
+        "bytes": len(content),
+        "text": len(content) - tags,
+        "br": br,
+        "p": p,
+        "other_tags": tags - br - p,
+    }
+
+
+def build_report(epub_file, top=DEFAULT_TOP_COUNT, markup=True):
+    """
+    EPUB의 크기 구성을 항목별, 분류별로 계산하여 직렬화 가능한 사전으로 반환합니다.
+    크기와 압축률은 zip 중앙 디렉토리만 읽어 구하며 파일을 풀지 않습니다.
+    markup이 True이면 본문 XHTML을 메모리에서만 읽어 마크업 비중도 계산합니다.
+    """
+    with zipfile.ZipFile(epub_file) as zf:
+        entries = [
+            {
+                "name": info.filename,
+                "category": entry_category(info.filename),
+                "compressed": info.compress_size,
+                "uncompressed": info.file_size,
+                "ratio": _ratio(info.compress_size, info.file_size),
+            }
+            for info in zf.infolist()
+            if not info.is_dir()
+        ]
+
+        overhead = None
+        if markup:
+            overhead = {"bytes": 0, "text": 0, "br": 0, "p": 0, "other_tags": 0}
+            for entry in entries:
+                if entry["category"] == "xhtml":
+                    for key, value in markup_overhead(zf.read(entry["name"])).items():
+                        overhead[key] += value
+            markup_bytes = overhead["bytes"] - overhead["text"]
+            overhead["markup_share"] = _ratio(markup_bytes, overhead["bytes"])
+
+    by_size = sorted(entries, key=lambda entry: entry["compressed"], reverse=True)
+    return {
+        "version": REPORT_VERSION,
+        "file": str(epub_file),
+        "total": _size_summary(entries),
+        "categories": {
+            category: _size_summary(
+                [entry for entry in entries if entry["category"] == category]
+            )
+            for category in CATEGORIES
+        },
+        "largest_entries": by_size[:top],
+        "largest_chapters": [
+            entry for entry in by_size if entry["category"] == "xhtml"
+        ][:top],
+        "markup": overhead,
+        "entries": entries,
+    }
+
+
+def _percent(part, whole):
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+def print_report(report):
+    """
+    크기 보고서를 사람이 읽기 쉬운 형식으로 출력합니다.
+    """
+    total = report["total"]
+    print(
+        f"EPUB 크기 보고서: {report['file']} "
+        f"(압축 {format_bytes(total['compressed'])}, 원본 {format_bytes(total['uncompressed'])}, "
+        f"항목 {total['count']}개)"
+    )
+    # 한글은 화면에서 두 칸을 차지하므로 제목 줄은 글자 수의 두 배 폭으로 맞추고 분류 이름은 맨 뒤에 출력
+    headers = (("개수", 6), ("압축", 12), ("원본", 12), ("압축률", 8), ("비중", 8))
+    print("  " + "".join(" " * (width - 2 * len(name)) + name for name, width in headers) + "  분류")
+    for category in CATEGORIES:
+        summary = report["categories"][category]
+        if not summary["count"]:
+            continue
+        print(
+            f"  {summary['count']:>6}"
+            f"{format_bytes(summary['compressed']):>12}"
+            f"{format_bytes(summary['uncompressed']):>12}"
+            f"{summary['ratio']:>8.3f}"
+            f"{_percent(summary['compressed'], total['compressed']):>8}"
+            f"  {CATEGORY_LABELS[category]}"
+        )
+
+    print("  가장 큰 항목 (압축 크기 기준):")
+    for entry in report["largest_entries"]:
+        print(
+            f"    {format_bytes(entry['compressed']):>10}  {entry['name']} "
+            f"({CATEGORY_LABELS[entry['category']]}, 압축률 {entry['ratio']:.3f})"
+        )
+    print("  가장 큰 챕터:")
+    for entry in report["largest_chapters"]:
+        print(
+            f"    {format_bytes(entry['compressed']):>10}  {entry['name']} "
+            f"(원본 {format_bytes(entry['uncompressed'])})"
+        )
+
+    markup = report["markup"]
+    if markup:
+        print(
+            f"  본문 XHTML 구성 (원본 {format_bytes(markup['bytes'])}): "
+            f"글자 {_percent(markup['text'], markup['bytes'])}, "
+            f"<br/> {_percent(markup['br'], markup['bytes'])}, "
+            f"<p> {_percent(markup['p'], markup['bytes'])}, "
+            f"기타 태그 {_percent(markup['other_tags'], markup['bytes'])}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="EPUB 파일의 크기를 항목별, 분류별로 나누어 보고합니다."
+    )
+    parser.add_argument("epub_file", help="보고할 EPUB 파일 경로")
+    parser.add_argument(
+        "--json", action="store_true", help="보고서를 JSON으로 출력합니다"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=DEFAULT_TOP_COUNT,
+        help=f"가장 큰 항목과 챕터를 몇 개까지 보여 줄지 (기본값: {DEFAULT_TOP_COUNT})",
+    )
+    parser.add_argument(
+        "--no-markup",
+        dest="markup",
+        action="store_false",
+        help="본문 XHTML의 마크업 비중 계산을 건너뜁니다 (중앙 디렉토리만 읽음)",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        report = build_report(args.epub_file, args.top, args.markup)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"오류: EPUB 파일을 읽을 수 없습니다: {e}")
+        return 1
+
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import zlib
+import zipfile
+import argparse
+from pathlib import Path
+
+from build_workspace import add_workspace_arguments, build_workspace
+from epub_validator import (
+    EpubValidationError,
+    add_validation_arguments,
+    check_epub,
+    validation_from_args,
+)
+from epub_zip import ZipStreamWriter, collect_book_entries, read_raw_entry
+from image_pipeline import add_image_arguments, image_options_from_args
+from markdown_engines import MARKDOWN_ENGINES
+from reproducible_build import add_reproducible_arguments, reproducible_build_time
+from resource_to_epub import (
+    build_epub_book,
+    default_identifier,
+    read_resource_metadata,
+)
+from resource_to_html import add_build_arguments, convert_resource_to_html
+from page_map import PAGE_MAP_EPUB_PATH, add_page_map_arguments, page_chars_from_args
+from search_index import SEARCH_INDEX_EPUB_PATH
+from toc_tree import add_toc_arguments, toc_options_from_args
+
+
+def update_epub(
+    epub_file,
+    resource_dir,
+    output_file=None,
+    validate=True,
+    workspace_dir=None,
+    reproducible=False,
+    keep_workspace=False,
+    **html_options,
+):
+    """
+    기존 EPUB을 새 리소스 디렉토리 내용으로 갱신합니다.
+
+    1. 리소스를 HTML로 변환하고 EPUB 항목들을 메모리에서 만듭니다. (압축하지 않음)
+    2. 각 항목의 CRC와 크기를 기존 EPUB의 중앙 디렉토리와 비교합니다.
+    3. 같은 항목은 기존 EPUB의 압축된 바이트를 그대로 복사하고, 바뀐 항목만 새로 압축합니다.
+
+    헤딩이 바뀌면 nav/NCX/OPF 항목도 바뀌므로 함께 다시 씁니다.
+    output_file이 없으면 epub_file을 덮어씁니다.
+    중간 HTML은 workspace_dir 아래(build_workspace 참고)에 만든 작업 공간에 만들어지고 끝나면 삭제됩니다.
+    (keep_workspace가 True이거나 변환에 실패하면 남겨 둠)
+    reproducible이 True이면 빌드 시각과 식별자를 고정하므로(resource_to_epub의 --reproducible과 같음)
+    원고가 그대로인 항목은 OPF까지 그대로 복사됩니다.
+    validate는 resource_to_epub.convert_html_to_epub과 같으며, 검사 오류가 있으면
+    기존 파일을 바꾸지 않고 epub_validator.EpubValidationError를 올립니다.
+    html_options는 convert_resource_to_html에 그대로 전달되며, toc_options는 내비게이션 목차에도 사용됩니다.
+    page_chars가 없으면 기존 EPUB의 위치 지도에 기록된 쪽 글자 수를 사용합니다.
+    바뀐 항목, 그대로 복사한 항목, 삭제된 항목 이름 목록을 반환합니다.
+    """
+    epub_file = Path(epub_file)
+    output_file = Path(output_file) if output_file else epub_file
+
+    with zipfile.ZipFile(epub_file) as old_epub:
+        old_entries = {info.filename: info for info in old_epub.infolist()}
+
+        # 쪽 글자 수를 주지 않았고 기존 EPUB에 위치 지도가 있었으면 같은 쪽 글자 수로 다시 만듦
+        for name in old_entries:
+            if name.endswith(PAGE_MAP_EPUB_PATH) and html_options.get("page_chars") is None:
+                html_options["page_chars"] = json.loads(old_epub.read(name))["page_chars"]
+
+    # 기존 EPUB에 검색 색인이 있었으면 새 EPUB에도 넣음
+    embed_search_index = any(
+        name.endswith(SEARCH_INDEX_EPUB_PATH) for name in old_entries
+    )
+
+    build_time = reproducible_build_time() if reproducible else None
+    with build_workspace(
+        workspace_dir, keep_workspace, prefix="md_to_epub_update_"
+    ) as html_dir:
+        convert_resource_to_html(
+            resource_dir, html_dir, search_index=embed_search_index, **html_options
+        )
+        book = build_epub_book(
+            html_dir,
+            read_resource_metadata(resource_dir),
+            embed_search_index,
+            default_identifier=default_identifier(output_file, reproducible),
+            toc_options=html_options.get("toc_options"),
+        )
+        new_entries = collect_book_entries(book, build_time=build_time)
+
+    result = {"changed": [], "unchanged": [], "removed": []}
+    temp_file = output_file.with_name(f".{output_file.name}.tmp")
+    try:
+        with open(epub_file, "rb") as old_stream, open(temp_file, "wb") as out:
+            writer = ZipStreamWriter(
+                out, date_time=build_time.timetuple()[:6] if build_time else None
+            )
+            for name, data in new_entries:
+                info = old_entries.get(name)
+                if (
+                    info is not None
+                    and info.file_size == len(data)
+                    and info.CRC == zlib.crc32(data)
+                ):
+                    writer.add_raw(info, read_raw_entry(old_stream, info))
+                    result["unchanged"].append(name)
+                else:
+                    writer.add(name, data)
+                    result["changed"].append(name)
+            writer.close()
+
+        # 검사를 통과한 경우에만 기존 파일을 바꿈 (실패하면 기존 EPUB을 그대로 둠)
+        if validate:
+            check_epub(temp_file, validate=validate)
+        os.replace(temp_file, output_file)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+    new_names = {name for name, _ in new_entries}
+    result["removed"] = [name for name in old_entries if name not in new_names]
+
+    print(
+        f"EPUB 파일을 갱신했습니다: {output_file} "
+        f"(변경 {len(result['changed'])}개, 유지 {len(result['unchanged'])}개, "
+        f"삭제 {len(result['removed'])}개)"
+    )
+    for name in result["changed"]:
+        print(f"  변경: {name}")
+    for name in result["removed"]:
+        print(f"  삭제: {name}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="기존 EPUB에서 바뀐 항목만 새 리소스 내용으로 갱신합니다."
+    )
+    parser.add_argument("epub_file", help="갱신할 EPUB 파일 경로")
+    parser.add_argument(
+        "--resource-dir",
+        default="resource",
+        help="리소스 디렉토리 경로 (기본값: resource)",
+    )
+    parser.add_argument(
+        "--output-file",
+        default=None,
+        help="갱신된 EPUB을 저장할 경로 (기본값: 기존 파일 덮어쓰기)",
+    )
+    parser.add_argument(
+        "--no-validate",
+        dest="validate",
+        action="store_false",
+        help="갱신된 EPUB의 구조 검사를 건너뜁니다",
+    )
+    add_validation_arguments(parser)
+    parser.add_argument(
+        "--markdown-engine",
+        choices=sorted(MARKDOWN_ENGINES),
+        default="native",
+        help="마크다운 엔진: native(빠른 내장 엔진) 또는 markdown(확장 기능 지원) (기본값: native)",
+    )
+    add_image_arguments(parser)
+    add_build_arguments(parser)
+    add_page_map_arguments(parser)
+    add_toc_arguments(parser)
+    add_workspace_arguments(parser)
+    add_reproducible_arguments(parser)
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.epub_file):
+        print(f"오류: EPUB 파일 '{args.epub_file}'을 찾을 수 없습니다.")
+        return 1
+    if not os.path.exists(args.resource_dir):
+        print(f"오류: 리소스 디렉토리 '{args.resource_dir}'을 찾을 수 없습니다.")
+        return 1
+
+    try:
+        update_epub(
+            args.epub_file,
+            args.resource_dir,
+            args.output_file,
+            validation_from_args(args),
+            args.workspace_dir,
+            args.reproducible,
+            args.keep_workspace,
+            markdown_engine=args.markdown_engine,
+            image_options=image_options_from_args(args),
+            image_cache_dir=args.image_cache_dir,
+            content_cache_dir=args.content_cache_dir,
+            workers=args.workers,
+            page_chars=page_chars_from_args(args),
+            toc_options=toc_options_from_args(args),
+        )
+    except EpubValidationError as e:
+        print(f"오류: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
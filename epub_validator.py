@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+import zipfile
+import argparse
+import posixpath
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+from collections import namedtuple
+from urllib.parse import unquote, urlsplit
+
+from progress import as_progress
+
+CONTAINER_PATH = "META-INF/container.xml"
+EPUB_MIMETYPE = b"application/epub+zip"
+
+OPF_NS = "{http://www.idpf.org/2007/opf}"
+CONTAINER_NS = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+
+# ID 색인과 참조 검사를 위해 파싱하는 문서 종류
+XHTML_MEDIA_TYPES = ("application/xhtml+xml", "text/html")
+NCX_MEDIA_TYPE = "application/x-dtbncx+xml"
+
+# 스파인에 들어갈 수 있는 문서 종류
+SPINE_MEDIA_TYPES = ("application/xhtml+xml", "image/svg+xml")
+
+# 다른 리소스를 가리키는 속성 (요소 이름, 속성 이름)
+REFERENCE_ATTRIBUTES = {
+    ("a", "href"),
+    ("link", "href"),
+    ("img", "src"),
+    ("image", "href"),
+    ("content", "src"),
+}
+
+# validate 인자의 값: 검사 오류가 있어도 빌드를 실패로 처리하지 않고 알리기만 함 (--allow-invalid)
+VALIDATE_WARN = "warn"
+
+# chapter_2.html처럼 번호가 붙은 파일 이름
+NUMBERED_FILE_PATTERN = re.compile(r"^(.*?)(\d+)\.x?html?$")
+
+ValidationIssue = namedtuple("ValidationIssue", ["level", "path", "message"])
+
+ERROR = "error"
+WARNING = "warning"
+
+
+class _DocumentScanner:
+    """
+    XHTML/NCX 문서를 한 번 훑으면서 ID 목록과 다른 리소스에 대한 참조를 모읍니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = set()
+        self.duplicate_ids = []
+        self.references = []
+
+    def start_element(self, name, attrs):
+        local_name = name.rsplit(":", 1)[-1]
+        element_id = attrs.get("id")
+        if element_id is not None:
+            if element_id in self.ids:
+                self.duplicate_ids.append(element_id)
+            else:
+                self.ids.add(element_id)
+
+        for attr_name, value in attrs.items():
+            if (local_name, attr_name.rsplit(":", 1)[-1]) in REFERENCE_ATTRIBUTES:
+                self.references.append(value)
+
+    def scan(self, data):
+        parser = xml.parsers.expat.ParserCreate()
+        parser.StartElementHandler = self.start_element
+        parser.Parse(data, True)
+
+
+def _resolve(base_path, href):
+    """
+    문서 기준 상대 경로를 컨테이너 안의 경로와 fragment로 나눕니다.
+    외부 링크이면 None을 반환합니다.
+    """
+    parts = urlsplit(href)
+    if parts.scheme or parts.netloc:
+        return None
+    if parts.path:
+        target = posixpath.normpath(
+            posixpath.join(posixpath.dirname(base_path), unquote(parts.path))
+        )
+    else:
+        target = base_path
+    fragment = unquote(parts.fragment) if "#" in href else None
+    return target, fragment
+
+
+def _read_rootfile(archive, issues):
+    """
+    container.xml에서 OPF 경로를 읽습니다.
+    """
+    try:
+        container = ET.fromstring(archive.read(CONTAINER_PATH))
+    except KeyError:
+        issues.append(ValidationIssue(ERROR, CONTAINER_PATH, "파일이 없습니다."))
+        return None
+    except ET.ParseError as e:
+        issues.append(ValidationIssue(ERROR, CONTAINER_PATH, f"XML 오류: {e}"))
+        return None
+
+    rootfile = container.find(f"{CONTAINER_NS}rootfiles/{CONTAINER_NS}rootfile")
+    if rootfile is None or not rootfile.get("full-path"):
+        issues.append(
+            ValidationIssue(ERROR, CONTAINER_PATH, "rootfile 항목이 없습니다.")
+        )
+        return None
+    return rootfile.get("full-path")
+
+
+def _check_container(archive, issues):
+    """
+    mimetype 항목과 container.xml 구성을 검사합니다.
+    """
+    entries = archive.infolist()
+    if not entries or entries[0].filename != "mimetype":
+        issues.append(
+            ValidationIssue(ERROR, "mimetype", "첫 번째 항목이 mimetype이 아닙니다.")
+        )
+    else:
+        mimetype = entries[0]
+        if mimetype.compress_type != zipfile.ZIP_STORED:
+            issues.append(
+                ValidationIssue(ERROR, "mimetype", "mimetype이 압축되어 있습니다.")
+            )
+        if mimetype.extra:
+            issues.append(
+                ValidationIssue(ERROR, "mimetype", "mimetype에 추가 필드가 있습니다.")
+            )
+        if archive.read(mimetype).strip() != EPUB_MIMETYPE:
+            issues.append(
+                ValidationIssue(ERROR, "mimetype", "mimetype 내용이 잘못되었습니다.")
+            )
+
+    return _read_rootfile(archive, issues)
+
+
+def validate_epub(epub_file):
+    """
+    EPUB 파일의 구조를 검사하고 ValidationIssue 목록을 반환합니다.
+
+    검사 항목:
+    1. mimetype과 container.xml 구성
+    2. 매니페스트 항목의 존재 여부와 ID 중복
+    3. 스파인과 매니페스트의 일관성, 번호 붙은 챕터의 순서
+    4. 문서 안의 중복 ID
+    5. 목차(nav/NCX)와 본문 링크가 가리키는 파일과 ID의 존재 여부
+    """
+    issues = []
+
+    try:
+        archive = zipfile.ZipFile(epub_file)
+    except (OSError, zipfile.BadZipFile) as e:
+        return [ValidationIssue(ERROR, str(epub_file), f"ZIP 파일을 열 수 없습니다: {e}")]
+
+    with archive:
+        opf_path = _check_container(archive, issues)
+        if opf_path is None:
+            return issues
+
+        try:
+            package = ET.fromstring(archive.read(opf_path))
+        except KeyError:
+            issues.append(ValidationIssue(ERROR, opf_path, "OPF 파일이 없습니다."))
+            return issues
+        except ET.ParseError as e:
+            issues.append(ValidationIssue(ERROR, opf_path, f"XML 오류: {e}"))
+            return issues
+
+        entry_names = set(archive.namelist())
+        opf_dir = posixpath.dirname(opf_path)
+
+        # 매니페스트 검사
+        manifest = {}
+        manifest_paths = {}
+        for item in package.iter(f"{OPF_NS}item"):
+            item_id = item.get("id")
+            href = item.get("href", "")
+            path = posixpath.normpath(posixpath.join(opf_dir, unquote(href)))
+            if item_id in manifest:
+                issues.append(
+                    ValidationIssue(ERROR, opf_path, f"매니페스트 ID가 중복됩니다: {item_id}")
+                )
+            manifest[item_id] = (path, item.get("media-type", ""), item.get("properties", ""))
+            if path in manifest_paths:
+                issues.append(
+                    ValidationIssue(ERROR, opf_path, f"매니페스트 경로가 중복됩니다: {href}")
+                )
+            manifest_paths[path] = item.get("media-type", "")
+            if path not in entry_names:
+                issues.append(
+                    ValidationIssue(ERROR, path, "매니페스트에 있지만 EPUB에 파일이 없습니다.")
+                )
+
+        for name in entry_names:
+            if name == "mimetype" or name.startswith("META-INF/") or name == opf_path:
+                continue
+            if name.endswith("/"):
+                continue
+            if name not in manifest_paths:
+                issues.append(
+                    ValidationIssue(WARNING, name, "매니페스트에 없는 파일입니다.")
+                )
+
+        # 스파인 검사
+        spine_paths = []
+        seen_idrefs = set()
+        for itemref in package.iter(f"{OPF_NS}itemref"):
+            idref = itemref.get("idref")
+            if idref not in manifest:
+                issues.append(
+                    ValidationIssue(ERROR, opf_path, f"스파인 항목이 매니페스트에 없습니다: {idref}")
+                )
+                continue
+            if idref in seen_idrefs:
+                issues.append(
+                    ValidationIssue(ERROR, opf_path, f"스파인 항목이 중복됩니다: {idref}")
+                )
+            seen_idrefs.add(idref)
+            path, media_type, _ = manifest[idref]
+            if media_type not in SPINE_MEDIA_TYPES:
+                issues.append(
+                    ValidationIssue(ERROR, path, f"스파인 문서의 media-type이 잘못되었습니다: {media_type}")
+                )
+            spine_paths.append(path)
+
+        if not spine_paths:
+            issues.append(ValidationIssue(ERROR, opf_path, "스파인이 비어 있습니다."))
+
+        # 번호 붙은 파일(chapter_2, chapter_10 등)이 번호 순서대로 스파인에 있는지 검사
+        last_numbers = {}
+        for path in spine_paths:
+            match = NUMBERED_FILE_PATTERN.match(posixpath.basename(path))
+            if not match:
+                continue
+            prefix = posixpath.join(posixpath.dirname(path), match.group(1))
+            number = int(match.group(2))
+            if prefix in last_numbers and number < last_numbers[prefix][0]:
+                issues.append(
+                    ValidationIssue(
+                        ERROR,
+                        path,
+                        f"스파인 순서가 잘못되었습니다: {posixpath.basename(path)}이(가) "
+                        f"{posixpath.basename(last_numbers[prefix][1])} 뒤에 있습니다.",
+                    )
+                )
+            last_numbers[prefix] = (number, path)
+
+        # 문서를 한 번씩 훑어 ID 색인과 참조 목록 생성
+        id_index = {}
+        scanners = []
+        for path, media_type, _ in manifest.values():
+            if path not in entry_names:
+                continue
+            if media_type not in XHTML_MEDIA_TYPES and media_type != NCX_MEDIA_TYPE:
+                continue
+            scanner = _DocumentScanner(path)
+            try:
+                scanner.scan(archive.read(path))
+            except xml.parsers.expat.ExpatError as e:
+                issues.append(ValidationIssue(ERROR, path, f"XML 오류: {e}"))
+                continue
+            for element_id in scanner.duplicate_ids:
+                issues.append(
+                    ValidationIssue(ERROR, path, f"ID가 중복됩니다: {element_id}")
+                )
+            id_index[path] = scanner.ids
+            scanners.append(scanner)
+
+        # 참조 검사
+        for scanner in scanners:
+            for href in scanner.references:
+                resolved = _resolve(scanner.path, href)
+                if resolved is None:
+                    continue
+                target, fragment = resolved
+                if target not in manifest_paths:
+                    issues.append(
+                        ValidationIssue(ERROR, scanner.path, f"링크 대상 파일이 없습니다: {href}")
+                    )
+                    continue
+                if fragment is None:
+                    continue
+                if not fragment:
+                    issues.append(
+                        ValidationIssue(ERROR, scanner.path, f"링크의 fragment가 비어 있습니다: {href}")
+                    )
+                elif target in id_index and fragment not in id_index[target]:
+                    issues.append(
+                        ValidationIssue(ERROR, scanner.path, f"링크 대상 ID가 없습니다: {href}")
+                    )
+
+    return issues
+
+
+def print_issues(issues, progress=None):
+    """
+    검사 결과를 출력하고 오류 개수를 반환합니다.
+    progress(progress.Progress)가 주어지면 출력 대신 그쪽으로 메시지를 보냅니다.
+    """
+    progress = as_progress(progress)
+    errors = [issue for issue in issues if issue.level == ERROR]
+    for issue in issues:
+        label = "오류" if issue.level == ERROR else "경고"
+        progress.message(f"[{label}] {issue.path}: {issue.message}", issue.level)
+    if errors:
+        progress.message(
+            f"EPUB 검사 실패: 오류 {len(errors)}개, 경고 {len(issues) - len(errors)}개",
+            ERROR,
+        )
+    else:
+        progress.message(f"EPUB 검사 통과 (경고 {len(issues)}개)")
+    return len(errors)
+
+
+class EpubValidationError(Exception):
+    """
+    만든 EPUB의 구조 검사에서 오류가 나왔습니다.
+    """
+
+
+def check_epub(source, progress=None, validate=True):
+    """
+    EPUB(경로 또는 바이너리 파일 객체)을 검사하여 결과를 알리고 오류 개수를 반환합니다.
+    오류가 있으면 EpubValidationError를 올립니다. validate가 VALIDATE_WARN이면 알리기만 합니다.
+    """
+    errors = print_issues(validate_epub(source), progress)
+    if errors and validate != VALIDATE_WARN:
+        raise EpubValidationError(f"EPUB 구조 검사에서 오류 {errors}개가 나왔습니다.")
+    return errors
+
+
+def add_validation_arguments(parser):
+    """
+    구조 검사 오류를 경고로만 처리하는 옵션을 추가합니다. (검사를 건너뛰는 --no-validate는 명령마다 정의)
+    """
+    parser.add_argument(
+        "--allow-invalid",
+        action="store_true",
+        help="구조 검사에서 오류가 나와도 빌드를 실패로 처리하지 않고 알리기만 합니다",
+    )
+
+
+def validation_from_args(args):
+    """
+    명령줄 옵션에서 validate 인자 값(True, False, VALIDATE_WARN)을 가져옵니다.
+    """
+    if args.validate and args.allow_invalid:
+        return VALIDATE_WARN
+    return args.validate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EPUB 파일의 구조를 검사합니다.")
+    parser.add_argument("epub_file", help="검사할 EPUB 파일 경로")
+
+    args = parser.parse_args()
+
+    return 1 if print_issues(validate_epub(args.epub_file)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
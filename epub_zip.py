@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import zlib
+import struct
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+
+from ebooklib import epub
+
+from metrics import inc
+
+# 압축하지 않고 저장해야 하는 항목
+STORED_ENTRIES = ("mimetype",)
+
+# 일반 파일 권한 (rw-r--r--)
+DEFAULT_EXTERNAL_ATTR = 0o644 << 16
+# 파일 이름이 UTF-8임을 나타내는 플래그
+UTF8_FLAG = 0x800
+
+# 압축 결과를 보관할 항목의 최소 크기 (작은 항목은 해시 비용이 압축 비용과 비슷함)
+CACHE_MIN_ENTRY_BYTES = 64 * 1024
+# 압축 결과 캐시의 기본 최대 크기 (압축된 바이트 합계)
+DEFAULT_CACHE_BYTES = 256 * 1024**2
+
+
+class CompressedEntryCache:
+    """
+    여러 EPUB에 똑같이 들어가는 큰 항목(글꼴, 이미지 등)의 deflate 결과를 내용 해시로 보관합니다.
+    한 프로세스에서 여러 책을 만들 때 같은 글꼴을 책마다 다시 압축하지 않도록 ZipStreamWriter에 넘깁니다.
+    압축된 크기 합계가 max_bytes를 넘으면 가장 오래 쓰지 않은 항목부터 버립니다.
+    여러 스레드에서 함께 사용할 수 있습니다.
+    """
+
+    def __init__(
+        self, max_bytes=DEFAULT_CACHE_BYTES, min_entry_bytes=CACHE_MIN_ENTRY_BYTES
+    ):
+        self.max_bytes = max_bytes
+        self.min_entry_bytes = min_entry_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def compress(self, data, level):
+        """
+        data를 raw deflate로 압축한 바이트를 반환합니다. 같은 내용과 압축 수준이면 보관한 결과를 씁니다.
+        """
+        if len(data) < self.min_entry_bytes:
+            return _deflate(data, level)
+        key = (level, hashlib.sha256(data).digest())
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                inc("md_to_epub_compress_cache_total", result="hit")
+                return compressed
+            self.misses += 1
+        inc("md_to_epub_compress_cache_total", result="miss")
+
+        compressed = _deflate(data, level)
+        with self.lock:
+            if key not in self.entries and len(compressed) <= self.max_bytes:
+                self.entries[key] = compressed
+                self.size += len(compressed)
+                while self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+def _deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class EntryCollector:
+    """
+    ebooklib의 EpubWriter가 zip 대신 쓰도록 넣어 주는 객체입니다.
+    항목을 압축하지 않고 (이름, 바이트) 목록으로 모읍니다.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def writestr(self, name, data, compress_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.entries.append((name, bytes(data)))
+
+    def close(self):
+        pass
+
+
+class StreamEntryWriter:
+    """
+    ebooklib의 EpubWriter가 zip 대신 쓰도록 넣어 주는 객체입니다.
+    항목이 만들어지는 대로 ZipStreamWriter로 압축하여 바로 출력 스트림에 내보냅니다.
+    """
+
+    def __init__(self, zip_writer):
+        self.zip_writer = zip_writer
+        self._flush = getattr(zip_writer.stream, "flush", None)
+
+    def writestr(self, name, data, compress_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.zip_writer.add(name, bytes(data))
+        # 파이프나 소켓을 읽는 쪽이 항목 단위로 바로 받을 수 있도록 비움
+        if self._flush is not None:
+            self._flush()
+
+    def close(self):
+        self.zip_writer.close()
+        if self._flush is not None:
+            self._flush()
+
+
+def _book_options(options=None, build_time=None):
+    """
+    EpubWriter 옵션에 빌드 시각(OPF의 dcterms:modified)을 넣습니다.
+    """
+    options = dict(options or {})
+    if build_time is not None:
+        options["mtime"] = build_time
+    return options
+
+
+def _write_book(book, out, options=None, writer_class=epub.EpubWriter):
+    """
+    ebooklib.epub.write_epub과 같은 순서로 EPUB 항목을 out.writestr()에 넘깁니다.
+    """
+    writer = writer_class(None, book, options or {})
+    writer.process()
+    writer.out = out
+    writer.out.writestr("mimetype", "application/epub+zip")
+    writer._write_container()
+    writer._write_opf()
+    writer._write_items()
+    return out
+
+
+def collect_book_entries(book, options=None, build_time=None):
+    """
+    EpubBook을 EPUB 항목 목록 [(이름, 바이트), ...]으로 변환합니다.
+    ebooklib.epub.write_epub과 같은 순서와 내용이지만 압축이나 파일 쓰기를 하지 않습니다.
+    build_time(datetime)을 주면 현재 시각 대신 그 시각을 OPF에 기록합니다.
+    """
+    return _write_book(
+        book, EntryCollector(), _book_options(options, build_time)
+    ).entries
+
+
+def write_epub_stream(
+    book,
+    stream,
+    options=None,
+    compressed_cache=None,
+    build_time=None,
+    writer_class=epub.EpubWriter,
+    compress_level=zlib.Z_DEFAULT_COMPRESSION,
+):
+    """
+    EpubBook을 쓰기 가능한 바이너리 스트림(표준 출력, 파이프, 소켓 등)에 EPUB으로 씁니다.
+    seek를 사용하지 않으며, 항목이 만들어지는 대로 내보내므로 받는 쪽이 전송을 바로 시작할 수 있습니다.
+    compressed_cache(CompressedEntryCache)를 주면 큰 항목의 압축 결과를 재사용합니다.
+    build_time(datetime)을 주면 OPF의 dcterms:modified와 모든 zip 항목의 수정 시각을 그 시각으로
+    고정합니다. (재현 가능한 빌드)
+    writer_class로 EpubWriter 대신 output_targets.Epub2Writer 같은 하위 클래스를 쓸 수 있습니다.
+    compress_level은 zlib 압축 수준입니다. (1: 빠름, 9: 가장 작음)
+    쓴 바이트 수를 반환합니다.
+    """
+    zip_writer = ZipStreamWriter(
+        stream,
+        date_time=build_time.timetuple()[:6] if build_time is not None else None,
+        compress_level=compress_level,
+        compressed_cache=compressed_cache,
+    )
+    out = _write_book(
+        book,
+        StreamEntryWriter(zip_writer),
+        _book_options(options, build_time),
+        writer_class,
+    )
+    out.close()
+    return out.zip_writer.offset
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time[:6]
+    dos_date = (max(year, 1980) - 1980) << 9 | month << 5 | day
+    dos_time = hour << 11 | minute << 5 | second // 2
+    return dos_date, dos_time
+
+
+def read_raw_entry(fileobj, info):
+    """
+    zip 파일의 항목을 압축 해제하지 않고 압축된 바이트 그대로 읽습니다.
+    """
+    fileobj.seek(info.header_offset)
+    header = struct.unpack(
+        zipfile.structFileHeader, fileobj.read(zipfile.sizeFileHeader)
+    )
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"잘못된 로컬 헤더입니다: {info.filename}")
+    fileobj.seek(header[10] + header[11], 1)
+    return fileobj.read(info.compress_size)
+
+
+class ZipStreamWriter:
+    """
+    쓰기만 가능한 바이너리 스트림에 zip 파일을 씁니다. (seek를 사용하지 않음)
+    항목 데이터를 모두 가진 뒤에 로컬 헤더를 쓰므로 데이터 디스크립터가 필요 없고,
+    이미 압축된 항목을 다시 압축하지 않고 그대로 복사할 수도 있습니다.
+    compressed_cache(CompressedEntryCache)를 주면 큰 항목은 그 캐시를 거쳐 압축합니다.
+    """
+
+    def __init__(
+        self,
+        stream,
+        date_time=None,
+        compress_level=zlib.Z_DEFAULT_COMPRESSION,
+        compressed_cache=None,
+    ):
+        self.stream = stream
+        self.date_time = date_time or time.localtime()[:6]
+        self.compress_level = compress_level
+        self.compressed_cache = compressed_cache
+        self.offset = 0
+        self.central_directory = []
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _write_entry(self, name, method, crc, compressed, file_size, date_time):
+        encoded_name = name.encode("utf-8")
+        flags = 0 if encoded_name.isascii() else UTF8_FLAG
+        dos_date, dos_time = _dos_date_time(date_time)
+        if self.offset > 0xFFFFFFFF or len(compressed) > 0xFFFFFFFF:
+            raise zipfile.LargeZipFile("ZIP64가 필요한 크기는 지원하지 않습니다.")
+
+        header_offset = self.offset
+        self._write(
+            struct.pack(
+                zipfile.structFileHeader,
+                zipfile.stringFileHeader,
+                20,
+                0,
+                flags,
+                method,
+                dos_time,
+                dos_date,
+                crc,
+                len(compressed),
+                file_size,
+                len(encoded_name),
+                0,
+            )
+        )
+        self._write(encoded_name)
+        self._write(compressed)
+
+        self.central_directory.append(
+            struct.pack(
+                zipfile.structCentralDir,
+                zipfile.stringCentralDir,
+                20,
+                3,
+                20,
+                0,
+                flags,
+                method,
+                dos_time,
+                dos_date,
+                crc,
+                len(compressed),
+                file_size,
+                len(encoded_name),
+                0,
+                0,
+                0,
+                0,
+                DEFAULT_EXTERNAL_ATTR,
+                header_offset,
+            )
+            + encoded_name
+        )
+
+    def add(self, name, data, compress=None, compress_level=None):
+        """
+        항목을 추가합니다. compress가 None이면 mimetype만 압축하지 않습니다.
+        """
+        if compress is None:
+            compress = name not in STORED_ENTRIES
+        crc = zlib.crc32(data)
+        if compress:
+            level = self.compress_level if compress_level is None else compress_level
+            if self.compressed_cache is not None:
+                compressed = self.compressed_cache.compress(data, level)
+            else:
+                compressed = _deflate(data, level)
+            method = zipfile.ZIP_DEFLATED
+            inc("md_to_epub_deflate_input_bytes_total", len(data))
+            inc("md_to_epub_deflate_output_bytes_total", len(compressed))
+        else:
+            compressed = data
+            method = zipfile.ZIP_STORED
+        self._write_entry(name, method, crc, compressed, len(data), self.date_time)
+
+    def add_raw(self, info, compressed, compress_type=None):
+        """
+        다른 zip 파일의 항목(ZipInfo)을 압축된 바이트 그대로 추가합니다.
+        compress_type을 주면 info와 다른 방식으로 다시 압축한 바이트로 봅니다.
+        """
+        self._write_entry(
+            info.filename,
+            info.compress_type if compress_type is None else compress_type,
+            info.CRC,
+            compressed,
+            info.file_size,
+            info.date_time,
+        )
+
+    def close(self):
+        """
+        중앙 디렉토리와 끝 레코드를 씁니다.
+        """
+        central_offset = self.offset
+        for record in self.central_directory:
+            self._write(record)
+        central_size = self.offset - central_offset
+        count = len(self.central_directory)
+        self._write(
+            struct.pack(
+                zipfile.structEndArchive,
+                zipfile.stringEndArchive,
+                0,
+                0,
+                count,
+                count,
+                central_size,
+                central_offset,
+                0,
+            )
+        )
@@ -2,23 +2,41 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import sys
 import json
 import argparse
 import subprocess
 from pathlib import Path
+from build_manifest import MANIFEST_FILENAME
+from resource_to_epub import BACKENDS
+from resource_to_epub import convert_html_to_epub as convert_native
 
+# Calibre ebook-convert 실행 파일 (calibre 백엔드에서만 사용)
+EBOOK_CONVERT = os.environ.get("EBOOK_CONVERT", "ebook-convert")
 
-def read_metadata(html_dir):
+
+def read_metadata(html_dir, resource_dir=None):
     """
     메타데이터 정보를 가져옵니다.
-    먼저 resource/metadata.json 파일을 확인하고, 없으면 title.html에서 정보를 추출합니다.
+    HTML 디렉토리의 manifest.json에 기록된 메타데이터를 먼저 사용하고,
+    없으면 resource_dir의 metadata.json(resource_dir을 준 경우)을 확인한 뒤 title.html에서 정보를 추출합니다.
+    현재 디렉토리의 resource 폴더는 읽지 않습니다.
     """
-    # resource/metadata.json 파일 확인
-    resource_metadata_path = Path("resource") / "metadata.json"
-    if resource_metadata_path.exists():
-        with open(resource_metadata_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    # 빌드 목록(manifest.json)의 메타데이터 확인
+    manifest_path = Path(html_dir) / MANIFEST_FILENAME
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f).get("metadata")
+        if metadata:
+            return metadata
+
+    # 리소스 디렉토리의 metadata.json 파일 확인
+    if resource_dir:
+        resource_metadata_path = Path(resource_dir) / "metadata.json"
+        if resource_metadata_path.exists():
+            with open(resource_metadata_path, "r", encoding="utf-8") as f:
+                return json.load(f)
 
     # title.html에서 정보 추출
     title_html_path = Path(html_dir) / "title.html"
@@ -59,25 +77,18 @@ def read_metadata(html_dir):
     return {"title": "제목 없음", "creator": "저자 미상", "language": "ko"}
 
 
-def convert_html_to_epub(html_dir, output_file):
+def build_calibre_command(html_dir, output_file, metadata, executable=None):
     """
-    HTML 파일들을 EPUB으로 변환합니다.
+    Calibre ebook-convert 명령줄을 구성합니다.
     """
     html_path = Path(html_dir)
     title_html = html_path / "title.html"
 
-    if not title_html.exists():
-        print(f"오류: {title_html} 파일을 찾을 수 없습니다.")
-        return None
-
-    # 메타데이터 읽기
-    metadata = read_metadata(html_dir)
-
     # EPUB 변환 명령 구성
     cmd = [
-        "ebook-convert",
+        executable or EBOOK_CONVERT,
         str(title_html),
-        output_file,
+        str(output_file),
         "--toc-title",
         "목차",
         "--language",
@@ -121,6 +132,21 @@ def convert_html_to_epub(html_dir, output_file):
     if "date" in metadata:
         cmd.extend(["--pubdate", metadata["date"]])
 
+    return cmd
+
+
+def convert_with_calibre(html_dir, output_file, metadata, executable=None):
+    """
+    Calibre의 ebook-convert로 HTML 파일들을 EPUB으로 변환합니다.
+    executable을 주지 않으면 EBOOK_CONVERT 환경 변수 또는 PATH의 ebook-convert를 사용합니다.
+    """
+    title_html = Path(html_dir) / "title.html"
+    if not title_html.exists():
+        print(f"오류: {title_html} 파일을 찾을 수 없습니다.")
+        return None
+
+    cmd = build_calibre_command(html_dir, output_file, metadata, executable)
+
     try:
         print("EPUB 파일 생성 중...")
         subprocess.run(cmd, check=True)
@@ -139,6 +165,32 @@ def convert_html_to_epub(html_dir, output_file):
         return None
 
 
+def convert_html_to_epub(
+    html_dir, output_file, backend="native", ebook_convert=None, resource_dir=None
+):
+    """
+    HTML 파일들을 EPUB으로 변환합니다.
+    기본값은 내장 패키저(resource_to_epub.convert_html_to_epub)이며,
+    backend가 "calibre"일 때만 Calibre의 ebook-convert를 실행합니다.
+
+    내장 패키저도 h1/h2/h3 세 단계 목차, h1 단위 챕터 분할(페이지 나눔),
+    표지, 출판사, ISBN(identifier), 출판일 메타데이터를 지원합니다.
+    메타데이터는 read_metadata로 읽습니다. (resource_dir은 그 대체 경로)
+    """
+    title_html = Path(html_dir) / "title.html"
+    if not title_html.exists():
+        print(f"오류: {title_html} 파일을 찾을 수 없습니다.")
+        return None
+
+    # 메타데이터 읽기
+    metadata = read_metadata(html_dir, resource_dir)
+
+    if backend == "calibre":
+        return convert_with_calibre(html_dir, output_file, metadata, ebook_convert)
+
+    return convert_native(html_dir, output_file, metadata)
+
+
 def main():
     parser = argparse.ArgumentParser(description="HTML 파일들을 EPUB으로 변환합니다.")
     parser.add_argument(
@@ -151,6 +203,22 @@ def main():
         default="output.epub",
         help="출력 EPUB 파일 경로 (기본값: output.epub)",
     )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="native",
+        help="EPUB 생성 방식: native(내장 패키저) 또는 calibre(ebook-convert) (기본값: native)",
+    )
+    parser.add_argument(
+        "--ebook-convert",
+        default=None,
+        help="calibre 백엔드에서 사용할 ebook-convert 실행 파일 경로",
+    )
+    parser.add_argument(
+        "--resource-dir",
+        default=None,
+        help="HTML 디렉토리에 manifest.json이 없을 때 metadata.json을 읽을 리소스 디렉토리",
+    )
 
     args = parser.parse_args()
 
@@ -158,11 +226,15 @@ def main():
         print(f"오류: HTML 디렉토리 '{args.html_dir}'을 찾을 수 없습니다.")
         return 1
 
-    convert_html_to_epub(args.html_dir, args.output_file)
-    return 0
+    result = convert_html_to_epub(
+        args.html_dir,
+        args.output_file,
+        args.backend,
+        args.ebook_convert,
+        args.resource_dir,
+    )
+    return 0 if result else 1
 
 
 if __name__ == "__main__":
-    import re  # re 모듈 임포트 추가
-
     sys.exit(main())
@@ -3,130 +3,37 @@
 
 import os
 import sys
-import json
-import re
 import argparse
 from pathlib import Path
-from bs4 import BeautifulSoup
 from ebooklib import epub
+from build_manifest import assets_with_role, load_manifest, read_page
+from epub_validator import check_epub
+from html_to_epub import read_metadata
+from resource_to_epub import nav_toc_entry
+from toc_tree import nest_headings, toc_node
 
 
-def read_metadata(html_dir):
-    """
-    메타데이터 정보를 가져옵니다.
-    먼저 resource/metadata.json 파일을 확인하고, 없으면 title.html에서 정보를 추출합니다.
-    """
-    # resource/metadata.json 파일 확인
-    resource_metadata_path = Path("resource") / "metadata.json"
-    if resource_metadata_path.exists():
-        with open(resource_metadata_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    # title.html에서 정보 추출
-    title_html_path = Path(html_dir) / "title.html"
-    if title_html_path.exists():
-        metadata = {}
-        with open(title_html_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-            # 제목 추출
-            title_match = re.search(r'<h1 class="title">(.*?)</h1>', content)
-            if title_match:
-                metadata["title"] = title_match.group(1)
-            else:
-                metadata["title"] = "제목 없음"
-
-            # 저자 추출
-            author_match = re.search(r'<p class="author">(.*?)</p>', content)
-            if author_match:
-                metadata["creator"] = author_match.group(1)
-            else:
-                metadata["creator"] = "저자 미상"
-
-            # 출판사 추출
-            publisher_match = re.search(r'<p class="publisher">(.*?)</p>', content)
-            if publisher_match:
-                metadata["publisher"] = publisher_match.group(1)
-
-            # 언어 추출
-            lang_match = re.search(r'lang="(.*?)"', content)
-            if lang_match:
-                metadata["language"] = lang_match.group(1)
-            else:
-                metadata["language"] = "ko"
-
-            return metadata
-
-    # 기본 메타데이터 반환
-    return {"title": "제목 없음", "creator": "저자 미상", "language": "ko"}
-
-
-def read_html_file(file_path):
-    """
-    HTML 파일을 읽어 내용을 반환합니다.
-    """
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-
-def extract_title_from_html(html_content):
-    """
-    HTML 내용에서 제목을 추출합니다.
-    """
-    soup = BeautifulSoup(html_content, "html.parser")
-    title_tag = soup.find("title")
-    if title_tag:
-        return title_tag.text
-    return "제목 없음"
-
-
-def extract_body_from_html(html_content):
-    """
-    HTML 내용에서 body 부분을 추출합니다.
-    """
-    soup = BeautifulSoup(html_content, "html.parser")
-    body = soup.find("body")
-    if body:
-        return str(body)
-    return html_content
-
-
-def add_ids_to_headers(html_content):
-    """
-    HTML 내용의 헤더 요소에 ID를 추가합니다.
-    """
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    # 헤더 요소 찾기
-    headers = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
-
-    # 각 헤더에 ID 추가
-    for i, header in enumerate(headers):
-        header_text = header.get_text().strip()
-        header_id = f"header_{i}_{re.sub(r'[^a-zA-Z0-9가-힣]', '_', header_text)}"
-        header["id"] = header_id
-
-    return str(soup)
-
-
-def convert_html_to_epub(html_dir, output_file):
+def convert_html_to_epub(html_dir, output_file, nav_depth=3, resource_dir=None):
     """
     HTML 파일들을 EPUB으로 변환합니다.
+    페이지 순서, 제목, 헤딩 목록, 스타일·폰트·이미지는 HTML 단계가 남긴 manifest.json에서 읽습니다.
+    파일 이름을 그대로 유지하므로 페이지 사이의 링크와 스타일시트 경로가 그대로 동작합니다.
+    nav_depth는 내비게이션 목차에 넣을 헤딩 단계입니다.
+    메타데이터는 html_to_epub.read_metadata로 읽습니다. (resource_dir은 그 대체 경로)
     """
     html_path = Path(html_dir)
 
-    # 필요한 파일 확인
-    title_html = html_path / "title.html"
-    toc_html = html_path / "toc.html"
-    css_file = html_path / "style.css"
-    cover_file = html_path / "cover.jpg"
-
-    if not title_html.exists():
-        print(f"오류: {title_html} 파일을 찾을 수 없습니다.")
+    if not (html_path / "title.html").exists():
+        print(f"오류: {html_path / 'title.html'} 파일을 찾을 수 없습니다.")
         return None
 
-    # 메타데이터 읽기
-    metadata = read_metadata(html_dir)
+    # 빌드 목록과 메타데이터 읽기
+    manifest = load_manifest(html_path)
+    metadata = read_metadata(html_dir, resource_dir)
+
+    def read_file(entry):
+        with open(html_path / entry["file"], "rb") as f:
+            return f.read()
 
     # EPUB 객체 생성
     book = epub.EpubBook()
@@ -146,91 +53,64 @@ def convert_html_to_epub(html_dir, output_file):
         book.add_metadata("DC", "date", metadata["date"])
 
     # 표지 이미지 추가
-    if cover_file.exists():
-        with open(cover_file, "rb") as f:
-            book.set_cover("cover.jpg", f.read())
+    for asset in assets_with_role(manifest, "cover"):
+        book.set_cover("cover.jpg", read_file(asset))
 
     # CSS 스타일 추가
-    if css_file.exists():
-        css_content = read_html_file(css_file)
+    nav_css = None
+    for asset in assets_with_role(manifest, "style"):
         nav_css = epub.EpubItem(
             uid="style",
-            file_name="style/style.css",
-            media_type="text/css",
-            content=css_content,
+            file_name=asset["file"],
+            media_type=asset["media_type"],
+            content=read_file(asset),
         )
         book.add_item(nav_css)
 
-    # 제목 페이지 추가
-    title_content = read_html_file(title_html)
-    title_page = epub.EpubHtml(
-        title="제목 페이지",
-        file_name="title.xhtml",
-        lang=metadata.get("language", "ko"),
-        content=extract_body_from_html(title_content),
-    )
-    title_page.add_item(nav_css)
-    book.add_item(title_page)
-
-    # 목차 페이지 추가
-    if toc_html.exists():
-        toc_content = read_html_file(toc_html)
-        toc_page = epub.EpubHtml(
-            title="목차",
-            file_name="toc.xhtml",
-            lang=metadata.get("language", "ko"),
-            content=extract_body_from_html(toc_content),
-        )
-        toc_page.add_item(nav_css)
-        book.add_item(toc_page)
-
-    # 챕터 파일 추가
+    # 폰트와 본문 이미지 추가
+    for role in ("font", "image"):
+        for asset in assets_with_role(manifest, role):
+            book.add_item(
+                epub.EpubItem(
+                    uid=f"{role}_{Path(asset['file']).stem}",
+                    file_name=asset["file"],
+                    media_type=asset["media_type"],
+                    content=read_file(asset),
+                )
+            )
+
+    # 페이지 추가 (제목 -> 판권 -> 목차 -> 내용)
+    spine = []
     chapters = []
-    chapter_items = []
-    chapter_files = sorted(
-        [f for f in html_path.glob("chapter_*.html")],
-        key=lambda x: int(re.search(r"chapter_(\d+)\.html", x.name).group(1)),
-    )
-
-    for chapter_file in chapter_files:
-        chapter_content = read_html_file(chapter_file)
-        chapter_title = extract_title_from_html(chapter_content)
-
-        # 헤더에 ID 추가
-        processed_content = add_ids_to_headers(extract_body_from_html(chapter_content))
-
-        chapter = epub.EpubHtml(
-            title=chapter_title,
-            file_name=f"{chapter_file.name.replace('.html', '.xhtml')}",
+    for page in manifest["pages"]:
+        item = epub.EpubHtml(
+            title=page["title"],
+            file_name=page["file"],
             lang=metadata.get("language", "ko"),
-            content=processed_content,
+            content=read_page(html_path, manifest, page),
+            media_type=page["media_type"],
         )
-        chapter.add_item(nav_css)
-        book.add_item(chapter)
-        chapter_items.append(chapter)
-
-        # 챕터 내 헤더 찾기
-        soup = BeautifulSoup(processed_content, "html.parser")
-        headers = soup.find_all(["h1", "h2", "h3"])
-
-        # 챕터와 헤더를 목차에 추가
-        if headers:
-            chapter_with_sections = [chapter]
-            for header in headers:
-                if header.get("id"):
-                    section = epub.Link(
-                        f"{chapter_file.name.replace('.html', '.xhtml')}#{header['id']}",
-                        header.get_text(),
-                        header["id"],
-                    )
-                    chapter_with_sections.append(section)
-            chapters.append(tuple(chapter_with_sections))
-        else:
-            chapters.append(chapter)
+        if nav_css is not None:
+            item.add_item(nav_css)
+        book.add_item(item)
+        spine.append(item)
+
+        # 챕터와 헤더를 목차에 추가 (헤더가 없으면 챕터 자체)
+        if page["role"] == "chapter":
+            chapters.extend(
+                nest_headings(
+                    (
+                        (level, toc_node(text, f"{page['file']}#{header_id}"))
+                        for level, text, header_id in page.get("headings", [])
+                    ),
+                    nav_depth,
+                )
+                or [toc_node(page["title"], page["file"])]
+            )
 
     # 책 구조 설정
-    book.toc = chapters
-    book.spine = [title_page, toc_page] + chapter_items
+    book.toc = [nav_toc_entry(node) for node in chapters]
+    book.spine = spine
 
     # EPUB 네비게이션 파일 추가
     book.add_item(epub.EpubNcx())
@@ -241,6 +121,7 @@ def convert_html_to_epub(html_dir, output_file):
         print("EPUB 파일 생성 중...")
         epub.write_epub(output_file, book, {})
         print(f"변환 완료: {html_dir} -> {output_file}")
+        check_epub(output_file)
         return output_file
     except Exception as e:
         print(f"EPUB 변환 중 오류 발생: {e}")
@@ -259,6 +140,17 @@ def main():
         default="output.epub",
         help="출력 EPUB 파일 경로 (기본값: output.epub)",
     )
+    parser.add_argument(
+        "--nav-depth",
+        type=int,
+        default=3,
+        help="EPUB 내비게이션에 넣을 헤딩 단계 (기본값: 3)",
+    )
+    parser.add_argument(
+        "--resource-dir",
+        default=None,
+        help="HTML 디렉토리에 manifest.json이 없을 때 metadata.json을 읽을 리소스 디렉토리",
+    )
 
     args = parser.parse_args()
 
@@ -266,8 +158,10 @@ def main():
         print(f"오류: HTML 디렉토리 '{args.html_dir}'을 찾을 수 없습니다.")
         return 1
 
-    convert_html_to_epub(args.html_dir, args.output_file)
-    return 0
+    result = convert_html_to_epub(
+        args.html_dir, args.output_file, args.nav_depth, args.resource_dir
+    )
+    return 0 if result else 1
 
 
 if __name__ == "__main__":
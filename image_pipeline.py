@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+import hashlib
+import threading
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from PIL import Image, ImageOps
+
+from build_workspace import resolve_inside
+from metrics import inc
+from progress import as_progress
+
+# 본문 HTML의 <img src="..."> 속성
+IMAGE_SRC_PATTERN = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]+)(")')
+
+# HTML/EPUB 안에서 처리된 이미지가 놓이는 폴더
+IMAGE_DIR_NAME = "images"
+
+IMAGE_MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".svg": "image/svg+xml",
+}
+
+# Pillow 저장 형식별 확장자
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+# max_width/max_height: 최대 크기(픽셀), format: JPEG/WEBP/PNG (None이면 원본 형식)
+# quality: JPEG/WebP 품질, grayscale: 흑백 변환 (e-ink 단말용)
+ImageOptions = namedtuple(
+    "ImageOptions", ["max_width", "max_height", "format", "quality", "grayscale"]
+)
+
+IMAGE_PROFILES = {
+    # 원본 그대로 복사 (중복 제거만 수행)
+    "original": ImageOptions(None, None, None, None, False),
+    # 일반 단말용: 긴 변 기준으로 줄이고 JPEG으로 다시 저장
+    "compact": ImageOptions(1600, 2400, "JPEG", 85, False),
+    # e-ink 단말용: 흑백, 단말 해상도에 맞춤
+    "eink": ImageOptions(1072, 1448, "JPEG", 80, True),
+}
+
+
+def default_cache_dir(kind=IMAGE_DIR_NAME):
+    """
+    빌드 결과를 보관할 기본 캐시 디렉토리(~/.cache/md_to_epub/<kind>)를 반환합니다.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "md_to_epub" / kind
+
+
+def find_image_sources(html_content):
+    """
+    HTML에서 <img> 태그의 src 값을 등장 순서대로 찾습니다.
+    """
+    return [match.group(2) for match in IMAGE_SRC_PATTERN.finditer(html_content)]
+
+
+def rewrite_image_sources(html_content, mapping):
+    """
+    HTML의 <img> src 값을 mapping에 따라 처리된 이미지 경로로 바꿉니다.
+    """
+    if not mapping:
+        return html_content
+    return IMAGE_SRC_PATTERN.sub(
+        lambda m: m.group(1) + mapping.get(m.group(2), m.group(2)) + m.group(3),
+        html_content,
+    )
+
+
+def local_image_file(base_dir, src):
+    """
+    본문 이미지 src가 가리키는 base_dir 안의 파일 경로를 반환합니다. 외부 URL이면 None입니다.
+    base_dir 밖을 가리키거나 이미지 확장자가 아니면 ValueError를 올립니다.
+    """
+    parts = urlsplit(src)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    source_file = resolve_inside(base_dir, unquote(parts.path))
+    if source_file.suffix.lower() not in IMAGE_MEDIA_TYPES:
+        raise ValueError(f"이미지 파일 형식이 아닙니다: {src}")
+    return source_file
+
+
+def _output_extension(source_file, options):
+    if options.format:
+        return FORMAT_EXTENSIONS[options.format.upper()]
+    return source_file.suffix.lower()
+
+
+def _needs_processing(options):
+    return bool(
+        options.format or options.max_width or options.max_height or options.grayscale
+    )
+
+
+def process_image(source_file, target_file, options):
+    """
+    이미지 하나를 옵션에 맞게 줄이고 다시 저장합니다.
+    처리할 내용이 없으면 원본을 그대로 복사합니다.
+    """
+    source_file = Path(source_file)
+    if not _needs_processing(options) or source_file.suffix.lower() == ".svg":
+        shutil.copyfile(source_file, target_file)
+        return target_file
+
+    with Image.open(source_file) as image:
+        image_format = (options.format or image.format or "PNG").upper()
+        image = ImageOps.exif_transpose(image)
+
+        if options.grayscale:
+            image = image.convert("LA" if "A" in image.getbands() else "L")
+
+        if options.max_width or options.max_height:
+            image.thumbnail(
+                (options.max_width or image.width, options.max_height or image.height),
+                Image.LANCZOS,
+            )
+
+        # JPEG은 투명도를 지원하지 않으므로 흰 배경과 합성
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGBA")
+            background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+            image = Image.alpha_composite(background, image).convert(
+                "L" if options.grayscale else "RGB"
+            )
+
+        save_options = {"optimize": True}
+        if options.quality and image_format in ("JPEG", "WEBP"):
+            save_options["quality"] = options.quality
+        image.save(target_file, image_format, **save_options)
+
+    return target_file
+
+
+def _process_cached(source_file, cache_file, options):
+    """
+    캐시에 결과가 없을 때만 이미지를 처리합니다. (작업 프로세스에서 실행)
+    """
+    if not cache_file.exists():
+        temp_file = cache_file.with_name(
+            f".{cache_file.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        process_image(source_file, temp_file, options)
+        os.replace(temp_file, cache_file)
+    return cache_file
+
+
+def process_images(
+    sources,
+    base_dir,
+    output_dir,
+    options=None,
+    cache_dir=None,
+    workers=None,
+    progress=None,
+    executor=None,
+):
+    """
+    본문에서 찾은 이미지 경로들을 처리하여 output_dir에 저장합니다.
+
+    1. base_dir 기준으로 경로를 찾고, 내용 해시로 중복을 제거합니다.
+    2. 캐시(cache_dir)에 없는 이미지만 여러 프로세스에서 병렬로 처리합니다.
+       executor(ProcessPoolExecutor)를 주면 새 프로세스 풀 대신 그것을 사용합니다.
+    3. 원래 src 값 -> "images/<해시>.<확장자>" 대응표를 반환합니다.
+
+    외부 URL, 찾을 수 없는 파일, base_dir 밖의 파일, 이미지 확장자가 아닌 파일은
+    대응표에 포함하지 않습니다.
+    progress(progress.Progress)로 경고와 처리량을 알립니다.
+    """
+    progress = as_progress(progress)
+    options = options or IMAGE_PROFILES["original"]
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+    output_dir = Path(output_dir)
+    options_key = repr(tuple(options)).encode("utf-8")
+
+    mapping = {}
+    jobs = {}
+    for src in dict.fromkeys(sources):
+        try:
+            source_file = local_image_file(base_dir, src)
+        except ValueError as e:
+            progress.message(f"경고: {e}", "warning")
+            continue
+        if source_file is None:
+            continue
+        if not source_file.is_file():
+            progress.message(
+                f"경고: 이미지 파일을 찾을 수 없습니다: {source_file}", "warning"
+            )
+            continue
+
+        with open(source_file, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        output_name = content_hash[:16] + _output_extension(source_file, options)
+        mapping[src] = f"{IMAGE_DIR_NAME}/{output_name}"
+
+        if output_name not in jobs:
+            cache_key = hashlib.sha256(content_hash.encode("ascii") + options_key)
+            cache_file = cache_dir / (cache_key.hexdigest() + Path(output_name).suffix)
+            jobs[output_name] = (source_file, cache_file)
+
+    if not jobs:
+        return mapping
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pending = {
+        name: job for name, job in jobs.items() if not job[1].exists()
+    }
+    with progress.stage("html.images", len(jobs)) as stage:
+        if pending:
+            if workers == 1 or len(pending) == 1:
+                for source_file, cache_file in pending.values():
+                    _process_cached(source_file, cache_file, options)
+            else:
+                with (
+                    nullcontext(executor)
+                    if executor is not None
+                    else ProcessPoolExecutor(max_workers=workers)
+                ) as pool:
+                    futures = [
+                        pool.submit(
+                            _process_cached, source_file, cache_file, options
+                        )
+                        for source_file, cache_file in pending.values()
+                    ]
+                    for future in futures:
+                        future.result()
+
+        for output_name, (_, cache_file) in jobs.items():
+            shutil.copyfile(cache_file, output_dir / output_name)
+            stage.advance(nbytes=cache_file.stat().st_size)
+
+    inc("md_to_epub_image_cache_total", len(jobs) - len(pending), result="hit")
+    inc("md_to_epub_image_cache_total", len(pending), result="miss")
+    progress.message(
+        f"본문 이미지 {len(jobs)}개를 처리했습니다. "
+        f"(캐시 사용 {len(jobs) - len(pending)}개, 새로 처리 {len(pending)}개)"
+    )
+    return mapping
+
+
+def parse_max_size(value):
+    """
+    "1600x2400" 형식의 크기 문자열을 (가로, 세로)로 변환합니다.
+    """
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def add_image_arguments(parser):
+    """
+    이미지 처리 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--image-profile",
+        choices=sorted(IMAGE_PROFILES),
+        default="original",
+        help="본문 이미지 처리 프로필 (기본값: original)",
+    )
+    parser.add_argument(
+        "--image-max-size",
+        type=parse_max_size,
+        default=None,
+        help="본문 이미지 최대 크기 (예: 1600x2400)",
+    )
+    parser.add_argument(
+        "--image-format",
+        choices=["jpeg", "webp", "png"],
+        default=None,
+        help="본문 이미지 저장 형식",
+    )
+    parser.add_argument(
+        "--image-quality",
+        type=int,
+        default=None,
+        help="JPEG/WebP 품질 (1-100)",
+    )
+    parser.add_argument(
+        "--image-grayscale",
+        action="store_true",
+        help="본문 이미지를 흑백으로 변환합니다 (e-ink 단말용)",
+    )
+    parser.add_argument(
+        "--image-cache-dir",
+        default=None,
+        help="처리된 이미지 캐시 디렉토리 (기본값: ~/.cache/md_to_epub/images)",
+    )
+
+
+def image_options_from_args(args):
+    """
+    명령줄 옵션에서 ImageOptions를 만듭니다. 프로필 값에 개별 옵션을 덮어씁니다.
+    """
+    options = IMAGE_PROFILES[args.image_profile]
+    if args.image_max_size:
+        options = options._replace(
+            max_width=args.image_max_size[0], max_height=args.image_max_size[1]
+        )
+    if args.image_format:
+        options = options._replace(format=args.image_format.upper())
+    if args.image_quality:
+        options = options._replace(quality=args.image_quality)
+    if args.image_grayscale:
+        options = options._replace(grayscale=True)
+    return options
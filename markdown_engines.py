@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import html
+import re
+import threading
+from functools import lru_cache
+
+import markdown
+
+from search_index import plain_text
+from toc_tree import HEADING_TAG_PATTERN
+
+HEADING_PATTERN = re.compile(r"^(#+)\s+(.+)$")
+HR_PATTERN = re.compile(r"^(\*{3,}|-{3,}|_{3,})$")
+FENCE_PATTERN = re.compile(r"^(```|~~~)\s*([\w+-]*)\s*$")
+LIST_ITEM_PATTERN = re.compile(r"^\s*(?:([-*+])|(\d+)[.)])\s+(.*)$")
+TABLE_ROW_PATTERN = re.compile(r"^\|.*\|$")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+
+INLINE_CODE_PATTERN = re.compile(r"(`[^`]+`)")
+IMAGE_PATTERN = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)(?:\s+"([^"]*)")?\)')
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(([^)\s]+)(?:\s+"([^"]*)")?\)')
+BOLD_PATTERN = re.compile(r"\*\*(.*?)\*\*")
+ITALIC_PATTERN = re.compile(r"\*(.*?)\*")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class MarkdownEngine:
+    """
+    마크다운 본문을 HTML로 변환하는 엔진의 기본 클래스입니다.
+    convert()는 h1마다 챕터가 나뉘는 HTML 문자열을 반환해야 합니다.
+    """
+
+    name = None
+
+    def convert(self, content, search_index=None):
+        raise NotImplementedError
+
+
+def render_inline(text):
+    """
+    한 줄 안의 인라인 마크다운(코드, 이미지, 링크, 굵게, 기울임)을 HTML로 변환합니다.
+    인라인 코드 안의 내용은 이스케이프만 하고 다른 규칙을 적용하지 않습니다.
+    """
+    parts = INLINE_CODE_PATTERN.split(text)
+    for i, part in enumerate(parts):
+        if i % 2:
+            parts[i] = f"<code>{html.escape(part[1:-1], quote=False)}</code>"
+            continue
+        part = IMAGE_PATTERN.sub(_render_image, part)
+        part = LINK_PATTERN.sub(_render_link, part)
+        # 굵게 (**text**)
+        part = BOLD_PATTERN.sub(r"<strong>\1</strong>", part)
+        # 기울임 (*text*)
+        part = ITALIC_PATTERN.sub(r"<em>\1</em>", part)
+        parts[i] = part
+    return "".join(parts)
+
+
+def _render_image(match):
+    alt, src, title = match.groups()
+    title_attr = f' title="{html.escape(title)}"' if title else ""
+    return f'<img src="{html.escape(src)}" alt="{html.escape(alt)}"{title_attr} />'
+
+
+def _render_link(match):
+    text, href, title = match.groups()
+    title_attr = f' title="{html.escape(title)}"' if title else ""
+    return f'<a href="{html.escape(href)}"{title_attr}>{text}</a>'
+
+
+def _starts_ordered_list(lines, i):
+    """
+    i번째 줄의 번호 항목(1., 2) 등)이 번호 목록을 시작하는지 확인합니다.
+    1번은 어디서나 목록을 시작하고, 다른 번호는 블록의 처음(첫 줄, 빈 줄이나 헤딩, 수평선,
+    코드 블록 다음)에서 다음 줄도 번호 항목일 때만 목록을 시작합니다.
+    ("2024. 봄"처럼 숫자와 마침표로 시작하는 한 줄은 본문으로 처리)
+    """
+    if int(LIST_ITEM_PATTERN.match(lines[i]).group(2)) == 1:
+        return True
+    if i > 0:
+        previous = lines[i - 1].strip()
+        if previous and not (
+            HEADING_PATTERN.match(previous)
+            or HR_PATTERN.match(previous)
+            or FENCE_PATTERN.match(previous)
+        ):
+            return False
+    next_match = LIST_ITEM_PATTERN.match(lines[i + 1]) if i + 1 < len(lines) else None
+    return next_match is not None and next_match.group(2) is not None
+
+
+def _split_table_row(line):
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _table_alignments(separator):
+    alignments = []
+    for cell in _split_table_row(separator):
+        if cell.startswith(":") and cell.endswith(":"):
+            alignments.append("center")
+        elif cell.endswith(":"):
+            alignments.append("right")
+        elif cell.startswith(":"):
+            alignments.append("left")
+        else:
+            alignments.append(None)
+    return alignments
+
+
+def _render_table_row(cells, tag, alignments):
+    row = []
+    for i, cell in enumerate(cells):
+        align = alignments[i] if i < len(alignments) else None
+        style = f' style="text-align: {align};"' if align else ""
+        row.append(f"<{tag}{style}>{render_inline(cell)}</{tag}>")
+    return f"<tr>{''.join(row)}</tr>"
+
+
+class NativeMarkdownEngine(MarkdownEngine):
+    """
+    한 줄씩 처리하는 빠른 내장 엔진입니다.
+    1. 빈줄은 <br />로 변환
+    2. 연속된 줄바꿈은 최대 2회로 제한
+    3. 헤딩, 수평선, 목록, 코드 블록, 표, 링크, 이미지를 HTML로 변환
+    4. 그 밖의 라인은 <p> 태그로 감싸짐
+    """
+
+    name = "native"
+
+    def convert(self, content, search_index=None):
+        # 연속된 줄바꿈 최대 2회로 제한
+        content = re.sub(r"\n{3,}", "\n\n", content)
+
+        # 각 줄을 개별적으로 처리
+        lines = content.split("\n")
+        html_lines = []
+
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+
+            # 코드 블록 (``` 또는 ~~~)은 닫는 표시까지 그대로 출력
+            fence_match = FENCE_PATTERN.match(stripped)
+            if fence_match:
+                fence, language = fence_match.groups()
+                code_lines = []
+                i += 1
+                while i < len(lines) and lines[i].strip() != fence:
+                    code_lines.append(lines[i])
+                    if search_index is not None:
+                        search_index.add_text(lines[i])
+                    i += 1
+                class_attr = f' class="language-{language}"' if language else ""
+                code = html.escape("\n".join(code_lines), quote=False)
+                html_lines.append(f"<pre><code{class_attr}>{code}</code></pre>")
+                i += 1
+                continue
+
+            # 빈 줄은 <br /> 태그로 변환
+            if not stripped:
+                html_lines.append("<br />")
+            # 헤딩(#으로 시작하는 줄)은 그대로 처리
+            elif HEADING_PATTERN.match(line):
+                # 마크다운 헤딩을 HTML로 변환
+                heading_match = HEADING_PATTERN.match(line)
+                heading_level = len(heading_match.group(1))
+                heading_text = heading_match.group(2).strip()
+                html_lines.append(
+                    f"<h{heading_level}>{heading_text}</h{heading_level}>"
+                )
+                if search_index is not None:
+                    search_index.add_heading(heading_level, heading_text)
+            # 수평선(---, ___, ***)은 <hr> 태그로 변환
+            elif HR_PATTERN.match(stripped):
+                html_lines.append("<hr />")
+            # 목록(-, *, +, 1.)은 연속된 항목을 하나의 <ul>/<ol>로 묶기
+            elif LIST_ITEM_PATTERN.match(line) and (
+                LIST_ITEM_PATTERN.match(line).group(2) is None
+                or _starts_ordered_list(lines, i)
+            ):
+                ordered = LIST_ITEM_PATTERN.match(line).group(2) is not None
+                tag = "ol" if ordered else "ul"
+                items = []
+                while i < len(lines):
+                    item_match = LIST_ITEM_PATTERN.match(lines[i])
+                    if not item_match or (item_match.group(2) is not None) != ordered:
+                        break
+                    if HR_PATTERN.match(lines[i].strip()):
+                        break
+                    item_text = item_match.group(3)
+                    if search_index is not None:
+                        search_index.add_text(item_text)
+                    items.append(f"<li>{render_inline(item_text)}</li>")
+                    i += 1
+                html_lines.append(f"<{tag}>{''.join(items)}</{tag}>")
+                continue
+            # 표(| a | b |)는 두 번째 줄이 구분선일 때만 변환
+            elif (
+                TABLE_ROW_PATTERN.match(stripped)
+                and i + 1 < len(lines)
+                and TABLE_SEPARATOR_PATTERN.match(lines[i + 1].strip())
+            ):
+                alignments = _table_alignments(lines[i + 1])
+                rows = [
+                    "<table>",
+                    "<thead>",
+                    _render_table_row(_split_table_row(line), "th", alignments),
+                    "</thead>",
+                    "<tbody>",
+                ]
+                if search_index is not None:
+                    search_index.add_text(line)
+                i += 2
+                while i < len(lines) and TABLE_ROW_PATTERN.match(lines[i].strip()):
+                    if search_index is not None:
+                        search_index.add_text(lines[i])
+                    rows.append(
+                        _render_table_row(_split_table_row(lines[i]), "td", alignments)
+                    )
+                    i += 1
+                rows.extend(["</tbody>", "</table>"])
+                html_lines.append("\n".join(rows))
+                continue
+            # 일반 텍스트 줄은 <p> 태그로 감싸기
+            else:
+                if search_index is not None:
+                    search_index.add_text(line)
+                # 마크다운 문법 처리 (인라인 코드, 이미지, 링크, 굵게, 기울임)
+                html_lines.append(f"<p>{render_inline(line)}</p>")
+
+            i += 1
+
+        # 모든 HTML 줄을 합치기
+        return "\n".join(html_lines)
+
+
+def split_chapter_sources(content):
+    """
+    마크다운 원문을 h1(# 제목) 줄마다 나눕니다. 코드 블록 안의 # 줄은 무시합니다.
+    """
+    chunks = []
+    current = []
+    fence = None
+    for line in content.split("\n"):
+        fence_match = FENCE_PATTERN.match(line.strip())
+        if fence_match and (fence is None or fence_match.group(1) == fence):
+            fence = fence_match.group(1) if fence is None else None
+        elif fence is None and re.match(r"^#\s+", line) and current:
+            chunks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class LibraryMarkdownEngine(MarkdownEngine):
+    """
+    markdown 패키지를 사용하는 엔진입니다. 확장 기능(표, 각주, 정의 목록 등)을 모두 지원합니다.
+    Markdown 객체는 변환 중 상태를 가지므로 스레드마다 하나씩 만들어 다시 쓰고,
+    각주 등이 다음 챕터로 넘어가지 않도록 챕터마다 reset()합니다.
+    검색 색인은 변환된 HTML에서 만들므로 setext(===, ---) 헤딩과 HTML로 쓴 헤딩도
+    챕터 페이지의 헤딩과 같은 순서로 구역이 됩니다.
+    """
+
+    name = "markdown"
+    extensions = ("extra", "sane_lists")
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @property
+    def md(self):
+        md = getattr(self.local, "md", None)
+        if md is None:
+            md = self.local.md = markdown.Markdown(
+                extensions=list(self.extensions), output_format="xhtml"
+            )
+        return md
+
+    def convert(self, content, search_index=None):
+        html_parts = []
+        for chapter_source in split_chapter_sources(content):
+            self.md.reset()
+            html_parts.append(self.md.convert(chapter_source))
+
+        content = "\n".join(html_parts)
+        if search_index is not None:
+            position = 0
+            for match in HEADING_TAG_PATTERN.finditer(content):
+                self._add_html_text(search_index, content[position : match.start()])
+                search_index.add_heading(int(match.group(1)), plain_text(match.group(3)))
+                position = match.end()
+            self._add_html_text(search_index, content[position:])
+
+        return content
+
+    @staticmethod
+    def _add_html_text(search_index, html_text):
+        text = html.unescape(TAG_PATTERN.sub(" ", html_text))
+        if text.strip():
+            search_index.add_text(text)
+
+
+MARKDOWN_ENGINES = {
+    NativeMarkdownEngine.name: NativeMarkdownEngine,
+    LibraryMarkdownEngine.name: LibraryMarkdownEngine,
+}
+
+
+@lru_cache(maxsize=None)
+def get_markdown_engine(name="native"):
+    """
+    이름에 해당하는 마크다운 엔진을 반환합니다. 엔진은 프로세스마다 한 번만 만들어지며
+    여러 스레드에서 함께 사용할 수 있습니다.
+    """
+    if name not in MARKDOWN_ENGINES:
+        raise KeyError(f"알 수 없는 마크다운 엔진입니다: {name}")
+    return MARKDOWN_ENGINES[name]()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# 지표 이름 -> (종류, 설명). 변환 과정의 각 부분이 이 이름으로 값을 더합니다.
+METRIC_DEFINITIONS = {
+    "md_to_epub_builds_total": ("counter", "끝난 빌드 수 (result: ok, error)"),
+    "md_to_epub_build_seconds": ("histogram", "빌드 하나에 걸린 시간(초)"),
+    "md_to_epub_stage_seconds": ("histogram", "빌드 단계별 소요 시간(초)"),
+    "md_to_epub_queue_wait_seconds": ("histogram", "빌드 서비스 작업이 큐에서 기다린 시간(초)"),
+    "md_to_epub_markdown_lines_total": ("counter", "처리한 마크다운 줄 수"),
+    "md_to_epub_markdown_bytes_total": ("counter", "처리한 마크다운 바이트 수"),
+    "md_to_epub_chapters_rendered_total": ("counter", "만든 챕터 페이지 수"),
+    "md_to_epub_content_cache_total": ("counter", "원고 변환 캐시 조회 수 (result: hit, miss)"),
+    "md_to_epub_image_cache_total": ("counter", "본문 이미지 캐시 조회 수 (result: hit, miss)"),
+    "md_to_epub_compress_cache_total": (
+        "counter",
+        "글꼴 등 큰 항목의 압축 결과 캐시 조회 수 (result: hit, miss)",
+    ),
+    "md_to_epub_deflate_input_bytes_total": ("counter", "deflate로 압축한 원래 바이트 수"),
+    "md_to_epub_deflate_output_bytes_total": ("counter", "deflate로 압축한 결과 바이트 수"),
+}
+
+# 시간 히스토그램의 구간 경계(초)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# 지표 응답의 Content-Type (Prometheus 텍스트 형식 0.0.4)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    카운터와 히스토그램 값을 모아 Prometheus 텍스트 형식으로 내보냅니다.
+    여러 스레드에서 함께 사용할 수 있습니다.
+    다른 프로세스에서 모은 값은 snapshot()으로 꺼내 merge()로 더합니다.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """
+        지금까지 모은 값을 직렬화 가능한 사전으로 반환합니다.
+        """
+        with self.lock:
+            return {
+                "counters": [
+                    [name, list(map(list, labels)), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [
+                        name,
+                        list(map(list, labels)),
+                        dict(histogram, buckets=list(histogram["buckets"])),
+                    ]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def merge(self, snapshot):
+        """
+        snapshot()으로 꺼낸 값을 더합니다. (같은 구간 경계를 쓰는 레지스트리끼리)
+        """
+        with self.lock:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, other in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.setdefault(
+                    key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                )
+                histogram["buckets"] = [
+                    a + b for a, b in zip(histogram["buckets"], other["buckets"])
+                ]
+                histogram["sum"] += other["sum"]
+                histogram["count"] += other["count"]
+
+    def render(self):
+        """
+        Prometheus 텍스트 형식 문자열을 만듭니다.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, dict(value, buckets=list(value["buckets"])))
+                for key, value in self.histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            help_text = METRIC_DEFINITIONS.get(name, (kind, name))[1]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            for bound, count in zip(
+                self.buckets + (math.inf,),
+                histogram["buckets"] + [histogram["count"]],
+            ):
+                le = _format_labels(labels, [("le", _format_value(bound))])
+                lines.append(f"{name}_bucket{le} {count}")
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}"
+            )
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        지표를 파일에 씁니다. (node_exporter textfile 수집기가 읽는 중간 상태가 보이지 않도록 바꿔치기)
+        """
+        path = Path(path)
+        temp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp_file.write_text(self.render(), encoding="utf-8")
+        os.replace(temp_file, path)
+
+
+# 지표를 모으지 않을 때는 None (변환 과정은 None인지만 확인하고 넘어감)
+_registry = None
+
+
+def enable_metrics(registry=None):
+    """
+    이 프로세스에서 지표를 모으기 시작하고 레지스트리를 반환합니다.
+    """
+    global _registry
+    _registry = registry or MetricsRegistry()
+    return _registry
+
+
+def disable_metrics():
+    global _registry
+    _registry = None
+
+
+def get_registry():
+    return _registry
+
+
+def metrics_enabled():
+    return _registry is not None
+
+
+def inc(name, value=1, **labels):
+    """
+    카운터에 value를 더합니다. 지표를 모으지 않으면 아무것도 하지 않습니다.
+    """
+    registry = _registry
+    if registry is not None:
+        registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """
+    히스토그램에 값 하나를 기록합니다. 지표를 모으지 않으면 아무것도 하지 않습니다.
+    """
+    registry = _registry
+    if registry is not None:
+        registry.observe(name, value, **labels)
+
+
+def record_build(seconds, ok):
+    """
+    끝난 빌드 하나의 결과(ok, error)와 소요 시간을 기록합니다.
+    """
+    registry = _registry
+    if registry is not None:
+        result = "ok" if ok else "error"
+        registry.inc("md_to_epub_builds_total", result=result)
+        registry.observe("md_to_epub_build_seconds", seconds, result=result)
+
+
+def collect_in_worker(enabled, function, *args, **kwargs):
+    """
+    작업 프로세스에서 function을 실행하고 (결과, 지표 snapshot)을 반환합니다.
+    enabled가 False이면 지표를 모으지 않고 snapshot은 None입니다.
+    부모 프로세스는 merge_snapshot으로 그 값을 자신의 레지스트리에 더합니다.
+    """
+    if not enabled:
+        return function(*args, **kwargs), None
+    previous = _registry
+    registry = enable_metrics(MetricsRegistry())
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        if previous is None:
+            disable_metrics()
+        else:
+            enable_metrics(previous)
+    return result, registry.snapshot()
+
+
+def merge_snapshot(snapshot):
+    """
+    작업 프로세스에서 모은 지표를 이 프로세스의 레지스트리에 더합니다.
+    """
+    registry = _registry
+    if registry is not None and snapshot is not None:
+        registry.merge(snapshot)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /metrics 요청에 레지스트리의 지표를 Prometheus 텍스트 형식으로 돌려줍니다.
+    """
+
+    registry = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlsplit(self.path).path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        send_metrics(self, self.registry)
+
+
+def send_metrics(handler, registry):
+    """
+    HTTP 요청 처리기(BaseHTTPRequestHandler)로 지표 응답을 보냅니다.
+    """
+    body = registry.render().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", METRICS_CONTENT_TYPE)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def serve_metrics(registry, port, host="127.0.0.1"):
+    """
+    백그라운드 스레드에서 http://host:port/metrics 로 지표를 제공하고 서버를 반환합니다.
+    """
+    handler = type("Handler", (MetricsRequestHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def add_metrics_arguments(parser):
+    """
+    지표 출력 옵션을 추가합니다. 둘 다 주지 않으면 지표를 모으지 않습니다.
+    """
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Prometheus 텍스트 형식 지표를 쓸 파일 (node_exporter textfile 수집기용, "
+        "빌드가 끝날 때마다 갱신)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="지표를 http://127.0.0.1:<포트>/metrics 로 제공합니다",
+    )
+
+
+def metrics_from_args(args):
+    """
+    명령줄 옵션에 따라 지표 수집을 시작합니다. 지표를 모으지 않으면 None을 반환합니다.
+    """
+    if args.metrics_file is None and args.metrics_port is None:
+        return None
+    registry = enable_metrics()
+    if args.metrics_port is not None:
+        serve_metrics(registry, args.metrics_port)
+    return registry
+
+
+def write_metrics_from_args(args):
+    """
+    --metrics-file이 있으면 지금까지 모은 지표를 그 파일에 씁니다.
+    """
+    if args.metrics_file is not None and _registry is not None:
+        _registry.write(args.metrics_file)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import shutil
+import zipfile
+from pathlib import Path
+
+from ebooklib import epub
+
+from epub_compress import zlib_level
+from epub_zip import write_epub_stream
+from metrics import inc, metrics_enabled
+from templates import get_template, render_items
+from toc_tree import toc_node
+
+# 웹 뷰어용 사이트의 첫 페이지 (EPUB nav 문서로 만든 목차)
+SITE_INDEX_FILENAME = "index.html"
+
+# EPUB2(OPS 2.0.1) 문서에 사용하는 XHTML 1.1 문서 형식 선언
+XHTML11_DOCTYPE = (
+    '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN" '
+    '"http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">'
+)
+HTML5_DOCTYPE_PATTERN = re.compile(rb"<!DOCTYPE html>", re.IGNORECASE)
+# EPUB2 문서에 쓸 수 없는 EPUB3 전용 속성 (epub 네임스페이스, epub:type, ARIA role과 aria-*)
+START_TAG_PATTERN = re.compile(rb"<[A-Za-z][^<>]*>")
+EPUB3_ATTRIBUTE_PATTERN = re.compile(
+    rb'\s+(?:xmlns:epub|epub:[\w-]+|role|aria-[\w-]+)="[^"]*"'
+)
+
+
+def _strip_epub3_attributes(content):
+    """
+    XHTML 문서의 시작 태그에서 EPUB3 전용 속성을 지웁니다. (본문 글자는 그대로 둠)
+    """
+    return START_TAG_PATTERN.sub(
+        lambda match: EPUB3_ATTRIBUTE_PATTERN.sub(b"", match.group(0)), content
+    )
+
+
+def is_stream(output):
+    """
+    출력 대상이 경로가 아니라 쓰기 가능한 바이너리 스트림인지 확인합니다.
+    """
+    return hasattr(output, "write")
+
+
+def target_output_path(output_file, target):
+    """
+    형식별 출력 경로를 반환합니다.
+    epub3는 output_file 그대로, epub2는 <이름>-epub2.epub, site는 <이름>_site 폴더입니다.
+    output_file이 스트림이면 epub3만 그 스트림에 쓸 수 있습니다.
+    """
+    if is_stream(output_file):
+        if target != "epub3":
+            raise ValueError(f"스트림 출력은 epub3 형식만 지원합니다: {target}")
+        return output_file
+    output_file = Path(output_file)
+    if target == "epub2":
+        return output_file.with_name(f"{output_file.stem}-epub2{output_file.suffix}")
+    if target == "site":
+        return output_file.with_name(f"{output_file.stem}_site")
+    return output_file
+
+
+class Epub2Writer(epub.EpubWriter):
+    """
+    EPUB3용 EpubBook을 EPUB 2.0.1 형식으로 쓰는 EpubWriter입니다.
+    nav 문서와 EPUB3 전용 메타데이터(dcterms:modified, properties)를 빼고,
+    목차는 NCX만 사용하며 OPF에 guide를 넣습니다.
+    문서에서는 epub:type, role, aria-* 같은 EPUB3 전용 속성을 지웁니다.
+    """
+
+    def _write_opf_file(self, root):
+        root.set("version", "2.0")
+        root.attrib.pop("prefix", None)
+
+        metadata = root.find("metadata")
+        for meta in list(metadata.findall("meta")):
+            if meta.get("property"):
+                metadata.remove(meta)
+
+        manifest = root.find("manifest")
+        for item in list(manifest.findall("item")):
+            if item.get("properties") == "nav":
+                manifest.remove(item)
+            else:
+                item.attrib.pop("properties", None)
+
+        if root.find("guide") is None:
+            references = self._guide_references()
+            if references:
+                guide = epub.etree.SubElement(root, "guide")
+                for ref_type, title, href in references:
+                    epub.etree.SubElement(
+                        guide,
+                        "reference",
+                        {"type": ref_type, "title": title, "href": href},
+                    )
+
+        super()._write_opf_file(root)
+
+    def _guide_references(self):
+        """
+        표지, 목차, 본문 시작 페이지의 guide 항목을 만듭니다.
+        """
+        references = []
+        documents = [
+            item for item in self.book.spine if isinstance(item, epub.EpubHtml)
+        ]
+        for item in documents:
+            if item.file_name == "cover.xhtml":
+                references.append(("cover", item.title, item.file_name))
+            elif item.file_name == "toc.html":
+                references.append(("toc", item.title, item.file_name))
+        for item in documents:
+            if item.file_name.startswith("chapter_"):
+                references.append(("text", item.title, item.file_name))
+                break
+        return references
+
+    def _write_items(self):
+        for item in self.book.get_items():
+            if isinstance(item, epub.EpubNav):
+                continue
+            if isinstance(item, epub.EpubNcx):
+                content = self._get_ncx()
+            elif isinstance(item, epub.EpubHtml):
+                content = HTML5_DOCTYPE_PATTERN.sub(
+                    XHTML11_DOCTYPE.encode("ascii"), item.get_content(), count=1
+                )
+                content = _strip_epub3_attributes(content)
+            else:
+                content = item.get_content()
+            self.out.writestr(f"{self.book.FOLDER_NAME}/{item.file_name}", content)
+
+
+def _write_with_stream_writer(
+    book, output_file, writer_class=epub.EpubWriter, **write_options
+):
+    """
+    epub_zip.write_epub_stream으로 파일이나 스트림에 씁니다.
+    빌드 시각이나 압축 수준을 정해야 할 때 사용합니다. (ebooklib의 zip 쓰기는 둘 다 정할 수 없음)
+    """
+    if is_stream(output_file):
+        write_epub_stream(book, output_file, writer_class=writer_class, **write_options)
+    else:
+        with open(output_file, "wb") as f:
+            write_epub_stream(book, f, writer_class=writer_class, **write_options)
+    return output_file
+
+
+def _record_deflate_metrics(output_file):
+    """
+    ebooklib(zipfile)으로 쓴 EPUB의 압축 바이트 수를 지표에 더합니다.
+    (epub_zip.ZipStreamWriter로 쓴 항목은 압축할 때 바로 더함)
+    """
+    if not metrics_enabled():
+        return
+    with zipfile.ZipFile(output_file) as zf:
+        for info in zf.infolist():
+            if info.compress_type == zipfile.ZIP_DEFLATED:
+                inc("md_to_epub_deflate_input_bytes_total", info.file_size)
+                inc("md_to_epub_deflate_output_bytes_total", info.compress_size)
+
+
+def write_epub3(book, output_file, build_time=None, compress_level=None):
+    """
+    책을 EPUB3 파일로 씁니다. output_file이 스트림이면 seek 없이 바로 내보냅니다.
+    build_time(datetime)을 주면 OPF와 zip 항목의 시각을 그 시각으로 고정합니다.
+    compress_level(zlib 압축 수준)을 주면 기본 수준 대신 사용합니다.
+    """
+    if build_time is not None or compress_level is not None:
+        return _write_with_stream_writer(
+            book,
+            output_file,
+            build_time=build_time,
+            compress_level=zlib_level(compress_level),
+        )
+    if is_stream(output_file):
+        write_epub_stream(book, output_file)
+    else:
+        epub.write_epub(str(output_file), book, {})
+        _record_deflate_metrics(output_file)
+    return output_file
+
+
+def write_epub2(book, output_file, build_time=None, compress_level=None):
+    """
+    책을 EPUB2 파일로 씁니다. build_time과 compress_level은 write_epub3과 같습니다.
+    """
+    if build_time is not None or compress_level is not None:
+        return _write_with_stream_writer(
+            book,
+            output_file,
+            Epub2Writer,
+            build_time=build_time,
+            compress_level=zlib_level(compress_level),
+        )
+    writer = Epub2Writer(str(output_file), book, {})
+    writer.process()
+    writer.write()
+    _record_deflate_metrics(output_file)
+    return output_file
+
+
+def _site_nav_links(documents, index):
+    links = []
+    if index > 0:
+        links.append(toc_node("이전", documents[index - 1].file_name))
+    links.append(toc_node("목차", SITE_INDEX_FILENAME))
+    if index + 1 < len(documents):
+        links.append(toc_node("다음", documents[index + 1].file_name))
+    return links
+
+
+def write_site(book, output_dir, build_time=None, compress_level=None):
+    """
+    책을 웹 뷰어용 정적 HTML 사이트로 씁니다.
+    EPUB 안의 경로를 그대로 사용하므로 스타일, 폰트, 이미지, 검색 색인, 위치 지도를
+    그대로 불러올 수 있습니다. 첫 페이지(index.html)는 EPUB nav 문서로 만든 목차이고,
+    각 페이지 끝에는 이전/목차/다음 링크가 들어갑니다.
+    build_time과 compress_level은 다른 형식과 같은 호출 방식을 위한 것으로 사용하지 않습니다.
+    """
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    writer = epub.EpubWriter(None, book, {})
+    documents = [item for item in book.spine if isinstance(item, epub.EpubHtml)]
+    positions = {item.file_name: i for i, item in enumerate(documents)}
+    nav_template = get_template("site_nav")
+    link_template = get_template("toc_item")
+
+    for item in book.get_items():
+        if isinstance(item, epub.EpubNcx):
+            continue
+        if isinstance(item, epub.EpubNav):
+            with open(output_dir / SITE_INDEX_FILENAME, "wb") as f:
+                f.write(writer._get_nav(item))
+            continue
+
+        target_file = output_dir / item.file_name
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        content = item.get_content()
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        if item.file_name in positions:
+            page = content.decode("utf-8")
+            body_end = page.rfind("</body>")
+            with open(target_file, "w", encoding="utf-8") as f:
+                f.write(page[:body_end])
+                nav_template.render_to(
+                    f,
+                    {
+                        "links": render_items(
+                            link_template,
+                            _site_nav_links(documents, positions[item.file_name]),
+                        )
+                    },
+                )
+                f.write(page[body_end:])
+        else:
+            with open(target_file, "wb") as f:
+                f.write(content)
+
+    return output_dir
+
+
+# 형식 이름(resource_to_epub.TARGETS) -> 쓰기 함수
+TARGET_WRITERS = {
+    "epub3": write_epub3,
+    "epub2": write_epub2,
+    "site": write_site,
+}
+
+
+def write_targets(book, output_file, targets, build_time=None, compress_level=None):
+    """
+    한 번 만든 책을 여러 형식으로 내보냅니다. 형식 이름 -> 출력 경로 사전을 반환합니다.
+    build_time(datetime)을 주면 모든 형식의 빌드 시각을 그 시각으로 고정합니다.
+    compress_level(zlib 압축 수준)을 주면 EPUB 형식을 그 수준으로 압축합니다.
+    """
+    outputs = {}
+    for target in targets:
+        outputs[target] = TARGET_WRITERS[target](
+            book, target_output_path(output_file, target), build_time, compress_level
+        )
+    return outputs
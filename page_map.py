@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import html
+import json
+import re
+
+from search_index import heading_id
+
+# 위치 지도 파일 이름 (HTML 출력 디렉토리의 사이드카 파일 및 EPUB 내부 경로)
+PAGE_MAP_FILENAME = "page_map.json"
+PAGE_MAP_EPUB_PATH = "positions/page_map.json"
+PAGE_MAP_VERSION = 1
+
+# 한 페이지에 들어가는 글자 수 (공백 제외). 한글 단행본 한 쪽 분량 기준
+DEFAULT_PAGE_CHARS = 700
+
+# 쪽 표시(page break)를 넣을 수 있는 블록 태그로 시작하는 줄
+BLOCK_START_PATTERN = re.compile(
+    r"^<(?:p|h[1-6]|ul|ol|dl|table|pre|blockquote|div|figure|hr)\b"
+)
+HEADING_LINE_PATTERN = re.compile(r"^<h[1-6]\b")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def count_chars(html_fragment):
+    """
+    HTML 조각의 본문 글자 수를 셉니다.
+    태그를 지우고 엔티티를 풀어낸 뒤, 띄어쓰기에 따라 값이 달라지지 않도록 공백을 제외하고 셉니다.
+    한글은 음절 하나가 한 글자입니다.
+    """
+    text = html.unescape(TAG_PATTERN.sub("", html_fragment))
+    return len(WHITESPACE_PATTERN.sub("", text))
+
+
+def page_break_marker(page_num):
+    """
+    page_num 쪽이 시작되는 위치에 넣을 빈 요소를 반환합니다.
+    EPUB3 nav의 page-list는 epub:type이 있는 요소로부터 만들어집니다.
+    """
+    return (
+        f'<span epub:type="pagebreak" role="doc-pagebreak" '
+        f'id="page_{page_num}" aria-label="{page_num}"></span>'
+    )
+
+
+class PageMapBuilder:
+    """
+    챕터 HTML을 순서대로 받아 일정한 글자 수(page_chars)마다 쪽 표시를 넣고
+    책 전체의 글자 위치 지도(position map)를 만듭니다.
+
+    위치는 책 처음부터 센 글자 수(공백 제외)입니다.
+    쪽 표시는 블록(문단, 헤딩, 목록, 표 등) 앞에만 넣으므로, n쪽 표시는
+    (n-1) * page_chars 위치가 포함된 블록 다음의 첫 블록 앞에 놓입니다.
+    """
+
+    def __init__(self, page_chars=DEFAULT_PAGE_CHARS):
+        if page_chars <= 0:
+            raise ValueError("page_chars는 1 이상이어야 합니다.")
+        self.page_chars = page_chars
+        self.position = 0
+        self.page_count = 0
+        self.chapters = []
+
+    def add_chapter(self, file_name, chapter_num, content, heading_offset=0):
+        """
+        챕터 본문 HTML에 쪽 표시를 넣어 반환하고, 챕터의 위치 정보를 기록합니다.
+        heading_offset은 content 앞에 템플릿이 넣는 헤딩 수입니다.
+        (헤딩 ID 번호가 챕터 파일 전체의 헤딩 순서로 매겨지므로 필요)
+        """
+        start = self.position
+        headings = [
+            [heading_id(chapter_num, i), start] for i in range(heading_offset)
+        ]
+        first_page = self.page_count + 1
+
+        lines = []
+        for line in content.split("\n"):
+            stripped = line.lstrip()
+            if BLOCK_START_PATTERN.match(stripped):
+                while self.page_count * self.page_chars <= self.position:
+                    self.page_count += 1
+                    lines.append(page_break_marker(self.page_count))
+                if HEADING_LINE_PATTERN.match(stripped):
+                    headings.append(
+                        [heading_id(chapter_num, len(headings)), self.position]
+                    )
+            lines.append(line)
+            self.position += count_chars(line)
+
+        self.chapters.append(
+            {
+                "file": file_name,
+                "start": start,
+                "length": self.position - start,
+                # 이 챕터에 들어간 쪽 표시 범위 (없으면 빈 범위)
+                "pages": [first_page, self.page_count],
+                "headings": headings,
+            }
+        )
+        return "\n".join(lines)
+
+    def finish(self):
+        """
+        직렬화 가능한 위치 지도 사전을 반환합니다.
+        """
+        return {
+            "version": PAGE_MAP_VERSION,
+            "unit": "chars",
+            "page_chars": self.page_chars,
+            "total": self.position,
+            "page_count": self.page_count,
+            "chapters": self.chapters,
+        }
+
+
+def write_page_map(page_map, output_file):
+    """
+    위치 지도를 공백 없는 JSON 파일로 저장합니다.
+    """
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(page_map, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def locate(page_map, position):
+    """
+    책 전체 위치(글자 수)가 들어 있는 챕터 파일과 그 챕터 안의 위치, 진행률(0~1)을 반환합니다.
+    """
+    position = max(0, min(position, page_map["total"]))
+    chapter = page_map["chapters"][0]
+    for candidate in page_map["chapters"]:
+        if candidate["start"] > position:
+            break
+        chapter = candidate
+    progress = position / page_map["total"] if page_map["total"] else 0.0
+    return chapter["file"], position - chapter["start"], progress
+
+
+def add_page_map_arguments(parser):
+    """
+    쪽 목록과 위치 지도 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--page-list",
+        action="store_true",
+        help="글자 수 기준 쪽 목록(nav page-list)과 위치 지도를 생성합니다",
+    )
+    parser.add_argument(
+        "--page-chars",
+        type=int,
+        default=DEFAULT_PAGE_CHARS,
+        help=f"한 쪽의 글자 수, 공백 제외 (기본값: {DEFAULT_PAGE_CHARS})",
+    )
+
+
+def page_chars_from_args(args):
+    """
+    명령줄 옵션에서 쪽 글자 수를 가져옵니다. 쪽 목록을 만들지 않으면 None을 반환합니다.
+    """
+    return args.page_chars if args.page_list else None
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import time
+from contextlib import contextmanager
+
+from metrics import observe
+
+# --progress 옵션 값: text(기존처럼 메시지 출력) 또는 json(이벤트를 한 줄에 하나씩 JSON으로 출력)
+PROGRESS_FORMATS = ("text", "json")
+
+# 진행 이벤트(progress)를 보내는 최소 간격(초). 챕터마다 이벤트를 만들지 않도록 제한
+PROGRESS_INTERVAL = 0.5
+
+
+def _mb_per_s(nbytes, seconds):
+    return round(nbytes / 1024**2 / seconds, 3) if seconds > 0 else None
+
+
+class Stage:
+    """
+    진행 중인 빌드 단계 하나의 처리량을 셉니다. Progress.stage가 만듭니다.
+    """
+
+    def __init__(self, progress, name, total=None):
+        self.progress = progress
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.last_emit = self.started
+
+    def advance(self, count=1, nbytes=0):
+        """
+        처리한 항목 수와 바이트 수를 더합니다.
+        콜백이 있을 때만, PROGRESS_INTERVAL마다 또는 마지막 항목에서 progress 이벤트를 보냅니다.
+        """
+        self.done += count
+        self.bytes += nbytes
+        if self.progress.callback is None:
+            return
+        now = time.perf_counter()
+        if now - self.last_emit < self.progress.interval and self.done != self.total:
+            return
+        self.last_emit = now
+        elapsed = now - self.started
+        eta = None
+        if self.total and self.done:
+            eta = round(elapsed / self.done * (self.total - self.done), 3)
+        self.progress.emit(
+            "progress",
+            stage=self.name,
+            done=self.done,
+            total=self.total,
+            bytes=self.bytes,
+            mb_per_s=_mb_per_s(self.bytes, elapsed),
+            eta_seconds=eta,
+        )
+
+    def summary(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "stage": self.name,
+            "seconds": round(seconds, 3),
+            "done": self.done,
+            "total": self.total,
+            "bytes": self.bytes,
+            "mb_per_s": _mb_per_s(self.bytes, seconds),
+        }
+
+
+class Progress:
+    """
+    변환 함수가 진행 상황을 알리는 통로입니다.
+    callback이 없으면 메시지만 지금처럼 출력하고, 있으면 모든 것을 이벤트 사전으로 callback에 넘깁니다.
+
+    이벤트 종류 (모두 "event"와 시작 후 경과 시간 "time"을 가짐)
+    - stage_start: stage, total
+    - progress: stage, done, total, bytes, mb_per_s, eta_seconds
+    - stage_end: stage, seconds, done, total, bytes, mb_per_s
+    - message: level(info, warning, error), text
+    """
+
+    def __init__(self, callback=None, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.started = time.perf_counter()
+
+    def emit(self, event, **fields):
+        if self.callback is None:
+            return
+        self.callback(
+            {
+                "event": event,
+                "time": round(time.perf_counter() - self.started, 3),
+                **fields,
+            }
+        )
+
+    @contextmanager
+    def stage(self, name, total=None):
+        """
+        빌드 단계 하나를 감쌉니다. 시작과 끝에 이벤트를 보내고 Stage 객체를 넘겨 줍니다.
+        """
+        stage = Stage(self, name, total)
+        self.emit("stage_start", stage=name, total=total)
+        try:
+            yield stage
+        finally:
+            summary = stage.summary()
+            observe("md_to_epub_stage_seconds", summary["seconds"], stage=name)
+            self.emit("stage_end", **summary)
+
+    def message(self, text, level="info"):
+        """
+        사람이 읽는 메시지를 알립니다. callback이 없으면 출력합니다.
+        """
+        if self.callback is None:
+            print(text)
+        else:
+            self.emit("message", level=level, text=text)
+
+    def forward(self, events):
+        """
+        다른 프로세스에서 Progress(events.append)로 모은 이벤트를 이 Progress로 다시 보냅니다.
+        callback이 없으면 메시지만 출력합니다. (이벤트의 "time"은 그 프로세스 기준)
+        """
+        for event in events:
+            if self.callback is not None:
+                self.callback(event)
+            elif event["event"] == "message":
+                print(event["text"])
+
+
+def as_progress(progress=None):
+    """
+    None이나 콜백 함수도 받을 수 있도록 Progress 객체로 바꿉니다.
+    """
+    if isinstance(progress, Progress):
+        return progress
+    return Progress(progress)
+
+
+def json_lines_callback(stream=None):
+    """
+    이벤트를 한 줄에 하나씩 JSON으로 쓰는 콜백을 만듭니다. (기본값: 현재 표준 출력)
+    """
+    stream = stream or sys.stdout
+
+    def write_event(event):
+        stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        stream.flush()
+
+    return write_event
+
+
+def add_progress_arguments(parser):
+    """
+    진행 상황 출력 형식 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--progress",
+        choices=PROGRESS_FORMATS,
+        default="text",
+        help="진행 상황 출력 형식: text(메시지) 또는 json(단계 시작/끝, 처리량 이벤트를 "
+        "한 줄에 하나씩 JSON으로) (기본값: text)",
+    )
+
+
+def progress_from_args(args, stream=None):
+    """
+    명령줄 옵션에서 Progress를 만듭니다. json이면 이벤트를 stream(기본값: 표준 출력)에 씁니다.
+    """
+    if args.progress == "json":
+        return Progress(json_lines_callback(stream))
+    return Progress()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import uuid
+from datetime import datetime, timezone
+
+# 재현 가능한 빌드의 기준 시각을 주는 환경 변수 (https://reproducible-builds.org/specs/source-date-epoch/)
+SOURCE_DATE_EPOCH_ENV = "SOURCE_DATE_EPOCH"
+
+# 기준 시각이 없을 때 사용하는 고정 시각 (zip 파일이 표현할 수 있는 가장 이른 시각)
+DEFAULT_BUILD_TIME = datetime(1980, 1, 1)
+
+# 메타데이터로 고정 식별자를 만들 때 사용하는 UUID 이름 공간
+IDENTIFIER_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "md_to_epub")
+
+
+def reproducible_build_time():
+    """
+    재현 가능한 빌드에 기록할 시각(UTC, 시간대 정보 없음)을 반환합니다.
+    SOURCE_DATE_EPOCH 환경 변수가 있으면 그 시각, 없으면 DEFAULT_BUILD_TIME입니다.
+    이 시각이 OPF의 dcterms:modified와 zip 항목의 수정 시각이 됩니다.
+    """
+    epoch = os.environ.get(SOURCE_DATE_EPOCH_ENV)
+    if not epoch:
+        return DEFAULT_BUILD_TIME
+    try:
+        build_time = datetime.fromtimestamp(int(epoch), timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(
+            f"{SOURCE_DATE_EPOCH_ENV}는 유닉스 시각(초)이어야 합니다: {epoch}"
+        ) from None
+    return max(build_time.replace(tzinfo=None), DEFAULT_BUILD_TIME)
+
+
+def reproducible_identifier(metadata=None):
+    """
+    메타데이터 내용으로 정해지는 고정 식별자(urn:uuid)를 만듭니다.
+    metadata.json에 identifier가 없을 때 출력 파일 이름 대신 사용합니다.
+    """
+    canonical = json.dumps(metadata or {}, ensure_ascii=False, sort_keys=True)
+    return f"urn:uuid:{uuid.uuid5(IDENTIFIER_NAMESPACE, canonical)}"
+
+
+def add_reproducible_arguments(parser):
+    """
+    재현 가능한 빌드 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="같은 입력이면 바이트 단위로 같은 EPUB을 만듭니다. 수정 시각은 "
+        f"{SOURCE_DATE_EPOCH_ENV} 환경 변수 또는 1980-01-01, 식별자가 없으면 메타데이터로 만듭니다",
+    )
+
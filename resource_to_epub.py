@@ -1,397 +1,603 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import sys
+import json
+import time
 import argparse
-import subprocess
+import contextlib
 from pathlib import Path
-from resource_to_html import convert_resource_to_html
+from resource_to_html import add_build_arguments, convert_resource_to_html
+from markdown_engines import MARKDOWN_ENGINES
+from image_pipeline import add_image_arguments, image_options_from_args
+from search_index import SEARCH_INDEX_EPUB_PATH, SEARCH_INDEX_FILENAME
+from page_map import PAGE_MAP_EPUB_PATH, add_page_map_arguments, page_chars_from_args
+from epub_validator import (
+    EpubValidationError,
+    add_validation_arguments,
+    check_epub,
+    validation_from_args,
+)
+from build_workspace import add_workspace_arguments, cleanup_workspace, create_workspace
+from sample_build import add_sample_arguments, sample_from_args
+from build_plan import add_plan_arguments, plan_resource, print_plan
+from build_manifest import assets_with_role, load_manifest, read_page
+from epub_compress import (
+    COMPRESSION_LEVELS,
+    add_compression_arguments,
+    compression_stats,
+    format_compression_report,
+    recompress_epub,
+)
+from metrics import (
+    add_metrics_arguments,
+    metrics_from_args,
+    record_build,
+    write_metrics_from_args,
+)
+from progress import add_progress_arguments, as_progress, progress_from_args
+from reproducible_build import (
+    add_reproducible_arguments,
+    reproducible_build_time,
+    reproducible_identifier,
+)
+from volume_split import (
+    add_volume_arguments,
+    convert_resource_to_volumes,
+    volumes_from_args,
+)
+from toc_tree import (
+    DEFAULT_TOC_OPTIONS,
+    add_toc_arguments,
+    chapter_groups,
+    group_nodes,
+    nest_headings,
+    toc_node,
+    toc_options_from_args,
+)
+
+# --search-index 옵션 값: 색인을 EPUB 안에 넣을지, 옆에 사이드카 파일로 둘지
+SEARCH_INDEX_MODES = ("none", "epub", "sidecar", "both")
+
+# --backend 옵션 값: 내장 패키저(ebooklib) 또는 Calibre의 ebook-convert
+BACKENDS = ("native", "calibre")
+
+# --targets 옵션 값: 한 번 만든 책을 내보낼 형식 (EPUB3, EPUB2, 웹 뷰어용 정적 사이트)
+TARGETS = ("epub3", "epub2", "site")
+
+
+def parse_targets(value):
+    """
+    "epub3,site" 형식의 문자열을 출력 형식 목록으로 변환합니다.
+    """
+    targets = [target.strip() for target in value.split(",") if target.strip()]
+    for target in targets:
+        if target not in TARGETS:
+            raise argparse.ArgumentTypeError(f"알 수 없는 출력 형식입니다: {target}")
+    if not targets:
+        raise argparse.ArgumentTypeError("출력 형식을 하나 이상 지정해야 합니다.")
+    return targets
 
 
-def convert_html_to_epub(html_dir, output_file, metadata=None):
+def nav_toc_entry(node):
     """
-    HTML 파일들을 EPUB으로 변환합니다.
+    목차 항목(toc_tree.toc_node)을 ebooklib의 목차 항목으로 변환합니다.
+    하위 항목이 있으면 (Link 또는 챕터 묶음의 Section, [하위 항목]) 형식이 됩니다.
     """
-    try:
-        import ebooklib
-        from ebooklib import epub
-        from bs4 import BeautifulSoup
-        import re
-
-        # EPUB 객체 생성
-        book = epub.EpubBook()
-
-        # 메타데이터 설정
-        book.set_identifier(
-            metadata.get("identifier", f"id-{os.path.basename(output_file)}")
-            if metadata
-            else f"id-{os.path.basename(output_file)}"
-        )
-        book.set_title(metadata.get("title", "제목 없음") if metadata else "제목 없음")
-        book.set_language(metadata.get("language", "ko") if metadata else "ko")
-        book.add_author(
-            metadata.get("creator", "저자 미상") if metadata else "저자 미상"
-        )
+    from ebooklib import epub
 
-        if metadata and "publisher" in metadata:
-            book.add_metadata("DC", "publisher", metadata["publisher"])
+    file_name, _, fragment = node["href"].partition("#")
+    if node.get("group"):
+        entry = epub.Section(node["title"], node["href"])
+    else:
+        entry = epub.Link(node["href"], node["title"], fragment or Path(file_name).stem)
 
-        if metadata and "date" in metadata:
-            book.add_metadata("DC", "date", metadata["date"])
+    if not node["children"]:
+        return entry
+    return (entry, [nav_toc_entry(child) for child in node["children"]])
 
-        # 스타일시트 추가
-        html_path = Path(html_dir)
-        css_file = html_path / "style.css"
 
-        if css_file.exists():
-            with open(css_file, "r", encoding="utf-8") as f:
-                css_content = f.read()
+def default_identifier(output_file=None, reproducible=False):
+    """
+    metadata.json에 identifier가 없을 때 사용할 식별자를 정합니다.
+    출력 파일이 있으면 id-<파일 이름>, 스트림이나 메모리 출력이면 id-book입니다.
+    reproducible이 True이면 출력 이름과 무관하게 메타데이터로 만들도록 None을 반환합니다.
+    """
+    from output_targets import is_stream
 
-            style = epub.EpubItem(
-                uid="style",
-                file_name="style.css",
-                media_type="text/css",
-                content=css_content,
-            )
-            book.add_item(style)
-
-        # 폰트 파일 추가
-        fonts_dir = html_path / "fonts"
-        if fonts_dir.exists():
-            for font_file in fonts_dir.glob("*"):
-                if font_file.is_file():
-                    font_name = font_file.name
-                    with open(font_file, "rb") as f:
-                        font_content = f.read()
-
-                    # 폰트 파일 확장자에 따른 MIME 타입 설정
-                    if font_name.endswith(".woff2"):
-                        media_type = "font/woff2"
-                    elif font_name.endswith(".woff"):
-                        media_type = "font/woff"
-                    elif font_name.endswith(".ttf"):
-                        media_type = "font/ttf"
-                    elif font_name.endswith(".otf"):
-                        media_type = "font/otf"
-                    else:
-                        media_type = "application/octet-stream"
+    if reproducible:
+        return None
+    if output_file is None or is_stream(output_file):
+        return "id-book"
+    return f"id-{os.path.basename(output_file)}"
+
+
+def build_epub_book(
+    html_dir,
+    metadata=None,
+    embed_search_index=False,
+    default_identifier="id-book",
+    toc_options=None,
+    progress=None,
+):
+    """
+    HTML 디렉토리의 파일들로 EpubBook 객체를 만듭니다. (파일로 저장하지 않음)
+    페이지 순서, 제목, 헤딩 목록과 리소스는 HTML 단계가 남긴 manifest.json에서 읽으므로
+    디렉토리를 훑거나 챕터를 파싱하지 않습니다. (없으면 build_manifest.scan_html_dir로 만듦)
+    metadata가 없으면 빌드 목록의 메타데이터를 사용하며, identifier가 없으면 default_identifier를 사용합니다.
+    default_identifier가 None이면 메타데이터 내용으로 만든 고정 식별자를 사용합니다. (재현 가능한 빌드)
+    toc_options(toc_tree.TocOptions)의 nav_depth와 group_size로 내비게이션 목차의
+    헤딩 단계와 챕터 묶음을 정합니다. metadata의 "volumes"가 있으면 그 묶음을 사용합니다.
+    progress(progress.Progress)로 페이지별 처리량을 알립니다.
+    """
+    progress = as_progress(progress)
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    from ebooklib import epub
+
+    # 빌드 목록 읽기 (페이지 순서, 제목, 헤딩 목록, 리소스)
+    html_path = Path(html_dir)
+    manifest = load_manifest(html_path)
+    metadata = metadata or manifest.get("metadata")
+
+    def read_file(entry):
+        with open(html_path / entry["file"], "rb") as f:
+            return f.read()
+
+    if default_identifier is None:
+        default_identifier = reproducible_identifier(metadata)
+
+    # EPUB 객체 생성
+    book = epub.EpubBook()
+
+    # 메타데이터 설정
+    book.set_identifier(
+        metadata.get("identifier", default_identifier)
+        if metadata
+        else default_identifier
+    )
+    book.set_title(metadata.get("title", "제목 없음") if metadata else "제목 없음")
+    book.set_language(metadata.get("language", "ko") if metadata else "ko")
+    book.add_author(
+        metadata.get("creator", "저자 미상") if metadata else "저자 미상"
+    )
 
-                    font_item = epub.EpubItem(
-                        uid=f"font_{font_name.replace('.', '_')}",
-                        file_name=f"fonts/{font_name}",
-                        media_type=media_type,
-                        content=font_content,
-                    )
-                    book.add_item(font_item)
-                    print(f"폰트 파일을 EPUB에 추가했습니다: {font_name}")
-
-        # 표지 이미지 추가
-        cover_file = html_path / "cover.jpg"
-        if cover_file.exists():
-            with open(cover_file, "rb") as f:
-                cover_content = f.read()
-
-            # 커버 이미지 추가
-            cover_image = epub.EpubItem(
-                uid="cover-image",
-                file_name="images/cover.jpg",
-                media_type="image/jpeg",
-                content=cover_content,
-            )
-            book.add_item(cover_image)
+    if metadata and "publisher" in metadata:
+        book.add_metadata("DC", "publisher", metadata["publisher"])
 
-            # 표지 설정 (메타데이터)
+    if metadata and "date" in metadata:
+        book.add_metadata("DC", "date", metadata["date"])
+
+    # 시리즈 정보 (여러 권으로 나눈 책은 몇 번째 권인지 함께 기록)
+    if metadata and "series" in metadata:
+        book.add_metadata(
+            None,
+            "meta",
+            metadata["series"],
+            {"property": "belongs-to-collection", "id": "series"},
+        )
+        book.add_metadata(
+            None,
+            "meta",
+            "series",
+            {"refines": "#series", "property": "collection-type"},
+        )
+        # EPUB2 리더와 calibre가 읽는 시리즈 정보
+        book.add_metadata(
+            None, "meta", "", {"name": "calibre:series", "content": metadata["series"]}
+        )
+        if "series_index" in metadata:
             book.add_metadata(
-                None, "meta", "", {"name": "cover", "content": "cover-image"}
+                None,
+                "meta",
+                str(metadata["series_index"]),
+                {"refines": "#series", "property": "group-position"},
             )
-
-            # 커버 페이지 생성 (이미지만 포함)
-            cover_page_content = f"""
-            <html xmlns="http://www.w3.org/1999/xhtml">
-            <head>
-                <title>Cover</title>
-                <meta charset="utf-8" />
-            </head>
-            <body>
-                <div style="text-align: center; padding: 0; margin: 0;">
-                    <img src="images/cover.jpg" alt="Cover" style="height: 100%; max-width: 100%;" />
-                </div>
-            </body>
-            </html>
-            """
-
-            # 커버 페이지 추가
-            cover_page = epub.EpubHtml(
-                uid="cover-page",
-                title="Cover",
-                file_name="cover.xhtml",
-                content=cover_page_content,
-                media_type="application/xhtml+xml",
+            book.add_metadata(
+                None,
+                "meta",
+                "",
+                {
+                    "name": "calibre:series_index",
+                    "content": str(metadata["series_index"]),
+                },
             )
-            book.add_item(cover_page)
-
-        # HTML 파일 읽기 및 추가
-        chapters = []
-
-        # 커버 페이지가 있으면 추가
-        if cover_file.exists():
-            chapters.append(cover_page)
 
-        # 제목 페이지 추가
-        title_html = html_path / "title.html"
-        if title_html.exists():
-            with open(title_html, "r", encoding="utf-8") as f:
-                title_content = f.read()
+    # 스타일시트 추가
+    style = None
+    for asset in assets_with_role(manifest, "style"):
+        style = epub.EpubItem(
+            uid="style",
+            file_name=asset["file"],
+            media_type=asset["media_type"],
+            content=read_file(asset),
+        )
+        book.add_item(style)
+
+    # 폰트 파일 추가
+    fonts = assets_with_role(manifest, "font")
+    for asset in fonts:
+        font_name = Path(asset["file"]).name
+        font_item = epub.EpubItem(
+            uid=f"font_{font_name.replace('.', '_')}",
+            file_name=asset["file"],
+            media_type=asset["media_type"],
+            content=read_file(asset),
+        )
+        book.add_item(font_item)
+    if fonts:
+        progress.message(
+            "폰트 파일을 EPUB에 추가했습니다: "
+            + ", ".join(Path(asset["file"]).name for asset in fonts)
+        )
 
-            title_page = epub.EpubHtml(
-                title="제목", file_name="title.html", content=title_content
-            )
-            if css_file.exists():
-                title_page.add_item(style)
-            book.add_item(title_page)
-            chapters.append(title_page)
-
-        # 판권 페이지 추가 (목차 이전에 추가)
-        colophon_html = html_path / "colophon.html"
-        if colophon_html.exists():
-            with open(colophon_html, "r", encoding="utf-8") as f:
-                colophon_content = f.read()
-
-            colophon_page = epub.EpubHtml(
-                title="판권", file_name="colophon.html", content=colophon_content
-            )
-            if css_file.exists():
-                colophon_page.add_item(style)
-            book.add_item(colophon_page)
-            chapters.append(colophon_page)
-
-        # 목차 페이지 추가
-        toc_html = html_path / "toc.html"
-        if toc_html.exists():
-            with open(toc_html, "r", encoding="utf-8") as f:
-                toc_content = f.read()
-
-            toc_page = epub.EpubHtml(
-                title="목차", file_name="toc.html", content=toc_content
+    # 본문 이미지 추가
+    for asset in assets_with_role(manifest, "image"):
+        image_item = epub.EpubItem(
+            uid=f"image_{Path(asset['file']).stem}",
+            file_name=asset["file"],
+            media_type=asset["media_type"],
+            content=read_file(asset),
+        )
+        book.add_item(image_item)
+
+    # 검색 색인 추가
+    if embed_search_index:
+        for asset in assets_with_role(manifest, "search_index"):
+            search_index_item = epub.EpubItem(
+                uid="search-index",
+                file_name=SEARCH_INDEX_EPUB_PATH,
+                media_type=asset["media_type"],
+                content=read_file(asset),
             )
-            if css_file.exists():
-                toc_page.add_item(style)
-            book.add_item(toc_page)
-            chapters.append(toc_page)
-
-        # 챕터 파일 추가
-        chapter_files = sorted(
-            [
-                f
-                for f in os.listdir(html_dir)
-                if f.startswith("chapter_") and f.endswith(".html")
-            ]
+            book.add_item(search_index_item)
+
+    # 위치 지도 추가 (쪽 목록은 챕터의 쪽 표시로부터 nav에 생성됨)
+    for asset in assets_with_role(manifest, "page_map"):
+        page_map_item = epub.EpubItem(
+            uid="page-map",
+            file_name=PAGE_MAP_EPUB_PATH,
+            media_type=asset["media_type"],
+            content=read_file(asset),
         )
+        book.add_item(page_map_item)
+
+    # HTML 파일 읽기 및 추가
+    chapters = []
+
+    # 표지 이미지 추가
+    for asset in assets_with_role(manifest, "cover"):
+        # 커버 이미지 추가
+        cover_image = epub.EpubItem(
+            uid="cover-image",
+            file_name="images/cover.jpg",
+            media_type=asset["media_type"],
+            content=read_file(asset),
+        )
+        book.add_item(cover_image)
 
-        for chapter_file in chapter_files:
-            chapter_path = html_path / chapter_file
-            with open(chapter_path, "r", encoding="utf-8") as f:
-                chapter_content = f.read()
-
-            # 챕터 제목 추출
-            chapter_title = f"Chapter {chapter_file.split('_')[1].split('.')[0]}"
+        # 표지 설정 (메타데이터)
+        book.add_metadata(
+            None, "meta", "", {"name": "cover", "content": "cover-image"}
+        )
 
-            # HTML에서 제목 추출 시도
-            title_match = re.search(r"<title>(.*?)</title>", chapter_content)
-            if title_match:
-                chapter_title = title_match.group(1)
+        # 커버 페이지 생성 (이미지만 포함)
+        cover_page_content = """
+        <html xmlns="http://www.w3.org/1999/xhtml">
+        <head>
+            <title>Cover</title>
+            <meta charset="utf-8" />
+        </head>
+        <body>
+            <div style="text-align: center; padding: 0; margin: 0;">
+                <img src="images/cover.jpg" alt="Cover" style="height: 100%; max-width: 100%;" />
+            </div>
+        </body>
+        </html>
+        """
+
+        # 커버 페이지 추가 (스파인의 첫 페이지)
+        cover_page = epub.EpubHtml(
+            uid="cover-page",
+            title="Cover",
+            file_name="cover.xhtml",
+            content=cover_page_content,
+            media_type="application/xhtml+xml",
+        )
+        book.add_item(cover_page)
+        chapters.append(cover_page)
+
+    # 챕터별 내비게이션 항목 (표지, 제목, 판권, 목차 페이지를 제외한 본문 챕터)
+    nav_chapter_nodes = []
+
+    # 페이지 추가 (빌드 목록 순서: 제목 -> 판권 -> 목차 -> 내용)
+    with progress.stage("epub.pages", len(manifest["pages"])) as stage:
+        for page in manifest["pages"]:
+            item = epub.EpubHtml(
+                title=page["title"],
+                file_name=page["file"],
+                content=read_page(html_path, manifest, page),
+                media_type=page["media_type"],
+            )
+            if style is not None:
+                item.add_item(style)
+            book.add_item(item)
+            chapters.append(item)
+            stage.advance(nbytes=page.get("size", 0))
+
+            if page["role"] != "chapter":
+                continue
+
+            # 첫 h1 이전의 헤딩은 목차에 넣지 않음
+            nav_headings = []
+            for level, text, header_id in page.get("headings", []):
+                if level == 1 or nav_headings:
+                    nav_headings.append(
+                        (level, toc_node(text, f"{page['file']}#{header_id}"))
+                    )
 
-            # ID 속성 추가
-            soup = BeautifulSoup(chapter_content, "html.parser")
-            headers = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
-            for i, header in enumerate(headers):
-                if not header.get("id"):
-                    header_id = f"header_{chapter_file.split('.')[0]}_{i}"
-                    header["id"] = header_id
+            # h1 헤더가 없는 경우 챕터 자체를 목차 항목으로 추가
+            nav_chapter_nodes.append(
+                nest_headings(nav_headings, toc_options.nav_depth)
+                or [toc_node(item.title, item.file_name)]
+            )
 
-            chapter_content = str(soup)
+    # 책 구조 설정 (h1, h2, h3 단계 목차, 챕터 묶음이 있으면 묶음 아래에 중첩)
+    groups = chapter_groups(
+        len(nav_chapter_nodes),
+        metadata.get("volumes") if metadata else None,
+        toc_options.group_size,
+    )
+    book.toc = [
+        nav_toc_entry(node) for node in group_nodes(nav_chapter_nodes, groups)
+    ]
+
+    # 스파인 설정 (책의 페이지 순서: 커버 -> 제목 -> 판권 -> 목차 -> 내용)
+    book.spine = chapters
+
+    # 네비게이션 파일 추가
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+
+    return book
+
+
+def convert_html_to_epub(
+    html_dir,
+    output_file,
+    metadata=None,
+    embed_search_index=False,
+    validate=True,
+    toc_options=None,
+    targets=("epub3",),
+    progress=None,
+    reproducible=False,
+    compression="default",
+):
+    """
+    HTML 파일들을 EPUB으로 변환합니다.
+    embed_search_index가 True이고 HTML 디렉토리에 검색 색인이 있으면 EPUB 리소스로 함께 넣습니다.
+    validate가 True이면 생성 후 EPUB 구조를 검사하고, 오류가 있으면 만든 EPUB 파일을 지우고
+    실패(None)로 처리합니다.
+    validate가 epub_validator.VALIDATE_WARN이면 오류를 알리기만 합니다.
+    toc_options는 내비게이션 목차 설정입니다. (build_epub_book 참고)
+    targets(TARGETS 중 여러 개)를 주면 한 번 만든 책을 각 형식으로 내보냅니다.
+    epub3는 output_file에, 나머지는 output_targets.target_output_path의 경로에 저장됩니다.
+    output_file은 경로 대신 쓰기 가능한 바이너리 스트림(sys.stdout.buffer, 소켓 파일 등)일 수 있으며,
+    이때는 epub3만 seek 없이 스트림에 바로 씁니다.
+    progress(progress.Progress)가 주어지면 메시지와 단계별 처리량을 그쪽으로 보냅니다.
+    reproducible이 True이면 같은 입력에서 바이트 단위로 같은 EPUB을 만듭니다.
+    (빌드 시각은 reproducible_build.reproducible_build_time, 식별자가 없으면 메타데이터로 만든 고정 값)
+    compression은 epub_compress.COMPRESSION_PROFILES 중 하나로, 형식별 압축 결과를 함께 알립니다.
+    max이면 EPUB을 쓴 뒤 모든 항목을 병렬로 다시 압축합니다. (epub_compress.recompress_epub)
+    """
+    progress = as_progress(progress)
+    try:
+        from output_targets import is_stream, target_output_path, write_targets
+
+        book = build_epub_book(
+            html_dir,
+            metadata,
+            embed_search_index,
+            default_identifier=default_identifier(output_file, reproducible),
+            toc_options=toc_options,
+            progress=progress,
+        )
 
-            chapter = epub.EpubHtml(
-                title=chapter_title, file_name=chapter_file, content=chapter_content
+        # 형식별 파일 저장
+        build_time = reproducible_build_time() if reproducible else None
+        # max 압축으로 스트림에 내보낼 때는 메모리에 먼저 쓴 뒤 다시 압축하며 내보냄
+        write_output = output_file
+        if compression == "max" and is_stream(output_file):
+            write_output = io.BytesIO()
+        with progress.stage("epub.write", len(targets)) as stage:
+            outputs = write_targets(
+                book,
+                write_output,
+                targets,
+                build_time,
+                COMPRESSION_LEVELS[compression],
             )
-            if css_file.exists():
-                chapter.add_item(style)
-            book.add_item(chapter)
-            chapters.append(chapter)
-
-        # 책 구조 설정
-        book.toc = []
-
-        # 목차 항목 추가
-        if len(chapters) > 1:  # 제목 페이지와 목차 페이지를 제외한 챕터가 있는 경우
-            for chapter in chapters[2:]:  # 제목 페이지와 목차 페이지 이후의 챕터
-                # 챕터 내의 헤더 찾기
-                soup = BeautifulSoup(chapter.content, "html.parser")
-                h1_headers = soup.find_all("h1")
-
-                if h1_headers:
-                    # 각 h1 헤더에 대한 목차 항목 추가
-                    for h1 in h1_headers:
-                        h1_id = h1.get("id", "")
-                        h1_text = h1.get_text()
-
-                        # h1 목차 항목 추가
-                        h1_link = epub.Link(
-                            f"{chapter.file_name}#{h1_id}", h1_text, h1_id
-                        )
-
-                        # h2 헤더 찾기
-                        h2_items = []
-                        current_h1 = h1
-                        next_h1 = h1.find_next("h1")
-
-                        # 현재 h1과 다음 h1 사이의 모든 h2 찾기
-                        current_element = current_h1.next_sibling
-                        while current_element and (
-                            next_h1 is None or current_element != next_h1
-                        ):
-                            if current_element.name == "h2":
-                                h2_id = current_element.get("id", "")
-                                h2_text = current_element.get_text()
-                                h2_link = epub.Link(
-                                    f"{chapter.file_name}#{h2_id}", h2_text, h2_id
-                                )
-                                h2_items.append(h2_link)
-                            current_element = current_element.next_sibling
-
-                        if h2_items:
-                            book.toc.append((h1_link, h2_items))
-                        else:
-                            book.toc.append(h1_link)
+            for target_file in outputs.values():
+                if not is_stream(target_file) and Path(target_file).is_file():
+                    stage.advance(nbytes=Path(target_file).stat().st_size)
                 else:
-                    # h1 헤더가 없는 경우 챕터 자체를 목차 항목으로 추가
-                    book.toc.append(
-                        epub.Link(chapter.file_name, chapter.title, chapter.id)
+                    stage.advance()
+
+        for target, target_file in outputs.items():
+            if target == "site":
+                progress.message(f"HTML 사이트가 성공적으로 생성되었습니다: {target_file}")
+                continue
+            if compression == "max":
+                with progress.stage("epub.compress", 1) as stage:
+                    if target_file is write_output and write_output is not output_file:
+                        write_output.seek(0)
+                        stats = recompress_epub(write_output, output_file)
+                        target_file = outputs[target] = output_file
+                    else:
+                        stats = recompress_epub(target_file)
+                    stage.advance(nbytes=stats["uncompressed"])
+                progress.message(format_compression_report(compression, stats))
+            elif not is_stream(target_file):
+                progress.message(
+                    format_compression_report(
+                        compression, compression_stats(target_file)
                     )
-
-        # 스파인 설정 (책의 페이지 순서)
-        if cover_file.exists():
-            # 커버 페이지가 있는 경우: 커버 -> 제목 -> 판권 -> 목차 -> 내용
-            spine_items = chapters
-        else:
-            # 커버 페이지가 없는 경우: 기존 순서 유지
-            spine_items = chapters
-
-        book.spine = spine_items
-
-        # 네비게이션 파일 추가
-        book.add_item(epub.EpubNcx())
-        book.add_item(epub.EpubNav())
-
-        # EPUB 파일 저장
-        epub.write_epub(output_file, book, {})
-
-        print(f"EPUB 파일이 성공적으로 생성되었습니다: {output_file}")
-        return output_file
+                )
+            if is_stream(target_file):
+                # 스트림으로 내보낸 EPUB은 다시 읽을 수 없으므로 구조 검사를 하지 않음
+                progress.message("EPUB을 출력 스트림으로 내보냈습니다.")
+                continue
+
+            # 생성된 EPUB 구조 검사 (오류가 있으면 EpubValidationError로 실패)
+            if validate:
+                with progress.stage("epub.validate", 1) as stage:
+                    try:
+                        check_epub(target_file, progress, validate)
+                    except EpubValidationError:
+                        # 출력 경로에 EPUB이 있으면 항상 검사를 통과한 빌드이도록 지움
+                        for other, other_file in outputs.items():
+                            if other != "site" and not is_stream(other_file):
+                                Path(other_file).unlink(missing_ok=True)
+                        raise
+                    stage.advance(nbytes=Path(target_file).stat().st_size)
+            progress.message(f"EPUB 파일이 성공적으로 생성되었습니다: {target_file}")
+        return output_file if "epub3" in outputs else str(
+            target_output_path(output_file, targets[0])
+        )
 
     except ImportError:
-        print(
-            "ebooklib 또는 BeautifulSoup4 모듈을 찾을 수 없습니다. pip install ebooklib beautifulsoup4 명령으로 설치하세요."
+        progress.message(
+            "ebooklib 또는 BeautifulSoup4 모듈을 찾을 수 없습니다. pip install ebooklib beautifulsoup4 명령으로 설치하세요.",
+            "error",
         )
         return None
     except Exception as e:
-        print(f"EPUB 파일 생성 중 오류가 발생했습니다: {e}")
-
-        # Calibre의 ebook-convert 명령 시도
-        try:
-            html_path = Path(html_dir)
-            title_html = html_path / "title.html"
-
-            if not title_html.exists():
-                print(f"오류: {title_html} 파일을 찾을 수 없습니다.")
-                return None
+        progress.message(f"EPUB 파일 생성 중 오류가 발생했습니다: {e}", "error")
+        return None
 
-            # EPUB 변환 명령 구성
-            cmd = [
-                "ebook-convert",
-                str(title_html),
-                output_file,
-                "--toc-title",
-                "목차",
-                "--language",
-                metadata.get("language", "ko") if metadata else "ko",
-                "--title",
-                metadata.get("title", "제목 없음") if metadata else "제목 없음",
-                "--authors",
-                metadata.get("creator", "저자 미상") if metadata else "저자 미상",
-                "--level1-toc",
-                "//h:h1",
-                "--level2-toc",
-                "//h:h2",
-                "--level3-toc",
-                "//h:h3",
-                "--chapter",
-                "//h:h1",
-                "--chapter-mark",
-                "pagebreak",
-                "--page-breaks-before",
-                "//h:h1",
-                "--max-toc-links",
-                "50",
-                "--toc-filter",
-                ".*",
-            ]
-
-            # 표지 이미지가 있으면 추가
-            cover_file = html_path / "cover.jpg"
-            if cover_file.exists():
-                cmd.extend(["--cover", str(cover_file)])
-
-            # 출판사 정보가 있으면 추가
-            if metadata and "publisher" in metadata:
-                cmd.extend(["--publisher", metadata["publisher"]])
-
-            # ISBN 정보가 있으면 추가
-            if metadata and "identifier" in metadata:
-                cmd.extend(["--isbn", metadata["identifier"]])
-
-            # 출판일 정보가 있으면 추가
-            if metadata and "date" in metadata:
-                cmd.extend(["--pubdate", metadata["date"]])
-
-            print("EPUB 파일 생성 중...")
-            subprocess.run(cmd, check=True)
-            print(f"변환 완료: {html_dir} -> {output_file}")
-            return output_file
-        except (subprocess.SubprocessError, FileNotFoundError):
-            print(
-                "ebook-convert 명령을 찾을 수 없습니다. Calibre가 설치되어 있는지 확인하세요."
-            )
-            return None
 
+def read_resource_metadata(resource_dir):
+    """
+    리소스 디렉토리의 metadata.json을 읽습니다. 파일이 없으면 None을 반환합니다.
+    """
+    metadata_file = Path(resource_dir) / "metadata.json"
+    if not metadata_file.exists():
+        return None
 
-def convert_resource_to_epub(resource_dir, output_file):
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def convert_resource_to_epub(
+    resource_dir,
+    output_file,
+    search_index="none",
+    validate=True,
+    backend="native",
+    ebook_convert=None,
+    markdown_engine="native",
+    image_options=None,
+    image_cache_dir=None,
+    content_cache_dir=None,
+    workers=None,
+    temp_html_dir=None,
+    page_chars=None,
+    toc_options=None,
+    targets=("epub3",),
+    workspace_dir=None,
+    keep_workspace=False,
+    sample=None,
+    progress=None,
+    reproducible=False,
+    compression="default",
+):
     """
     resource 폴더의 데이터를 EPUB으로 변환합니다.
+    search_index는 SEARCH_INDEX_MODES 중 하나로, 검색 색인을 어디에 둘지 정합니다.
+    backend가 "calibre"이면 내장 패키저 대신 Calibre의 ebook-convert를 사용합니다.
+    중간 HTML 파일은 빌드마다 새로 만드는 작업 공간(workspace_dir 아래, "ram"이면 /dev/shm)에
+    만들어지며, 빌드가 성공하면 삭제됩니다. (keep_workspace가 True이면 남겨 둠)
+    temp_html_dir을 주면 작업 공간 대신 그 디렉토리에 만들고 삭제하지 않습니다.
+    page_chars가 주어지면 그 글자 수마다 쪽 목록(nav page-list)과 위치 지도를 생성합니다.
+    toc_options(toc_tree.TocOptions)는 목차 페이지와 내비게이션 목차 설정입니다.
+    targets를 여러 개 주면 원고를 한 번만 처리하고 EPUB3, EPUB2, 정적 사이트를 함께 만듭니다.
+    (calibre 백엔드는 EPUB3만 만들고 나머지 형식은 내장 패키저로 만듭니다)
+    sample(sample_build.SampleOptions)을 주면 앞부분만 담은 미리보기 책을 만듭니다.
+    progress(progress.Progress 또는 이벤트를 받을 함수)를 주면 메시지를 출력하는 대신
+    HTML, EPUB 단계의 시작/끝, 진행, 처리량 이벤트를 그쪽으로 보냅니다.
+    reproducible이 True이면 같은 입력에서 바이트 단위로 같은 EPUB을 만듭니다. (calibre 백엔드 제외)
+    compression은 압축 프로필(fast, default, max)입니다. (calibre 백엔드 제외)
     """
-    # 임시 HTML 디렉토리 생성
-    temp_html_dir = "temp_html"
+    progress = as_progress(progress)
+    started = time.perf_counter()
+
+    # 빌드마다 따로 쓰는 작업 공간 (동시에 여러 빌드를 해도 서로 겹치지 않음)
+    workspace = None
+    if temp_html_dir is None:
+        workspace = create_workspace(workspace_dir)
+        html_dir = workspace / "html"
+    else:
+        html_dir = Path(temp_html_dir)
+
+    result = None
+    try:
+        # resource 폴더의 데이터를 HTML로 변환
+        convert_resource_to_html(
+            resource_dir,
+            html_dir,
+            search_index=search_index != "none",
+            markdown_engine=markdown_engine,
+            image_options=image_options,
+            image_cache_dir=image_cache_dir,
+            content_cache_dir=content_cache_dir,
+            workers=workers,
+            page_chars=page_chars,
+            toc_options=toc_options,
+            sample=sample,
+            progress=progress,
+        )
 
-    # resource 폴더의 데이터를 HTML로 변환
-    convert_resource_to_html(resource_dir, temp_html_dir)
+        # 메타데이터 읽기
+        metadata = read_resource_metadata(resource_dir)
 
-    # 메타데이터 읽기
-    metadata_file = Path(resource_dir) / "metadata.json"
-    metadata = None
-    if metadata_file.exists():
-        import json
+        # HTML 파일들을 EPUB으로 변환
+        native_targets = list(targets)
+        if backend == "calibre" and "epub3" in native_targets:
+            from html_to_epub import convert_with_calibre
 
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+            native_targets.remove("epub3")
+            result = convert_with_calibre(
+                html_dir, output_file, metadata or {}, ebook_convert
+            )
+        if native_targets:
+            native_result = convert_html_to_epub(
+                html_dir,
+                output_file,
+                metadata,
+                embed_search_index=search_index in ("epub", "both"),
+                validate=validate,
+                toc_options=toc_options,
+                targets=native_targets,
+                progress=progress,
+                reproducible=reproducible,
+                compression=compression,
+            )
+            result = result or native_result
 
-    # HTML 파일들을 EPUB으로 변환
-    result = convert_html_to_epub(temp_html_dir, output_file, metadata)
+        # 검색 색인을 EPUB 옆에 사이드카 파일로 복사
+        if result and search_index in ("sidecar", "both"):
+            import shutil
 
-    # 임시 디렉토리 삭제하지 않음 (디버깅 용도로 유지)
-    # import shutil
-    # if os.path.exists(temp_html_dir):
-    #     shutil.rmtree(temp_html_dir)
+            sidecar_file = Path(output_file).with_suffix(".search.json")
+            shutil.copy(Path(html_dir) / SEARCH_INDEX_FILENAME, sidecar_file)
+            progress.message(f"검색 색인 파일을 생성했습니다: {sidecar_file}")
+    finally:
+        # 성공하면 작업 공간 삭제, 실패하면 원인을 살펴볼 수 있도록 남겨 둠
+        if workspace is not None:
+            cleanup_workspace(workspace, keep_workspace or not result, progress)
+        record_build(time.perf_counter() - started, bool(result))
 
     return result
 
@@ -408,8 +614,57 @@ def main():
     parser.add_argument(
         "--output-file",
         default="output.epub",
-        help="출력 EPUB 파일 경로 (기본값: output.epub)",
+        help="출력 EPUB 파일 경로, -이면 표준 출력으로 내보냄 (기본값: output.epub)",
+    )
+    parser.add_argument(
+        "--search-index",
+        choices=SEARCH_INDEX_MODES,
+        default="none",
+        help="본문 검색 색인 생성 위치 (기본값: none)",
+    )
+    parser.add_argument(
+        "--markdown-engine",
+        choices=sorted(MARKDOWN_ENGINES),
+        default="native",
+        help="마크다운 엔진: native(빠른 내장 엔진) 또는 markdown(확장 기능 지원) (기본값: native)",
+    )
+    add_image_arguments(parser)
+    add_build_arguments(parser)
+    add_page_map_arguments(parser)
+    add_toc_arguments(parser)
+    add_workspace_arguments(parser)
+    add_sample_arguments(parser)
+    add_plan_arguments(parser)
+    add_progress_arguments(parser)
+    add_reproducible_arguments(parser)
+    add_compression_arguments(parser)
+    add_volume_arguments(parser)
+    add_metrics_arguments(parser)
+    parser.add_argument(
+        "--targets",
+        type=parse_targets,
+        default=["epub3"],
+        help="출력 형식 목록, 쉼표로 구분: epub3, epub2, site (기본값: epub3). "
+        "epub2는 <이름>-epub2.epub, site는 <이름>_site 폴더에 저장됩니다",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="native",
+        help="EPUB 생성 방식: native(내장 패키저) 또는 calibre(ebook-convert) (기본값: native)",
     )
+    parser.add_argument(
+        "--ebook-convert",
+        default=None,
+        help="calibre 백엔드에서 사용할 ebook-convert 실행 파일 경로",
+    )
+    parser.add_argument(
+        "--no-validate",
+        dest="validate",
+        action="store_false",
+        help="생성된 EPUB의 구조 검사를 건너뜁니다",
+    )
+    add_validation_arguments(parser)
 
     args = parser.parse_args()
 
@@ -417,8 +672,105 @@ def main():
         print(f"오류: 리소스 디렉토리 '{args.resource_dir}'을 찾을 수 없습니다.")
         return 1
 
-    convert_resource_to_epub(args.resource_dir, args.output_file)
-    return 0
+    # 빌드하지 않고 계획만 출력
+    if args.plan:
+        try:
+            plan = plan_resource(args.resource_dir, args.page_chars)
+        except (OSError, ValueError) as e:
+            print(f"오류: {e}")
+            return 1
+        if args.plan == "json":
+            print(json.dumps(plan, ensure_ascii=False, indent=1))
+        else:
+            print_plan(plan)
+        return 0
+
+    # 여러 권으로 나누기 (원고 전체를 처리하는 native 백엔드만 지원)
+    volume_options = volumes_from_args(args)
+    if volume_options is not None and (
+        args.output_file == "-"
+        or args.backend != "native"
+        or args.search_index != "none"
+        or args.sample is not None
+    ):
+        print(
+            "오류: --split-volumes는 파일 출력과 native 백엔드에서만 사용할 수 있으며 "
+            "--search-index, --sample과 함께 쓸 수 없습니다."
+        )
+        return 1
+
+    # 표준 출력으로 EPUB을 내보낼 때는 진행 메시지를 표준 오류로 보냄
+    output_file = args.output_file
+    message_stream = sys.stdout
+    event_stream = sys.stdout
+    if output_file == "-":
+        if args.targets != ["epub3"] or args.backend != "native":
+            print("오류: --output-file -는 native 백엔드의 epub3 형식만 지원합니다.")
+            return 1
+        if args.search_index in ("sidecar", "both"):
+            print("오류: --output-file -에서는 검색 색인 사이드카 파일을 만들 수 없습니다.")
+            return 1
+        output_file = sys.stdout.buffer
+        message_stream = sys.stderr
+        event_stream = sys.stderr
+
+    # JSON 진행 이벤트를 쓰는 스트림에는 다른 출력(calibre 등)이 섞이지 않도록 함
+    if args.progress == "json":
+        message_stream = sys.stderr
+    progress = progress_from_args(args, event_stream)
+    metrics_from_args(args)
+
+    with contextlib.redirect_stdout(message_stream):
+        try:
+            if volume_options is not None:
+                result = convert_resource_to_volumes(
+                    args.resource_dir,
+                    output_file,
+                    volume_options,
+                    args.markdown_engine,
+                    image_options_from_args(args),
+                    args.image_cache_dir,
+                    args.content_cache_dir,
+                    args.workers,
+                    page_chars=page_chars_from_args(args),
+                    toc_options=toc_options_from_args(args),
+                    targets=args.targets,
+                    validate=validation_from_args(args),
+                    workspace_dir=args.workspace_dir,
+                    keep_workspace=args.keep_workspace,
+                    progress=progress,
+                    reproducible=args.reproducible,
+                    compression=args.compression,
+                )
+            else:
+                result = convert_resource_to_epub(
+                    args.resource_dir,
+                    output_file,
+                    args.search_index,
+                    validation_from_args(args),
+                    args.backend,
+                    args.ebook_convert,
+                    args.markdown_engine,
+                    image_options_from_args(args),
+                    args.image_cache_dir,
+                    args.content_cache_dir,
+                    args.workers,
+                    page_chars=page_chars_from_args(args),
+                    toc_options=toc_options_from_args(args),
+                    targets=args.targets,
+                    workspace_dir=args.workspace_dir,
+                    keep_workspace=args.keep_workspace,
+                    sample=sample_from_args(args),
+                    progress=progress,
+                    reproducible=args.reproducible,
+                    compression=args.compression,
+                )
+        except (OSError, ValueError) as e:
+            # 원고 목록이나 메타데이터가 잘못된 경우 (리소스 디렉토리 밖의 경로 등)
+            progress.message(f"오류: {e}", "error")
+            result = None
+    write_metrics_from_args(args)
+    return 0 if result else 1
 
 
 if __name__ == "__main__":
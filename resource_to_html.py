@@ -5,9 +5,63 @@ import os
 import json
 import re
 import shutil
-import markdown
+import hashlib
+import threading
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from bs4 import BeautifulSoup
+from build_manifest import ManifestBuilder
+from build_workspace import resolve_inside
+from image_pipeline import (
+    IMAGE_DIR_NAME,
+    add_image_arguments,
+    default_cache_dir,
+    find_image_sources,
+    image_options_from_args,
+    process_images,
+    rewrite_image_sources,
+)
+from markdown_engines import MARKDOWN_ENGINES, get_markdown_engine
+from metrics import inc, metrics_enabled
+from progress import add_progress_arguments, as_progress, progress_from_args
+from page_map import (
+    PAGE_MAP_FILENAME,
+    PageMapBuilder,
+    add_page_map_arguments,
+    page_chars_from_args,
+    write_page_map,
+)
+from sample_build import (
+    add_sample_arguments,
+    read_sample_markdown,
+    sample_characters,
+    sample_from_args,
+    subset_font,
+)
+from search_index import (
+    SEARCH_INDEX_FILENAME,
+    SearchIndexBuilder,
+    SearchIndexRecorder,
+    write_search_index,
+)
+from templates import TEMPLATE_DIR_NAME, get_template, render_items
+from toc_tree import (
+    DEFAULT_TOC_OPTIONS,
+    add_toc_arguments,
+    chapter_groups,
+    label_headings,
+    nest_headings,
+    paginate_toc,
+    toc_node,
+    toc_options_from_args,
+    toc_page_filename,
+)
+
+# 여러 원고 파일을 두는 폴더 이름 (content.md 대신 사용)
+CONTENT_DIR_NAME = "content"
+# 원고 변환 결과 캐시 형식 버전 (변환 규칙이 바뀌면 올림)
+CONTENT_CACHE_VERSION = 2
 
 
 def read_metadata(metadata_file):
@@ -28,130 +82,307 @@ def read_colophon(colophon_file):
     return colophon
 
 
-def process_markdown_content(content_file):
+def process_markdown_content(content_file, search_index=None, engine="native"):
     """
-    마크다운 파일을 읽고 처리합니다.
-    1. 빈줄은 <br />로 변환
-    2. 연속된 줄바꿈은 최대 2회로 제한
-    3. 마크다운 규칙에 따라 HTML로 파싱
-    4. 모든 라인은 <p> 태그로 감싸짐
+    마크다운 파일을 읽고 선택한 엔진(markdown_engines.MARKDOWN_ENGINES)으로 HTML로 변환합니다.
+    기본 엔진(native)은 한 줄씩 처리하며 빈줄은 <br />로, 일반 라인은 <p> 태그로 감쌉니다.
+
+    search_index(SearchIndexBuilder)가 주어지면 처리하는 동안 헤딩과 본문을 색인에 추가합니다.
     """
     with open(content_file, "r", encoding="utf-8") as f:
         content = f.read()
 
-    # 연속된 줄바꿈 최대 2회로 제한
-    content = re.sub(r"\n{3,}", "\n\n", content)
-
-    # 각 줄을 개별적으로 처리
-    lines = content.split("\n")
-    html_lines = []
-
-    for line in lines:
-        # 빈 줄은 <br /> 태그로 변환
-        if not line.strip():
-            html_lines.append("<br />")
-        # 헤딩(#으로 시작하는 줄)은 그대로 처리
-        elif re.match(r"^#+\s+", line):
-            # 마크다운 헤딩을 HTML로 변환
-            heading_match = re.match(r"^(#+)\s+(.+)$", line)
-            if heading_match:
-                heading_level = len(heading_match.group(1))
-                heading_text = heading_match.group(2).strip()
-                html_lines.append(
-                    f"<h{heading_level}>{heading_text}</h{heading_level}>"
-                )
-        # 수평선(---, ___, ***)은 <hr> 태그로 변환
-        elif re.match(r"^(\*{3,}|-{3,}|_{3,})$", line.strip()):
-            html_lines.append("<hr />")
-        # 일반 텍스트 줄은 <p> 태그로 감싸기
-        else:
-            # 마크다운 문법 처리 (굵게, 기울임 등)
-            # 굵게 (**text**)
-            line = re.sub(r"\*\*(.*?)\*\*", r"<strong>\1</strong>", line)
-            # 기울임 (*text*)
-            line = re.sub(r"\*(.*?)\*", r"<em>\1</em>", line)
-            # 각 줄을 <p> 태그로 감싸기
-            html_lines.append(f"<p>{line}</p>")
+    return get_markdown_engine(engine).convert(content, search_index)
 
-    # 모든 HTML 줄을 합치기
-    html_content = "\n".join(html_lines)
 
-    return html_content
+def natural_sort_key(path):
+    """
+    파일 이름의 숫자 부분을 숫자로 비교하는 정렬 키를 반환합니다. (2.md가 10.md보다 앞)
+    """
+    return [
+        int(part) if part.isdigit() else part.lower()
+        for part in re.split(r"(\d+)", Path(path).name)
+    ]
 
 
-def create_title_page(metadata):
+def find_content_files(resource_path, metadata):
     """
-    책 제목 페이지 HTML을 생성합니다.
+    원고 파일 목록을 순서대로 반환합니다.
+    1. metadata.json의 "content_files" 목록 (리소스 디렉토리 기준 경로)
+    2. content/ 폴더의 .md 파일 (파일 이름의 번호 순)
+    3. content.md 파일 하나
+    "content_files"가 리소스 디렉토리 밖을 가리키면 ValueError를 올립니다.
     """
-    html = f"""<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{metadata.get('language', 'ko')}" lang="{metadata.get('language', 'ko')}">
-<head>
-    <meta charset="UTF-8" />
-    <title>{metadata.get('title', '제목 없음')}</title>
-    <link rel="stylesheet" type="text/css" href="style.css" />
-</head>
-<body>
-    <div class="title-page">
-        <h1 class="title">{metadata.get('title', '제목 없음')}</h1>
-        <p class="author">{metadata.get('creator', '저자 미상')}</p>
-        <p class="publisher">{metadata.get('publisher', '')}</p>
-    </div>
-</body>
-</html>"""
-    return html
-
-
-def create_chapter_html(title, content, chapter_num):
+    resource_path = Path(resource_path)
+    if metadata.get("content_files"):
+        return [
+            resolve_inside(resource_path, name) for name in metadata["content_files"]
+        ]
+
+    content_dir = resource_path / CONTENT_DIR_NAME
+    if content_dir.is_dir():
+        return sorted(content_dir.glob("*.md"), key=natural_sort_key)
+
+    return [resource_path / "content.md"]
+
+
+def resolve_fonts_dir(resource_path, fonts_dir=None):
     """
-    챕터 내용을 HTML로 변환합니다.
+    글꼴 폴더를 정합니다. fonts_dir을 주지 않으면 리소스 디렉토리의 fonts 폴더를,
+    그것도 없으면 현재 디렉토리의 fonts 폴더를 사용합니다.
+    """
+    if fonts_dir is not None:
+        return Path(fonts_dir)
+    fonts_dir = Path(resource_path) / "fonts"
+    return fonts_dir if fonts_dir.exists() else Path("fonts")
+
+
+def _process_content_file(content_file, markdown_engine, record_index):
+    """
+    원고 파일 하나를 HTML로 변환합니다. (작업 프로세스에서 실행)
+    record_index가 True이면 검색 색인 이벤트도 함께 반환합니다.
+    """
+    recorder = SearchIndexRecorder() if record_index else None
+    html_content = process_markdown_content(content_file, recorder, markdown_engine)
+    return html_content, recorder.finish() if recorder else None
+
+
+def process_content_files(
+    content_files,
+    search_index=None,
+    markdown_engine="native",
+    cache_dir=None,
+    workers=None,
+    progress=None,
+    executor=None,
+):
+    """
+    여러 원고 파일을 각각 독립적으로 변환하여 하나의 HTML로 합칩니다.
+
+    변환 결과는 파일 내용 해시를 키로 캐시(cache_dir)되므로, 바뀐 파일만 다시 처리합니다.
+    캐시에 없는 파일이 여러 개이면 여러 프로세스에서 병렬로 처리합니다.
+    executor(ProcessPoolExecutor)를 주면 새 프로세스 풀을 띄우지 않고 그것을 사용합니다.
+    search_index(SearchIndexBuilder)가 주어지면 파일 순서대로 색인에 추가합니다.
+    progress(progress.Progress)로 파일별 처리량을 알립니다.
     """
-    html = "<!DOCTYPE html>\n"
-    html += '<html xmlns="http://www.w3.org/1999/xhtml">\n'
-    html += "<head>\n"
-    html += f'    <meta charset="UTF-8" />\n'
-    html += f"    <title>{title}</title>\n"
-    html += f'    <link rel="stylesheet" type="text/css" href="style.css" />\n'
-    html += "</head>\n"
-    html += "<body>\n"
-    html += '    <div class="chapter">\n'
+    progress = as_progress(progress)
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(CONTENT_DIR_NAME)
+    record_index = search_index is not None
+
+    results = [None] * len(content_files)
+    cache_files = []
+    sizes = []
+    pending = []
+    with progress.stage("html.content", len(content_files)) as stage:
+        for i, content_file in enumerate(content_files):
+            with open(content_file, "rb") as f:
+                content = f.read()
+            cache_key = hashlib.sha256(
+                f"{CONTENT_CACHE_VERSION}:{markdown_engine}:{record_index}:".encode(
+                    "utf-8"
+                )
+                + content
+            ).hexdigest()
+            sizes.append(len(content))
+            if metrics_enabled():
+                inc("md_to_epub_markdown_lines_total", content.count(b"\n"))
+                inc("md_to_epub_markdown_bytes_total", len(content))
+            cache_file = cache_dir / f"{cache_key}.json"
+            cache_files.append(cache_file)
+            if cache_file.exists():
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                results[i] = (cached["html"], cached["index_events"])
+                stage.advance(nbytes=len(content))
+            else:
+                pending.append(i)
+
+        if pending:
+            if workers == 1 or len(pending) == 1:
+                for i in pending:
+                    results[i] = _process_content_file(
+                        content_files[i], markdown_engine, record_index
+                    )
+                    stage.advance(nbytes=sizes[i])
+            else:
+                with (
+                    nullcontext(executor)
+                    if executor is not None
+                    else ProcessPoolExecutor(max_workers=workers)
+                ) as pool:
+                    futures = {
+                        i: pool.submit(
+                            _process_content_file,
+                            content_files[i],
+                            markdown_engine,
+                            record_index,
+                        )
+                        for i in pending
+                    }
+                    for i, future in futures.items():
+                        results[i] = future.result()
+                        stage.advance(nbytes=sizes[i])
+
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for i in pending:
+                html_content, index_events = results[i]
+                # 같은 캐시를 쓰는 다른 빌드와 겹치지 않는 임시 파일 이름
+                temp_file = cache_files[i].with_name(
+                    f".{cache_files[i].name}.{os.getpid()}.{threading.get_ident()}.tmp"
+                )
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"html": html_content, "index_events": index_events},
+                        f,
+                        ensure_ascii=False,
+                    )
+                os.replace(temp_file, cache_files[i])
+
+    inc("md_to_epub_content_cache_total", len(content_files) - len(pending), result="hit")
+    inc("md_to_epub_content_cache_total", len(pending), result="miss")
+    if len(content_files) > 1:
+        progress.message(
+            f"원고 파일 {len(content_files)}개를 처리했습니다. "
+            f"(캐시 사용 {len(content_files) - len(pending)}개, 새로 처리 {len(pending)}개)"
+        )
+
+    if search_index is not None:
+        for _, index_events in results:
+            search_index.replay(index_events)
+
+    return "\n".join(html_content for html_content, _ in results)
+
+
+def title_page_context(metadata):
+    """
+    제목 페이지 템플릿에 전달할 값을 만듭니다.
+    """
+    return {
+        "language": metadata.get("language", "ko"),
+        "title": metadata.get("title", "제목 없음"),
+        "creator": metadata.get("creator", "저자 미상"),
+        "publisher": metadata.get("publisher", ""),
+    }
+
+
+def create_title_page(metadata, template_dir=None):
+    """
+    책 제목 페이지 HTML을 생성합니다.
+    """
+    return get_template("title", template_dir).render(title_page_context(metadata))
 
+
+def chapter_context(title, content, template_dir=None):
+    """
+    챕터 템플릿에 전달할 값을 만듭니다.
+    """
+    heading = ""
     # 챕터 제목을 h1 태그로 추가 (이미 content에 있는 경우 제외)
     if title and not content.strip().startswith(f"<h1>{title}</h1>"):
-        html += f"        <h1>{title}</h1>\n"
+        heading = get_template("chapter_heading", template_dir).render({"title": title})
+
+    return {"title": title, "heading": heading, "content": content}
+
+
+def create_chapter_html(title, content, chapter_num, template_dir=None):
+    """
+    챕터 내용을 HTML로 변환합니다.
+    """
+    return get_template("chapter", template_dir).render(
+        chapter_context(title, content, template_dir)
+    )
 
-    html += f"        {content}\n"
-    html += "    </div>\n"
-    html += "</body>\n"
-    html += "</html>"
 
-    return html
+def toc_items_writer(nodes, template_dir=None):
+    """
+    중첩된 목차 항목(toc_tree.toc_node)을 출력 스트림에 쓰는 함수를 반환합니다.
+    하위 항목이 있으면 toc_branch, 없으면 toc_item 템플릿을 사용하며,
+    문자열을 이어 붙이지 않고 항목을 하나씩 바로 씁니다.
+    """
+    item_template = get_template("toc_item", template_dir)
+    branch_template = get_template("toc_branch", template_dir)
+
+    def write_nodes(out, nodes):
+        for node in nodes:
+            if node["children"]:
+                branch_template.render_to(
+                    out,
+                    {
+                        "href": node["href"],
+                        "title": node["title"],
+                        "children": partial(write_nodes, nodes=node["children"]),
+                    },
+                )
+            else:
+                item_template.render_to(out, node)
+
+    return partial(write_nodes, nodes=nodes)
+
+
+def toc_page_links(ranges, page_num):
+    """
+    목차 페이지 사이의 링크 목록을 만듭니다.
+    첫 페이지에는 모든 페이지로 가는 링크를, 나머지 페이지에는 처음/이전/다음 링크를 넣습니다.
+    """
+    if page_num == 1:
+        return [
+            toc_node(f"{start + 1}~{end}", toc_page_filename(i))
+            for i, (start, end) in enumerate(ranges, 1)
+        ]
+
+    links = [toc_node("처음", toc_page_filename(1))]
+    links.append(toc_node("이전", toc_page_filename(page_num - 1)))
+    if page_num < len(ranges):
+        links.append(toc_node("다음", toc_page_filename(page_num + 1)))
+    return links
+
+
+def toc_page_context(
+    metadata, nodes, template_dir=None, page_num=1, page_count=1, page_links=()
+):
+    """
+    목차 페이지 템플릿에 전달할 값을 만듭니다.
+    목차 항목은 렌더링 시 출력 스트림에 바로 쓰이므로 항목 수에 비례하는 시간만 듭니다.
+    목차가 여러 페이지이면 페이지 번호와 페이지 사이 링크(page_links)를 함께 넣습니다.
+    """
+    context = {
+        "language": metadata.get("language", "ko"),
+        "toc_items": toc_items_writer(nodes, template_dir),
+        "page_label": "",
+        "toc_pages": "",
+    }
+    if page_count > 1:
+        context["page_label"] = get_template("toc_page_label", template_dir).render(
+            {"page": page_num, "page_count": page_count}
+        )
+        context["toc_pages"] = partial(
+            get_template("toc_pages", template_dir).render_to,
+            context={
+                "pages": render_items(
+                    get_template("toc_item", template_dir), page_links
+                )
+            },
+        )
+    return context
+
+
+def toc_context(metadata, chapters, template_dir=None):
+    """
+    챕터 제목 목록으로 한 페이지짜리 목차 템플릿 값을 만듭니다.
+    """
+    nodes = [
+        toc_node(title, f"chapter_{i+1}.html") for i, title in enumerate(chapters)
+    ]
+    return toc_page_context(metadata, nodes, template_dir)
 
 
-def create_toc_html(metadata, chapters):
+def create_toc_html(metadata, chapters, template_dir=None):
     """
     목차 HTML을 생성합니다.
     """
-    toc_items = ""
-    for i, title in enumerate(chapters):
-        toc_items += f'<li><a href="chapter_{i+1}.html">{title}</a></li>\n'
-
-    html = f"""<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="{metadata.get('language', 'ko')}" lang="{metadata.get('language', 'ko')}">
-<head>
-    <meta charset="UTF-8" />
-    <title>목차</title>
-    <link rel="stylesheet" type="text/css" href="style.css" />
-</head>
-<body>
-    <div class="toc">
-        <h1>목차</h1>
-        <ul>
-            {toc_items}
-        </ul>
-    </div>
-</body>
-</html>"""
-    return html
+    return get_template("toc", template_dir).render(
+        toc_context(metadata, chapters, template_dir)
+    )
 
 
 def create_css():
@@ -259,84 +490,103 @@ hr{
     return css
 
 
-def create_colophon_html(colophon):
+def colophon_rows(colophon):
     """
-    판권 페이지 HTML을 생성합니다.
+    판권 정보에서 표에 들어갈 (항목 이름, 값) 목록을 만듭니다.
     """
-    html = "<!DOCTYPE html>\n"
-    html += '<html xmlns="http://www.w3.org/1999/xhtml">\n'
-    html += "<head>\n"
-    html += '    <meta charset="UTF-8" />\n'
-    html += "    <title>판권</title>\n"
-    html += '    <link rel="stylesheet" type="text/css" href="style.css" />\n'
-    html += "</head>\n"
-    html += "<body>\n"
-    html += '    <div class="colophon">\n'
-
-    # 제목
-    if "title" in colophon:
-        html += f'        <h1>{colophon["title"]}</h1>\n'
-
-    # 테이블 형식으로 판권 정보 표시
-    html += '        <table class="colophon-table">\n'
+    rows = []
 
     # 초판 발행일
     if "first_published" in colophon:
-        html += f'            <tr><th align="left">초판 발행</th><td align="left">{colophon["first_published"]}</td></tr>\n'
+        rows.append(("초판 발행", colophon["first_published"]))
 
     # 저자
     if "author" in colophon:
-        html += f'            <tr><th align="left">지은이</th><td align="left">{colophon["author"]}</td></tr>\n'
+        rows.append(("지은이", colophon["author"]))
 
     # 번역자
     if "translator" in colophon:
-        html += f'            <tr><th align="left">옮긴이</th><td align="left">{colophon["translator"]}</td></tr>\n'
+        rows.append(("옮긴이", colophon["translator"]))
 
     # 발행인
     if "publisher" in colophon and "editor" in colophon["publisher"]:
-        html += f'            <tr><th align="left">발행인</th><td align="left">{colophon["publisher"]["editor"]}</td></tr>\n'
+        rows.append(("발행인", colophon["publisher"]["editor"]))
 
     # 출판사
     if "publisher" in colophon and "name" in colophon["publisher"]:
-        html += f'            <tr><th align="left">발행처</th><td align="left">{colophon["publisher"]["name"]}</td></tr>\n'
+        rows.append(("발행처", colophon["publisher"]["name"]))
 
     # 출판 등록 정보
     if "publication_registration" in colophon:
         reg = colophon["publication_registration"]
         if "date" in reg and "number" in reg:
-            html += f'            <tr><th align="left">출판등록</th><td align="left">{reg["date"]} {reg["number"]}</td></tr>\n'
+            rows.append(("출판등록", f"{reg['date']} {reg['number']}"))
 
     # 주소
     if "address" in colophon and "street" in colophon["address"]:
-        html += f'            <tr><th align="left">주소</th><td align="left">{colophon["address"]["street"]}</td></tr>\n'
+        rows.append(("주소", colophon["address"]["street"]))
 
     # 연락처
     if "contact" in colophon:
         contact = colophon["contact"]
         if "email" in contact:
-            html += f'            <tr><th align="left">문의</th><td align="left">{contact["email"]}</td></tr>\n'
+            rows.append(("문의", contact["email"]))
         if "fax" in contact:
-            html += f'            <tr><th align="left">팩스</th><td align="left">{contact["fax"]}</td></tr>\n'
+            rows.append(("팩스", contact["fax"]))
 
     # ISBN
     if "isbn" in colophon:
-        html += f'            <tr><th align="left">ISBN</th><td align="left">{colophon["isbn"]}</td></tr>\n'
+        rows.append(("ISBN", colophon["isbn"]))
 
     # 가격
     if "price" in colophon:
-        html += f'            <tr><th align="left">정가</th><td align="left">{colophon["price"]}</td></tr>\n'
+        rows.append(("정가", colophon["price"]))
+
+    return rows
 
-    html += "        </table>\n"
+
+def colophon_context(colophon, template_dir=None):
+    """
+    판권 페이지 템플릿에 전달할 값을 만듭니다.
+    """
+    heading = ""
+    if "title" in colophon:
+        heading = get_template("colophon_heading", template_dir).render(
+            {"title": colophon["title"]}
+        )
 
     # 저작권 고지
+    copyright_html = ""
     if "copyright_notice" in colophon:
-        html += f'        <p class="copyright">{colophon["copyright_notice"]}</p>\n'
+        copyright_html = get_template("colophon_copyright", template_dir).render(
+            {"copyright_notice": colophon["copyright_notice"]}
+        )
+
+    rows = (
+        {"label": label, "value": value} for label, value in colophon_rows(colophon)
+    )
+    return {
+        "heading": heading,
+        "rows": render_items(get_template("colophon_row", template_dir), rows),
+        "copyright": copyright_html,
+    }
+
+
+def create_colophon_html(colophon, template_dir=None):
+    """
+    판권 페이지 HTML을 생성합니다.
+    """
+    return get_template("colophon", template_dir).render(
+        colophon_context(colophon, template_dir)
+    )
 
-    html += "    </div>\n"
-    html += "</body>\n"
-    html += "</html>"
 
-    return html
+def write_page(output_file, template_name, context, template_dir=None):
+    """
+    템플릿을 렌더링하여 파일에 바로 씁니다.
+    """
+    with open(output_file, "w", encoding="utf-8") as f:
+        get_template(template_name, template_dir).render_to(f, context)
 
 
 def extract_chapters(html_content):
@@ -360,90 +610,338 @@ def extract_chapters(html_content):
     return processed_chapters
 
 
-def convert_resource_to_html(resource_dir, output_dir):
+def write_html_pages(
+    output_path,
+    resource_path,
+    metadata,
+    chapters,
+    image_map,
+    index_builder=None,
+    page_chars=None,
+    toc_options=None,
+    fonts_dir=None,
+    sample=None,
+    progress=None,
+):
     """
-    resource 폴더의 데이터를 HTML로 변환합니다.
+    변환한 챕터 목록 [(제목, 내용), ...]으로 책 한 권의 페이지와 리소스를 output_path에 씁니다.
+    (CSS, 글꼴, 표지, 제목, 판권, 챕터, 목차 페이지, 검색 색인, 위치 지도, manifest.json)
+    본문 이미지는 image_map(원래 src 값 -> "images/..." 경로)대로 이미 output_path에 있어야 합니다.
+    원고를 한 번만 처리하고 여러 권으로 나눌 때 권마다 호출합니다. (volume_split)
     """
-    # 경로 설정
-    resource_path = Path(resource_dir)
-    metadata_file = resource_path / "metadata.json"
-    content_file = resource_path / "content.md"
+    progress = as_progress(progress)
     cover_file = resource_path / "cover.jpg"
     css_file = resource_path / "style.css"
     colophon_file = resource_path / "colophon.json"
-    fonts_dir = Path("fonts")
-
-    # 출력 디렉토리 생성
-    output_path = Path(output_dir)
-    if output_path.exists():
-        shutil.rmtree(output_path)
-    output_path.mkdir(parents=True)
-
-    # 메타데이터 읽기
-    metadata = read_metadata(metadata_file)
-
-    # 마크다운 내용 처리
-    html_content = process_markdown_content(content_file)
-
-    # 챕터 추출
-    chapters = extract_chapters(html_content)
-    chapter_titles = [title for title, _ in chapters]
+    template_dir = resource_path / TEMPLATE_DIR_NAME
+    fonts_dir = resolve_fonts_dir(resource_path, fonts_dir)
+    manifest = ManifestBuilder(output_path, metadata)
 
     # CSS 파일 복사 또는 생성
     if css_file.exists():
         shutil.copy(css_file, output_path / "style.css")
-        print(f"CSS 파일을 복사했습니다: {css_file} -> {output_path / 'style.css'}")
+        progress.message(
+            f"CSS 파일을 복사했습니다: {css_file} -> {output_path / 'style.css'}"
+        )
     else:
         with open(output_path / "style.css", "w", encoding="utf-8") as f:
             f.write(create_css())
-            print("기본 CSS 파일을 생성했습니다.")
+        progress.message("기본 CSS 파일을 생성했습니다.")
+    manifest.add_asset("style.css", "style")
 
     # 폰트 폴더 복사
     if fonts_dir.exists():
         output_fonts_dir = output_path / "fonts"
         output_fonts_dir.mkdir(exist_ok=True)
 
+        # 샘플에 쓰인 글자 (샘플 빌드에서 글꼴을 줄일 때 사용)
+        if sample is not None:
+            characters = sample_characters(
+                json.dumps(metadata, ensure_ascii=False),
+                colophon_file.read_text(encoding="utf-8")
+                if colophon_file.exists()
+                else "",
+                *(title + content for title, content in chapters),
+            )
+
         # 폰트 파일 복사
-        for font_file in fonts_dir.glob("*"):
-            if font_file.is_file():
-                shutil.copy(font_file, output_fonts_dir / font_file.name)
-                print(
-                    f"폰트 파일을 복사했습니다: {font_file} -> {output_fonts_dir / font_file.name}"
-                )
+        with progress.stage("html.fonts") as stage:
+            for font_file in sorted(fonts_dir.glob("*")):
+                if font_file.is_file():
+                    if sample is not None:
+                        subset_font(
+                            font_file,
+                            output_fonts_dir / font_file.name,
+                            characters,
+                            progress,
+                        )
+                    else:
+                        shutil.copy(font_file, output_fonts_dir / font_file.name)
+                    manifest.add_asset(f"fonts/{font_file.name}", "font")
+                    stage.advance(
+                        nbytes=(output_fonts_dir / font_file.name).stat().st_size
+                    )
+        if stage.done:
+            progress.message(
+                f"폰트 파일 {stage.done}개를 복사했습니다: {fonts_dir} -> {output_fonts_dir}"
+            )
+
+    # 본문 이미지 (처리된 파일 이름 순)
+    for image_file in sorted(set(image_map.values())):
+        if (output_path / image_file).is_file():
+            manifest.add_asset(image_file, "image")
 
     # 표지 이미지 복사
     if cover_file.exists():
         shutil.copy(cover_file, output_path / "cover.jpg")
 
     # 제목 페이지 생성
-    with open(output_path / "title.html", "w", encoding="utf-8") as f:
-        f.write(create_title_page(metadata))
-
-    # 목차 페이지 생성
-    with open(output_path / "toc.html", "w", encoding="utf-8") as f:
-        f.write(create_toc_html(metadata, chapter_titles))
+    write_page(
+        output_path / "title.html",
+        "title",
+        title_page_context(metadata),
+        template_dir,
+    )
+    manifest.add_page("title.html", "title", "제목")
 
     # 판권 페이지 생성
     if colophon_file.exists():
         colophon = read_colophon(colophon_file)
-        with open(output_path / "colophon.html", "w", encoding="utf-8") as f:
-            f.write(create_colophon_html(colophon))
-        print(f"판권 페이지를 생성했습니다: {output_path / 'colophon.html'}")
+        write_page(
+            output_path / "colophon.html",
+            "colophon",
+            colophon_context(colophon, template_dir),
+            template_dir,
+        )
+        manifest.add_page("colophon.html", "colophon", "판권")
+        progress.message(f"판권 페이지를 생성했습니다: {output_path / 'colophon.html'}")
 
     # 각 챕터 HTML 파일 생성
-    for i, (title, content) in enumerate(chapters):
-        chapter_filename = f"chapter_{i+1}.html"
-        chapter_content = create_chapter_html(title, content, i + 1)
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    page_map_builder = PageMapBuilder(page_chars) if page_chars else None
+    toc_chapter_nodes = []
+    chapter_pages = []
+    with progress.stage("html.chapters", len(chapters)) as stage:
+        for i, (title, content) in enumerate(chapters):
+            chapter_filename = f"chapter_{i+1}.html"
+            context = chapter_context(
+                title, rewrite_image_sources(content, image_map), template_dir
+            )
+            # 템플릿이 넣는 제목 헤딩도 헤딩 번호에 포함
+            heading_offset = 1 if context["heading"] else 0
+
+            # 쪽 표시 삽입
+            if page_map_builder is not None:
+                context["content"] = page_map_builder.add_chapter(
+                    chapter_filename, i + 1, context["content"], heading_offset
+                )
+
+            # 모든 헤딩에 ID를 붙이고 헤딩 목록을 빌드 목록에 기록
+            # (EPUB 단계는 챕터를 다시 파싱하지 않고 이 ID와 목록을 그대로 사용)
+            chapter_html, headings = label_headings(
+                get_template("chapter", template_dir).render(context), i + 1
+            )
+            with open(output_path / chapter_filename, "w", encoding="utf-8") as f:
+                f.write(chapter_html)
+            chapter_pages.append((chapter_filename, "chapter", title, headings))
+            if index_builder is not None:
+                index_builder.set_chapter_headings(chapter_filename, headings)
+            stage.advance(nbytes=(output_path / chapter_filename).stat().st_size)
+
+            chapter_node = toc_node(title, chapter_filename)
+            if toc_options.depth > 1:
+                chapter_node["children"] = nest_headings(
+                    (
+                        (level, toc_node(text, f"{chapter_filename}#{header_id}"))
+                        for level, text, header_id in headings
+                        if level > 1
+                    ),
+                    toc_options.depth,
+                )
+            toc_chapter_nodes.append([chapter_node])
+
+    inc("md_to_epub_chapters_rendered_total", len(chapters))
+
+    # 목차 페이지 생성 (챕터 묶음, 여러 페이지로 나누기)
+    groups = chapter_groups(
+        len(chapters), metadata.get("volumes"), toc_options.group_size
+    )
+    toc_pages = list(paginate_toc(toc_chapter_nodes, groups, toc_options.page_size))
+    ranges = [(start, end) for _, start, end, _ in toc_pages]
+    for page_num, _, _, nodes in toc_pages:
+        write_page(
+            output_path / toc_page_filename(page_num),
+            "toc",
+            toc_page_context(
+                metadata,
+                nodes,
+                template_dir,
+                page_num,
+                len(toc_pages),
+                toc_page_links(ranges, page_num),
+            ),
+            template_dir,
+        )
+        manifest.add_page(toc_page_filename(page_num), "toc", "목차")
+
+    # 빌드 목록에는 스파인 순서(제목, 판권, 목차, 본문)대로 기록
+    for page in chapter_pages:
+        manifest.add_page(*page)
+
+    # 검색 색인 저장
+    if index_builder is not None:
+        write_search_index(index_builder.finish(), output_path / SEARCH_INDEX_FILENAME)
+        manifest.add_asset(SEARCH_INDEX_FILENAME, "search_index")
+        progress.message(f"검색 색인을 생성했습니다: {output_path / SEARCH_INDEX_FILENAME}")
+
+    # 쪽 목록 위치 지도 저장
+    if page_map_builder is not None:
+        write_page_map(page_map_builder.finish(), output_path / PAGE_MAP_FILENAME)
+        manifest.add_asset(PAGE_MAP_FILENAME, "page_map")
+        progress.message(
+            f"위치 지도를 생성했습니다: {output_path / PAGE_MAP_FILENAME} "
+            f"({page_map_builder.page_count}쪽)"
+        )
+
+    # 빌드 목록 저장 (EPUB 단계의 입력)
+    if cover_file.exists():
+        manifest.add_asset("cover.jpg", "cover")
+    manifest.write()
+
+
+def convert_resource_to_html(
+    resource_dir,
+    output_dir,
+    search_index=False,
+    markdown_engine="native",
+    image_options=None,
+    image_cache_dir=None,
+    content_cache_dir=None,
+    workers=None,
+    page_chars=None,
+    toc_options=None,
+    fonts_dir=None,
+    sample=None,
+    progress=None,
+    executor=None,
+):
+    """
+    resource 폴더의 데이터를 HTML로 변환합니다.
+    원고는 content.md 하나, content/ 폴더의 여러 .md 파일, 또는 metadata.json의
+    "content_files" 목록일 수 있으며, 파일마다 따로 변환되고 캐시(content_cache_dir)됩니다.
+    search_index가 True이면 본문 검색 색인(search_index.json)도 함께 생성합니다.
+    markdown_engine은 본문 변환에 사용할 마크다운 엔진 이름입니다.
+    본문에서 참조하는 이미지는 image_options(image_pipeline.ImageOptions)에 따라 처리되어
+    images 폴더에 저장됩니다.
+    workers는 원고와 이미지를 처리할 프로세스 수입니다. (기본값: CPU 수)
+    executor(ProcessPoolExecutor)를 주면 빌드마다 프로세스 풀을 새로 띄우지 않고 그것을 사용합니다.
+    page_chars가 주어지면 그 글자 수마다 챕터에 쪽 표시를 넣고 위치 지도(page_map.json)를 생성합니다.
+    toc_options(toc_tree.TocOptions)로 목차의 헤딩 단계, 챕터 묶음, 페이지 나누기를 정합니다.
+    챕터 묶음은 metadata.json의 "volumes"가 있으면 그것을 사용합니다.
+    만든 페이지와 리소스는 순서, 제목, 헤딩 목록, 해시와 함께 manifest.json에 기록됩니다.
+    fonts_dir을 주지 않으면 resource 폴더의 fonts 폴더를, 그것도 없으면 현재 디렉토리의
+    fonts 폴더를 사용합니다.
+    sample(sample_build.SampleOptions)을 주면 원고를 앞에서부터 그 크기만큼만 읽고 변환하여
+    미리보기용 HTML을 만듭니다. 목차에는 샘플에 들어간 챕터만 들어가며,
+    fontTools가 있으면 글꼴도 샘플에 쓰인 글자만 남겨 넣습니다.
+    progress(progress.Progress 또는 이벤트를 받을 함수)를 주면 메시지를 출력하는 대신
+    단계 시작/끝, 챕터 진행, 처리량 이벤트를 그쪽으로 보냅니다.
+    """
+    progress = as_progress(progress)
 
-        with open(output_path / chapter_filename, "w", encoding="utf-8") as f:
-            f.write(chapter_content)
+    # 경로 설정
+    resource_path = Path(resource_dir)
+    metadata_file = resource_path / "metadata.json"
+
+    # 출력 디렉토리 생성
+    output_path = Path(output_dir)
+    if output_path.exists():
+        shutil.rmtree(output_path)
+    output_path.mkdir(parents=True)
+
+    # 메타데이터 읽기
+    metadata = read_metadata(metadata_file)
+
+    # 마크다운 내용 처리
+    index_builder = SearchIndexBuilder() if search_index else None
+    content_files = find_content_files(resource_path, metadata)
+    if sample is not None:
+        # 샘플은 앞부분만 읽어 바로 변환 (원고 전체를 읽는 캐시는 사용하지 않음)
+        with progress.stage("html.content") as stage:
+            engine = get_markdown_engine(markdown_engine)
+            texts = read_sample_markdown(content_files, sample)
+            html_content = "\n".join(
+                engine.convert(text, index_builder) for text in texts
+            )
+            stage.advance(len(texts), sum(len(text.encode("utf-8")) for text in texts))
+    else:
+        html_content = process_content_files(
+            content_files,
+            index_builder,
+            markdown_engine,
+            content_cache_dir,
+            workers,
+            progress,
+            executor,
+        )
+
+    # 챕터 추출
+    chapters = extract_chapters(html_content)
+    if sample is not None and sample.chapters is not None:
+        chapters = chapters[: sample.chapters]
+
+    # 본문 이미지 처리 (중복 제거, 크기 조정, 캐시)
+    image_sources = [
+        src for _, content in chapters for src in find_image_sources(content)
+    ]
+    image_map = process_images(
+        image_sources,
+        resource_path,
+        output_path / IMAGE_DIR_NAME,
+        image_options,
+        image_cache_dir,
+        workers,
+        progress,
+        executor,
+    )
 
-    print(f"변환 완료: {resource_dir} -> {output_dir}/")
-    print(f"총 {len(chapters)}개의 챕터가 생성되었습니다.")
+    write_html_pages(
+        output_path,
+        resource_path,
+        metadata,
+        chapters,
+        image_map,
+        index_builder,
+        page_chars,
+        toc_options,
+        fonts_dir,
+        sample,
+        progress,
+    )
+
+    progress.message(f"변환 완료: {resource_dir} -> {output_dir}/")
+    progress.message(f"총 {len(chapters)}개의 챕터가 생성되었습니다.")
 
     return output_dir
 
 
+def add_build_arguments(parser):
+    """
+    원고 처리 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="원고와 이미지를 처리할 프로세스 수 (기본값: CPU 수)",
+    )
+    parser.add_argument(
+        "--content-cache-dir",
+        default=None,
+        help="원고 변환 결과 캐시 디렉토리 (기본값: ~/.cache/md_to_epub/content)",
+    )
+
+
 def main():
     import argparse
 
@@ -460,6 +958,23 @@ def main():
         default="output_html",
         help="출력 디렉토리 경로 (기본값: output_html)",
     )
+    parser.add_argument(
+        "--markdown-engine",
+        choices=sorted(MARKDOWN_ENGINES),
+        default="native",
+        help="마크다운 엔진: native(빠른 내장 엔진) 또는 markdown(확장 기능 지원) (기본값: native)",
+    )
+    parser.add_argument(
+        "--search-index",
+        action="store_true",
+        help="본문 검색 색인(search_index.json)을 함께 생성합니다",
+    )
+    add_image_arguments(parser)
+    add_build_arguments(parser)
+    add_page_map_arguments(parser)
+    add_toc_arguments(parser)
+    add_sample_arguments(parser)
+    add_progress_arguments(parser)
 
     args = parser.parse_args()
 
@@ -467,7 +982,20 @@ def main():
         print(f"오류: 리소스 디렉토리 '{args.resource_dir}'을 찾을 수 없습니다.")
         return 1
 
-    convert_resource_to_html(args.resource_dir, args.output_dir)
+    convert_resource_to_html(
+        args.resource_dir,
+        args.output_dir,
+        args.search_index,
+        args.markdown_engine,
+        image_options_from_args(args),
+        args.image_cache_dir,
+        args.content_cache_dir,
+        args.workers,
+        page_chars_from_args(args),
+        toc_options_from_args(args),
+        sample=sample_from_args(args),
+        progress=progress_from_args(args),
+    )
     return 0
 
 
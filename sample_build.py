@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import html
+import shutil
+import string
+import argparse
+from collections import namedtuple
+
+from markdown_engines import FENCE_PATTERN, HEADING_PATTERN
+from progress import as_progress
+
+# chapters: 앞에서부터 넣을 챕터 수, max_bytes: 읽을 원고 바이트 수 (둘 중 하나만 사용)
+SampleOptions = namedtuple("SampleOptions", ["chapters", "max_bytes"])
+
+# --sample 값: 3(챕터 3개), 3ch(챕터 3개), 200k / 200kb(200KB), 1m / 1mb(1MB), 50000b(바이트)
+SAMPLE_VALUE_PATTERN = re.compile(r"(\d+)\s*(ch|b|kb?|mb?)?", re.IGNORECASE)
+SAMPLE_BYTE_UNITS = {"b": 1, "k": 1024, "kb": 1024, "m": 1024**2, "mb": 1024**2}
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# 글꼴을 줄일 때 항상 남겨 둘 글자 (영문, 숫자, 문장 부호, 쪽 번호 등)
+BASE_CHARACTERS = string.printable
+
+
+def parse_sample(value):
+    """
+    --sample 옵션 값을 SampleOptions로 변환합니다.
+    숫자만 있거나 ch로 끝나면 챕터 수, b/kb/mb(또는 k/m)로 끝나면 원고 바이트 수입니다.
+    """
+    match = SAMPLE_VALUE_PATTERN.fullmatch(value.strip())
+    if not match or int(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(
+            f"샘플 크기는 챕터 수(예: 3) 또는 바이트 수(예: 200k)여야 합니다: {value}"
+        )
+    size = int(match.group(1))
+    unit = (match.group(2) or "ch").lower()
+    if unit == "ch":
+        return SampleOptions(size, None)
+    return SampleOptions(None, size * SAMPLE_BYTE_UNITS[unit])
+
+
+def read_sample_markdown(content_files, sample):
+    """
+    원고 파일들을 앞에서부터 샘플 크기만큼만 읽어 파일별 마크다운 문자열 목록을 반환합니다.
+    챕터 수가 정해져 있으면 (chapters + 1)번째 h1 헤딩 줄 앞에서, 바이트 수가 정해져 있으면
+    그 바이트 수를 넘긴 줄에서 읽기를 멈춥니다. 나머지 줄과 뒤쪽 파일은 열지 않습니다.
+    코드 블록 안의 # 줄은 헤딩으로 세지 않습니다.
+    """
+    texts = []
+    chapters = 0
+    read_bytes = 0
+    for content_file in content_files:
+        lines = []
+        fence = None
+        done = False
+        with open(content_file, "r", encoding="utf-8") as f:
+            for line in f:
+                stripped = line.strip()
+                if fence is not None:
+                    if stripped == fence:
+                        fence = None
+                elif FENCE_PATTERN.match(stripped):
+                    fence = FENCE_PATTERN.match(stripped).group(1)
+                elif sample.chapters is not None:
+                    heading_match = HEADING_PATTERN.match(stripped)
+                    if heading_match and len(heading_match.group(1)) == 1:
+                        chapters += 1
+                        if chapters > sample.chapters:
+                            done = True
+                            break
+                lines.append(line)
+                read_bytes += len(line.encode("utf-8"))
+                if sample.max_bytes is not None and read_bytes >= sample.max_bytes:
+                    done = True
+                    break
+        texts.append("".join(lines))
+        if done:
+            break
+    return texts
+
+
+def sample_characters(*texts):
+    """
+    HTML이나 일반 텍스트에서 글꼴이 표시해야 하는 글자 집합을 만듭니다.
+    """
+    characters = set(BASE_CHARACTERS)
+    for text in texts:
+        characters.update(html.unescape(TAG_PATTERN.sub("", text)))
+    return characters
+
+
+def subset_font(source_file, target_file, characters, progress=None):
+    """
+    글꼴 파일에서 characters에 들어 있는 글자만 남겨 target_file에 저장합니다.
+    fontTools가 설치되어 있지 않거나 줄일 수 없는 글꼴이면 전체를 복사하고 False를 반환합니다.
+    (어느 경우든 progress(progress.Progress)로 경고를 알림)
+    """
+    try:
+        from fontTools import subset
+    except ImportError:
+        as_progress(progress).message(
+            f"fontTools가 설치되어 있지 않아 글꼴 전체를 넣습니다: {source_file} "
+            "(pip install fonttools brotli)",
+            "warning",
+        )
+        shutil.copy(source_file, target_file)
+        return False
+
+    options = subset.Options()
+    suffix = str(source_file).lower().rsplit(".", 1)[-1]
+    options.flavor = suffix if suffix in ("woff", "woff2") else None
+    try:
+        font = subset.load_font(str(source_file), options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text="".join(sorted(characters)))
+        subsetter.subset(font)
+        subset.save_font(font, str(target_file), options)
+    except Exception as e:
+        as_progress(progress).message(
+            f"글꼴을 줄이지 못해 전체를 넣습니다: {source_file} ({e})", "warning"
+        )
+        shutil.copy(source_file, target_file)
+        return False
+    return True
+
+
+def add_sample_arguments(parser):
+    """
+    샘플 빌드 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--sample",
+        type=parse_sample,
+        default=None,
+        help="앞부분만 담은 미리보기 책을 만듭니다. 챕터 수(예: 3) 또는 원고 크기(예: 200k, 1m)",
+    )
+
+
+def sample_from_args(args):
+    """
+    명령줄 옵션에서 SampleOptions를 가져옵니다. 샘플 빌드가 아니면 None을 반환합니다.
+    """
+    return args.sample
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import html
+import json
+import unicodedata
+
+# 검색 색인 파일 이름 (HTML 출력 디렉토리의 사이드카 파일 및 EPUB 내부 경로)
+SEARCH_INDEX_FILENAME = "search_index.json"
+SEARCH_INDEX_EPUB_PATH = "search/index.json"
+SEARCH_INDEX_VERSION = 1
+
+# 한글·한자·가나처럼 띄어쓰기로 단어를 나누기 어려운 문자열은 글자 2-gram으로 색인
+CJK_RUN_PATTERN = r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-鿿가-힯豈-﫿]+"
+# 그 밖의 글자·숫자는 소문자 단어 단위로 색인
+WORD_RUN_PATTERN = r"[^\W_]+"
+TOKEN_PATTERN = re.compile(f"({CJK_RUN_PATTERN})|({WORD_RUN_PATTERN})")
+
+# 색인하기 전에 지우는 HTML 태그와 마크다운 강조 기호
+MARKUP_PATTERN = re.compile(r"<[^>]+>|[*_`]+")
+
+
+def tokenize(text):
+    """
+    텍스트를 검색 토큰으로 나눕니다.
+    한글 등 CJK 문자열은 겹치는 글자 2-gram으로, 나머지는 소문자 단어로 나눕니다.
+    한 글자짜리 CJK 문자열은 그 글자 하나를 토큰으로 사용합니다.
+    """
+    text = unicodedata.normalize("NFC", MARKUP_PATTERN.sub(" ", text))
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        cjk_run, word = match.groups()
+        if cjk_run:
+            if len(cjk_run) == 1:
+                tokens.append(cjk_run)
+            else:
+                tokens.extend(cjk_run[i : i + 2] for i in range(len(cjk_run) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def plain_text(html_text):
+    """
+    헤딩 HTML에서 태그와 강조 기호를 지운 글자만 반환합니다. (구역 제목과 같은 형식)
+    """
+    return html.unescape(MARKUP_PATTERN.sub("", html_text)).strip()
+
+
+def heading_id(chapter_num, heading_index):
+    """
+    챕터 파일 안의 n번째 헤딩에 부여되는 ID를 반환합니다.
+    resource_to_epub에서 헤딩에 붙이는 ID와 같은 형식입니다.
+    """
+    return f"header_chapter_{chapter_num}_{heading_index}"
+
+
+class SearchIndexBuilder:
+    """
+    마크다운을 처리하면서 헤딩 단위 구역(section)별로 토큰을 모아
+    2-gram → 구역 번호 목록 형태의 역색인을 만듭니다.
+
+    챕터 분할은 extract_chapters와 같은 규칙을 따릅니다.
+    h1이 새 챕터를 시작하고, 첫 h1 이전 내용은 h1이 하나라도 있으면 버려지며,
+    h1이 없으면 전체가 chapter_1.html 하나로 처리됩니다.
+    챕터 페이지를 쓴 뒤 set_chapter_headings로 실제 헤딩 ID를 알려 주면 구역이 그 ID를 가리킵니다.
+    """
+
+    def __init__(self):
+        self.sections = []
+        self.section_levels = []
+        self.chapter_headings = {}
+        self.postings = {}
+        self.chapter_count = 0
+        self.heading_count = 0
+        self._prelude = []
+        self._current = None
+
+    def add_heading(self, level, text):
+        """
+        헤딩을 추가하고 새 구역을 시작합니다.
+        """
+        self._start_section(level, text, tokenize(text))
+
+    def add_text(self, text):
+        """
+        현재 구역에 본문 텍스트를 추가합니다.
+        """
+        self._add_tokens(tokenize(text))
+
+    def replay(self, events):
+        """
+        SearchIndexRecorder가 기록한 이벤트를 순서대로 추가합니다.
+        """
+        for event in events:
+            if event[0] == "h":
+                self._start_section(event[1], event[2], event[3])
+            else:
+                self._add_tokens(event[1])
+
+    def _start_section(self, level, text, tokens):
+        self._close_section()
+        if level == 1:
+            # 첫 h1 이전 내용은 챕터로 추출되지 않으므로 색인에서도 제외
+            self._prelude = []
+            self.chapter_count += 1
+            self.heading_count = 0
+
+        chapter_num = self.chapter_count or 1
+        self._current = {
+            "file": f"chapter_{chapter_num}.html",
+            "id": heading_id(chapter_num, self.heading_count),
+            "level": level,
+            "title": MARKUP_PATTERN.sub("", text).strip(),
+            "tokens": set(tokens),
+        }
+        self.heading_count += 1
+
+    def _add_tokens(self, tokens):
+        if self._current is None:
+            self._current = {
+                "file": "chapter_1.html",
+                "id": None,
+                "level": None,
+                "title": "",
+                "tokens": set(),
+            }
+        self._current["tokens"].update(tokens)
+
+    def _close_section(self):
+        if self._current is None:
+            return
+        if self.chapter_count:
+            self._commit(self._current)
+        else:
+            self._prelude.append(self._current)
+        self._current = None
+
+    def _commit(self, section):
+        section_num = len(self.sections)
+        self.sections.append([section["file"], section["id"], section["title"]])
+        self.section_levels.append(section["level"])
+        for token in section["tokens"]:
+            self.postings.setdefault(token, []).append(section_num)
+
+    def set_chapter_headings(self, file_name, headings):
+        """
+        챕터 페이지에 실제로 붙은 헤딩 목록 [(단계, 제목, ID), ...]을 기록합니다.
+        (toc_tree.label_headings의 결과, 템플릿이 넣은 헤딩과 이미 있던 ID 포함)
+        """
+        self.chapter_headings[file_name] = headings
+
+    def _apply_heading_ids(self):
+        """
+        구역의 헤딩 ID를 set_chapter_headings로 받은 실제 ID로 바꿉니다.
+        챕터마다 단계와 제목이 같은 헤딩을 앞에서부터 차례로 찾으며,
+        템플릿이 넣은 헤딩처럼 원고에 없는 헤딩은 건너뜁니다.
+        """
+        positions = {}
+        for section, level in zip(self.sections, self.section_levels):
+            headings = self.chapter_headings.get(section[0])
+            if headings is None or level is None:
+                continue
+            start = positions.get(section[0], 0)
+            for k in range(start, len(headings)):
+                heading_level, text, header_id = headings[k]
+                if heading_level == level and plain_text(text) == section[2]:
+                    section[1] = header_id
+                    positions[section[0]] = k + 1
+                    break
+
+    def finish(self):
+        """
+        마지막 구역을 닫고 직렬화 가능한 색인 사전을 반환합니다.
+        구역 번호 목록은 크기를 줄이기 위해 차이값(delta)으로 저장됩니다.
+        """
+        self._close_section()
+        for section in self._prelude:
+            self._commit(section)
+        self._prelude = []
+        self._apply_heading_ids()
+
+        postings = {}
+        for token in sorted(self.postings):
+            previous = 0
+            deltas = []
+            for section_num in self.postings[token]:
+                deltas.append(section_num - previous)
+                previous = section_num
+            postings[token] = deltas
+
+        return {
+            "version": SEARCH_INDEX_VERSION,
+            "tokenizer": "cjk-bigram",
+            "sections": self.sections,
+            "postings": postings,
+        }
+
+
+class SearchIndexRecorder:
+    """
+    SearchIndexBuilder와 같은 방식으로 호출되지만 색인을 만들지 않고
+    토큰화한 결과를 이벤트 목록으로 기록합니다.
+    원고 파일을 따로따로(병렬로) 처리한 뒤 SearchIndexBuilder.replay()로 순서대로 합칠 때 사용합니다.
+    이벤트는 JSON으로 저장할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._events = []
+
+    def add_heading(self, level, text):
+        self._events.append(["h", level, text, set(tokenize(text))])
+
+    def add_text(self, text):
+        if not self._events or self._events[-1][0] != "t":
+            self._events.append(["t", set()])
+        self._events[-1][1].update(tokenize(text))
+
+    def finish(self):
+        """
+        기록한 이벤트를 JSON으로 저장할 수 있는 목록으로 반환합니다.
+        """
+        return [event[:-1] + [sorted(event[-1])] for event in self._events]
+
+
+def dump_search_index(index):
+    """
+    색인을 공백 없는 JSON 문자열로 직렬화합니다.
+    """
+    return json.dumps(index, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_search_index(index, output_file):
+    """
+    색인을 JSON 파일로 저장합니다.
+    """
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(dump_search_index(index))
+
+
+def search(index, query):
+    """
+    색인에서 질의의 모든 토큰을 포함하는 구역 목록을 반환합니다.
+    결과는 (챕터 파일, 헤딩 ID, 헤딩 제목) 목록이며, 정확한 일치 여부는 호출하는 쪽에서 확인합니다.
+    """
+    tokens = set(tokenize(query))
+    if not tokens:
+        return []
+
+    candidates = None
+    for token in tokens:
+        section_nums = set()
+        current = 0
+        for delta in index["postings"].get(token, []):
+            current += delta
+            section_nums.add(current)
+        candidates = section_nums if candidates is None else candidates & section_nums
+        if not candidates:
+            return []
+
+    return [tuple(index["sections"][n]) for n in sorted(candidates)]
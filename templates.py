@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# 템플릿 안의 치환 자리 표시자: ${name}
+PLACEHOLDER_PATTERN = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+# 리소스 디렉토리 안에서 템플릿을 덮어쓸 때 사용하는 하위 폴더 이름
+TEMPLATE_DIR_NAME = "templates"
+
+DEFAULT_TEMPLATES = {
+    "title": """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="${language}" lang="${language}">
+<head>
+    <meta charset="UTF-8" />
+    <title>${title}</title>
+    <link rel="stylesheet" type="text/css" href="style.css" />
+</head>
+<body>
+    <div class="title-page">
+        <h1 class="title">${title}</h1>
+        <p class="author">${creator}</p>
+        <p class="publisher">${publisher}</p>
+    </div>
+</body>
+</html>""",
+    "chapter": """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+    <meta charset="UTF-8" />
+    <title>${title}</title>
+    <link rel="stylesheet" type="text/css" href="style.css" />
+</head>
+<body>
+    <div class="chapter">
+${heading}        ${content}
+    </div>
+</body>
+</html>""",
+    "chapter_heading": """        <h1>${title}</h1>
+""",
+    "toc": """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="${language}" lang="${language}">
+<head>
+    <meta charset="UTF-8" />
+    <title>목차</title>
+    <link rel="stylesheet" type="text/css" href="style.css" />
+</head>
+<body>
+    <div class="toc">
+        <h1>목차${page_label}</h1>
+        <ul>
+            ${toc_items}
+        </ul>
+${toc_pages}    </div>
+</body>
+</html>""",
+    "toc_item": """<li><a href="${href}">${title}</a></li>
+""",
+    "toc_branch": """<li><a href="${href}">${title}</a>
+<ul>
+${children}</ul>
+</li>
+""",
+    "toc_page_label": """ (${page}/${page_count})""",
+    "toc_pages": """        <ul class="toc-pages">
+${pages}        </ul>
+""",
+    "site_nav": """<ul class="site-nav">
+${links}</ul>
+""",
+    "colophon": """<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+    <meta charset="UTF-8" />
+    <title>판권</title>
+    <link rel="stylesheet" type="text/css" href="style.css" />
+</head>
+<body>
+    <div class="colophon">
+${heading}        <table class="colophon-table">
+${rows}        </table>
+${copyright}    </div>
+</body>
+</html>""",
+    "colophon_heading": """        <h1>${title}</h1>
+""",
+    "colophon_row": """            <tr><th align="left">${label}</th><td align="left">${value}</td></tr>
+""",
+    "colophon_copyright": """        <p class="copyright">${copyright_notice}</p>
+""",
+}
+
+
+class Template:
+    """
+    한 번 컴파일된 페이지 템플릿입니다.
+    리터럴 조각과 변수 이름을 번갈아 가진 목록으로 저장하여
+    렌더링 시 정규식이나 문자열 연결 없이 바로 출력 스트림에 씁니다.
+    """
+
+    def __init__(self, source, name=None):
+        self.name = name
+        self.parts = compile_template(source)
+
+    def render_to(self, out, context):
+        """
+        템플릿을 쓰기 가능한 텍스트 스트림(out)에 렌더링합니다.
+        context 값이 호출 가능하면 out을 인자로 호출하여 내용을 직접 쓰게 합니다.
+        """
+        write = out.write
+        for literal, name in self.parts:
+            if literal:
+                write(literal)
+            if name is None:
+                continue
+            value = context.get(name, "")
+            if callable(value):
+                value(out)
+            elif value is not None:
+                write(str(value))
+
+    def render(self, context):
+        """
+        템플릿을 문자열로 렌더링합니다.
+        """
+        buffer = io.StringIO()
+        self.render_to(buffer, context)
+        return buffer.getvalue()
+
+
+def compile_template(source):
+    """
+    템플릿 문자열을 (리터럴, 변수 이름) 조각 목록으로 컴파일합니다.
+    """
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(source):
+        parts.append((source[position : match.start()], match.group(1)))
+        position = match.end()
+    parts.append((source[position:], None))
+    return tuple(parts)
+
+
+@lru_cache(maxsize=None)
+def _load_template(name, override_path, mtime):
+    """
+    템플릿을 컴파일하여 프로세스 단위로 캐시합니다.
+    덮어쓰기 파일은 경로와 수정 시각을 키로 사용하므로 파일이 바뀌면 다시 컴파일됩니다.
+    """
+    if override_path is not None:
+        with open(override_path, "r", encoding="utf-8") as f:
+            return Template(f.read(), name)
+    return Template(DEFAULT_TEMPLATES[name], name)
+
+
+def get_template(name, template_dir=None):
+    """
+    이름에 해당하는 컴파일된 템플릿을 가져옵니다.
+    template_dir에 <name>.html 파일이 있으면 기본 템플릿 대신 사용합니다.
+    """
+    if name not in DEFAULT_TEMPLATES:
+        raise KeyError(f"알 수 없는 템플릿입니다: {name}")
+
+    if template_dir is not None:
+        override_file = Path(template_dir) / f"{name}.html"
+        if override_file.is_file():
+            return _load_template(
+                name, str(override_file), override_file.stat().st_mtime_ns
+            )
+
+    return _load_template(name, None, None)
+
+
+def render_items(template, items):
+    """
+    항목 목록을 같은 템플릿으로 차례대로 출력 스트림에 쓰는 함수를 반환합니다.
+    상위 템플릿의 context 값으로 사용합니다.
+    """
+
+    def write_items(out):
+        for item in items:
+            template.render_to(out, item)
+
+    return write_items
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from builder import Builder
+
+
+def make_book(resource_dir, title, word, chapter_count=20):
+    """
+    각주와 표가 있는 책을 만듭니다. (markdown 엔진이 변환 중 상태를 쓰는 원고)
+    """
+    resource_dir.mkdir()
+    (resource_dir / "metadata.json").write_text(
+        json.dumps({"title": title}, ensure_ascii=False), encoding="utf-8"
+    )
+    chapters = []
+    for i in range(1, chapter_count + 1):
+        paragraphs = f"{word} *본문*입니다.[^{i}] **강조**\n\n" * 50
+        table = f"| {word} | 값 |\n|---|---|\n| {i} | {word * i} |\n"
+        chapters.append(
+            f"# {word} {i}장\n\n{paragraphs}{table}\n[^{i}]: {word} 각주 {i}\n"
+        )
+    (resource_dir / "content.md").write_text("\n".join(chapters), encoding="utf-8")
+    return resource_dir
+
+
+def test_concurrent_builds_with_markdown_engine(tmp_path):
+    # 원고 변환 캐시를 쓰지 않도록 빌드 방식마다 빈 캐시 디렉토리를 사용
+    words = ["봄날", "낙엽", "눈꽃", "바다", "노을", "새벽", "소나기", "단풍"]
+    books = [
+        make_book(tmp_path / f"book_{i}", word, word) for i, word in enumerate(words)
+    ]
+    options = dict(markdown_engine="markdown", workers=1, reproducible=True)
+
+    with Builder(content_cache_dir=tmp_path / "serial_cache", **options) as builder:
+        expected = [builder.build(book) for book in books]
+    with Builder(content_cache_dir=tmp_path / "thread_cache", **options) as builder:
+        with ThreadPoolExecutor(max_workers=len(books)) as pool:
+            results = list(pool.map(builder.build, books))
+
+    assert len(set(expected)) == len(books)
+    assert results == expected
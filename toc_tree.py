@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import argparse
+from collections import namedtuple
+
+from search_index import heading_id
+
+# 본문 HTML의 헤딩 태그 (속성, 내용 포함)
+HEADING_TAG_PATTERN = re.compile(r"<h([1-6])(\s[^>]*)?>(.*?)</h\1>", re.DOTALL)
+# id 속성 (data-id, xml:id 같은 다른 속성은 제외)
+ID_ATTR_PATTERN = re.compile(r'(?<![\w:-])id="([^"]*)"')
+
+# depth: 목차 페이지에 넣을 헤딩 단계 (1이면 챕터만)
+# page_size: 목차 페이지 하나에 넣을 챕터 수 (None이면 한 페이지)
+# group_size: 챕터를 묶을 단위 (예: 100이면 1~100, 101~200, ...)
+# nav_depth: EPUB 내비게이션(nav, NCX)에 넣을 헤딩 단계
+TocOptions = namedtuple(
+    "TocOptions", ["depth", "page_size", "group_size", "nav_depth"]
+)
+DEFAULT_TOC_OPTIONS = TocOptions(1, None, None, 3)
+
+
+def toc_page_filename(page_num):
+    """
+    n번째 목차 페이지의 파일 이름을 반환합니다. 첫 페이지는 toc.html입니다.
+    """
+    return "toc.html" if page_num == 1 else f"toc_{page_num}.html"
+
+
+def label_headings(content, chapter_num):
+    """
+    챕터 본문의 헤딩에 ID를 붙이고 (새 본문, [(단계, 제목, ID), ...])를 반환합니다.
+    ID는 resource_to_epub이 붙이는 것과 같은 header_chapter_N_K 형식이며,
+    이미 ID가 있으면 그대로 사용합니다.
+    """
+    headings = []
+
+    def replace(match):
+        level, attrs, title = match.groups()
+        attrs = attrs or ""
+        id_match = ID_ATTR_PATTERN.search(attrs)
+        if id_match:
+            header_id = id_match.group(1)
+        else:
+            header_id = heading_id(chapter_num, len(headings))
+            attrs = f' id="{header_id}"{attrs}'
+        headings.append((int(level), title.strip(), header_id))
+        return f"<h{level}{attrs}>{title}</h{level}>"
+
+    return HEADING_TAG_PATTERN.sub(replace, content), headings
+
+
+def toc_node(title, href, children=None):
+    """
+    목차 항목 하나를 만듭니다. 템플릿 context로 바로 사용할 수 있는 사전입니다.
+    """
+    return {"title": title, "href": href, "children": children or []}
+
+
+def nest_headings(headings, max_level):
+    """
+    (단계, 항목) 목록을 단계에 따라 중첩된 항목 목록으로 만듭니다.
+    max_level보다 깊은 헤딩은 제외하며, 중간 단계가 빠진 헤딩(h2 없는 h3)은
+    가장 가까운 상위 헤딩 아래에 놓입니다. 항목 수에 비례하는 시간만 듭니다.
+    """
+    roots = []
+    stack = []
+    for level, node in headings:
+        if level > max_level:
+            continue
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        (stack[-1][1]["children"] if stack else roots).append(node)
+        stack.append((level, node))
+    return roots
+
+
+def chapter_groups(count, volumes=None, group_size=None):
+    """
+    챕터 묶음 목록 [(제목, 시작 번호, 끝 번호), ...]을 반환합니다. 번호는 0부터 세며 끝은 포함하지 않습니다.
+    volumes는 metadata.json의 "volumes" 목록([{"title": "제1부", "start": 1}, ...])이고,
+    없으면 group_size 단위(1~100, 101~200, ...)로 묶습니다.
+    첫 묶음 이전의 챕터는 묶지 않습니다.
+    """
+    if group_size is not None and group_size <= 0:
+        raise ValueError(f"챕터 묶음 단위는 1 이상이어야 합니다: {group_size}")
+    if volumes:
+        starts = sorted((volume["start"] - 1, volume["title"]) for volume in volumes)
+        ends = [start for start, _ in starts[1:]] + [count]
+        return [
+            (title, start, min(end, count))
+            for (start, title), end in zip(starts, ends)
+            if start < count
+        ]
+
+    if group_size:
+        groups = []
+        for start in range(0, count, group_size):
+            end = min(start + group_size, count)
+            groups.append((f"{start + 1}~{end}", start, end))
+        return groups
+
+    return []
+
+
+def group_nodes(chapter_nodes, groups, offset=0, first_group=0):
+    """
+    챕터별 목차 항목 목록(chapter_nodes[i]는 offset+i번째 챕터의 항목들)을 묶음에 따라 중첩합니다.
+    묶음 항목은 묶음 안의 첫 챕터를 가리키며 "group" 값이 True입니다.
+    first_group은 확인을 시작할 묶음 번호입니다. (앞 묶음을 다시 훑지 않도록)
+    """
+    roots = []
+    group_num = first_group
+    current = None
+    for index, nodes in enumerate(chapter_nodes, offset):
+        while group_num < len(groups) and index >= groups[group_num][2]:
+            group_num += 1
+            current = None
+        group = groups[group_num] if group_num < len(groups) else None
+        if group is not None and index >= group[1] and nodes:
+            if current is None:
+                current = toc_node(group[0], nodes[0]["href"])
+                current["group"] = True
+                roots.append(current)
+            current["children"].extend(nodes)
+        else:
+            roots.extend(nodes)
+    return roots
+
+
+def page_ranges(count, page_size=None):
+    """
+    목차 페이지별 챕터 범위 [(시작, 끝), ...]을 반환합니다.
+    """
+    if page_size is not None and page_size <= 0:
+        raise ValueError(f"목차 페이지 크기는 1 이상이어야 합니다: {page_size}")
+    if not page_size or count <= page_size:
+        return [(0, count)]
+    return [
+        (start, min(start + page_size, count)) for start in range(0, count, page_size)
+    ]
+
+
+def paginate_toc(chapter_nodes, groups, page_size=None):
+    """
+    챕터별 목차 항목을 페이지로 나누고 각 페이지 안에서 묶음에 따라 중첩합니다.
+    (페이지 번호, 시작, 끝, 항목 목록)을 차례로 내놓으며, 전체 시간은 챕터 수와 묶음 수에 비례합니다.
+    페이지 경계에 걸친 묶음은 다음 페이지에서 같은 제목으로 다시 시작합니다.
+    """
+    group_num = 0
+    ranges = page_ranges(len(chapter_nodes), page_size)
+    for page_num, (start, end) in enumerate(ranges, 1):
+        while group_num < len(groups) and groups[group_num][2] <= start:
+            group_num += 1
+        yield page_num, start, end, group_nodes(
+            chapter_nodes[start:end], groups, start, group_num
+        )
+
+
+def positive_int(value):
+    """
+    1 이상의 정수여야 하는 명령줄 옵션 값을 변환합니다.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"1 이상의 정수여야 합니다: {value}")
+    return number
+
+
+def add_toc_arguments(parser):
+    """
+    목차 관련 명령줄 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--toc-depth",
+        type=positive_int,
+        default=DEFAULT_TOC_OPTIONS.depth,
+        help="목차 페이지에 넣을 헤딩 단계 (기본값: 1, 챕터만)",
+    )
+    parser.add_argument(
+        "--toc-page-size",
+        type=positive_int,
+        default=None,
+        help="목차 페이지 하나에 넣을 챕터 수 (기본값: 한 페이지)",
+    )
+    parser.add_argument(
+        "--toc-group-size",
+        type=positive_int,
+        default=None,
+        help="목차에서 챕터를 묶을 단위 (예: 100). metadata.json의 volumes가 있으면 그 묶음을 사용",
+    )
+    parser.add_argument(
+        "--nav-depth",
+        type=positive_int,
+        default=DEFAULT_TOC_OPTIONS.nav_depth,
+        help="EPUB 내비게이션에 넣을 헤딩 단계 (기본값: 3)",
+    )
+
+
+def toc_options_from_args(args):
+    """
+    명령줄 옵션에서 TocOptions를 만듭니다.
+    """
+    return TocOptions(
+        args.toc_depth, args.toc_page_size, args.toc_group_size, args.nav_depth
+    )
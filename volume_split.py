@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import shutil
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_plan import EPUB_CONTENT_RATIO
+from build_workspace import cleanup_workspace, create_workspace
+from image_pipeline import IMAGE_DIR_NAME, find_image_sources, process_images
+from metrics import collect_in_worker, merge_snapshot, metrics_enabled, record_build
+from output_targets import target_output_path
+from progress import Progress, as_progress
+from resource_to_html import (
+    extract_chapters,
+    find_content_files,
+    process_content_files,
+    read_metadata,
+    resolve_fonts_dir,
+    write_html_pages,
+)
+from sample_build import SAMPLE_BYTE_UNITS, SAMPLE_VALUE_PATTERN
+
+# max_chapters: 한 권에 넣을 최대 챕터 수, max_bytes: 한 권의 최대 크기 (둘 중 하나만 사용)
+VolumeOptions = namedtuple("VolumeOptions", ["max_chapters", "max_bytes"])
+
+# 크기로 나눌 때 계획을 다시 세우는 최대 횟수와, 다시 세울 때 본문 비율에 더하는 여유
+VOLUME_PLAN_ATTEMPTS = 3
+VOLUME_SIZE_MARGIN = 1.05
+
+# 권마다 제목을 만드는 기본 형식 (metadata.json의 "volume_title"로 바꿀 수 있음)
+DEFAULT_VOLUME_TITLE = "{title} {index}권"
+
+VOLUME_WORKSPACE_PREFIX = "md_to_epub_volumes_"
+
+
+def parse_volume_size(value):
+    """
+    --split-volumes 옵션 값을 VolumeOptions로 변환합니다. (--sample과 같은 형식)
+    숫자만 있거나 ch로 끝나면 권당 챕터 수, b/kb/mb(또는 k/m)로 끝나면 권당 바이트 수입니다.
+    """
+    match = SAMPLE_VALUE_PATTERN.fullmatch(value.strip())
+    if not match or int(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(
+            f"권 크기는 챕터 수(예: 500) 또는 바이트 수(예: 80m)여야 합니다: {value}"
+        )
+    size = int(match.group(1))
+    unit = (match.group(2) or "ch").lower()
+    if unit == "ch":
+        return VolumeOptions(size, None)
+    return VolumeOptions(None, size * SAMPLE_BYTE_UNITS[unit])
+
+
+def plan_volumes(chapter_sizes, options, shared_bytes=0):
+    """
+    챕터를 앞에서부터 권으로 나눕니다. 권마다 (시작 번호, 끝 번호) 목록을 반환합니다.
+    번호는 0부터 세며 끝은 포함하지 않습니다.
+    chapter_sizes는 챕터마다 EPUB에서 차지할 예상 바이트 수입니다.
+    max_bytes로 나눌 때는 권마다 함께 들어가는 리소스(shared_bytes: 글꼴, CSS, 표지)를 뺀 크기에
+    챕터를 채웁니다. 그 크기보다 큰 챕터는 혼자 한 권이 됩니다.
+    """
+    count = len(chapter_sizes)
+    if options.max_chapters is not None:
+        return [
+            (start, min(start + options.max_chapters, count))
+            for start in range(0, count, options.max_chapters)
+        ]
+
+    budget = options.max_bytes - shared_bytes
+    if budget <= 0:
+        raise ValueError(
+            f"권 크기({options.max_bytes}바이트)가 권마다 들어가는 리소스 크기"
+            f"({shared_bytes}바이트)보다 작습니다."
+        )
+    ranges = []
+    start = 0
+    size = 0
+    for i, chapter_size in enumerate(chapter_sizes):
+        if i > start and size + chapter_size > budget:
+            ranges.append((start, i))
+            start = i
+            size = 0
+        size += chapter_size
+    if start < count:
+        ranges.append((start, count))
+    return ranges
+
+
+def volume_groups(volumes, start, end):
+    """
+    metadata.json의 "volumes"(챕터 묶음) 목록을 start~end 챕터만 담은 권에 맞게 바꿉니다.
+    권이 묶음 중간에서 시작하면 그 묶음을 권의 첫 챕터부터 시작하는 묶음으로 남깁니다.
+    """
+    groups = []
+    for group in sorted(volumes, key=lambda group: group["start"]):
+        group_start = group["start"] - 1
+        if group_start >= end:
+            break
+        if group_start <= start:
+            groups = [{"title": group["title"], "start": 1}]
+        else:
+            groups.append({"title": group["title"], "start": group_start - start + 1})
+    return groups
+
+
+def volume_metadata(metadata, index, count, start, end):
+    """
+    index번째 권(1부터)의 메타데이터를 만듭니다.
+    제목은 "volume_title" 형식({title}, {index}, {count} 사용)으로 만들고, 시리즈 이름("series",
+    없으면 원래 제목)과 권 번호("series_index")를 넣습니다. identifier가 있으면 권 번호를 붙입니다.
+    """
+    title = metadata.get("title", "제목 없음")
+    volume = dict(metadata)
+    volume["title"] = metadata.get("volume_title", DEFAULT_VOLUME_TITLE).format(
+        title=title, index=index, count=count
+    )
+    volume["series"] = metadata.get("series", title)
+    volume["series_index"] = index
+    if "identifier" in metadata:
+        volume["identifier"] = f"{metadata['identifier']}-{index}"
+    if metadata.get("volumes"):
+        volume["volumes"] = volume_groups(metadata["volumes"], start, end)
+    return volume
+
+
+def volume_output_path(output_file, index, count):
+    """
+    index번째 권의 출력 경로를 반환합니다. (book.epub -> book-1.epub, ...)
+    번호는 권 수의 자리수에 맞춰 0을 채웁니다. (10권 이상이면 book-01.epub, ...)
+    """
+    output_file = Path(output_file)
+    return output_file.with_name(
+        f"{output_file.stem}-{index:0{len(str(count))}d}{output_file.suffix}"
+    )
+
+
+def shared_asset_bytes(resource_path, fonts_dir=None):
+    """
+    권마다 똑같이 들어가는 리소스(글꼴, CSS, 표지)의 크기 합계를 구합니다.
+    """
+    files = [resource_path / "style.css", resource_path / "cover.jpg"]
+    fonts_dir = resolve_fonts_dir(resource_path, fonts_dir)
+    if fonts_dir.exists():
+        files.extend(fonts_dir.glob("*"))
+    return sum(path.stat().st_size for path in files if path.is_file())
+
+
+def _build_volume(job, progress=None):
+    """
+    권 하나의 HTML 페이지를 쓰고 EPUB으로 묶습니다. (작업 프로세스에서 실행)
+    progress가 없으면 이벤트를 모아 (결과, 이벤트 목록)으로 돌려주어 부모 프로세스가 다시 보냅니다.
+    """
+    from resource_to_epub import convert_html_to_epub
+
+    events = []
+    if progress is None:
+        progress = Progress(events.append)
+
+    html_dir = Path(job["html_dir"])
+    html_dir.mkdir(parents=True)
+    # 한 번 처리한 이미지 중 이 권에 쓰인 것만 복사
+    for image_file in sorted(set(job["image_map"].values())):
+        target_file = html_dir / image_file
+        target_file.parent.mkdir(exist_ok=True)
+        shutil.copy(Path(job["shared_dir"]) / image_file, target_file)
+
+    write_html_pages(
+        html_dir,
+        Path(job["resource_dir"]),
+        job["metadata"],
+        job["chapters"],
+        job["image_map"],
+        page_chars=job["page_chars"],
+        toc_options=job["toc_options"],
+        fonts_dir=job["fonts_dir"],
+        progress=progress,
+    )
+    result = convert_html_to_epub(
+        html_dir,
+        job["output_file"],
+        job["metadata"],
+        validate=job["validate"],
+        toc_options=job["toc_options"],
+        targets=job["targets"],
+        progress=progress,
+        reproducible=job["reproducible"],
+        compression=job["compression"],
+    )
+    return result, events
+
+
+def _build_volumes(jobs, ranges, chapter_sizes, workers=None, progress=None):
+    """
+    권들을 workers개의 프로세스에서 병렬로 만들고 권별 결과 목록을 반환합니다.
+    """
+    results = []
+    with progress.stage("epub.volumes", len(jobs)) as stage:
+        if workers == 1 or len(jobs) == 1:
+            for job, (start, end) in zip(jobs, ranges):
+                result, _ = _build_volume(job, progress)
+                results.append(result)
+                stage.advance(nbytes=sum(chapter_sizes[start:end]))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # 작업 프로세스에서 모은 지표는 부모 프로세스의 레지스트리에 더함
+                futures = [
+                    pool.submit(collect_in_worker, metrics_enabled(), _build_volume, job)
+                    for job in jobs
+                ]
+                for future, (start, end) in zip(futures, ranges):
+                    (result, events), snapshot = future.result()
+                    merge_snapshot(snapshot)
+                    progress.forward(events)
+                    results.append(result)
+                    stage.advance(nbytes=sum(chapter_sizes[start:end]))
+    return results
+
+
+def remove_volume_outputs(output_files, targets):
+    """
+    다시 나누기 전에 앞에서 만든 권들의 출력 파일(형식별)을 지웁니다.
+    """
+    for output_file in output_files:
+        for target in targets:
+            path = Path(target_output_path(output_file, target))
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+
+
+def convert_resource_to_volumes(
+    resource_dir,
+    output_file,
+    volume_options,
+    markdown_engine="native",
+    image_options=None,
+    image_cache_dir=None,
+    content_cache_dir=None,
+    workers=None,
+    page_chars=None,
+    toc_options=None,
+    fonts_dir=None,
+    targets=("epub3",),
+    validate=True,
+    workspace_dir=None,
+    keep_workspace=False,
+    progress=None,
+    reproducible=False,
+    compression="default",
+):
+    """
+    resource 폴더 하나를 여러 권의 EPUB으로 나누어 만듭니다.
+    volume_options(VolumeOptions)의 챕터 수나 크기를 넘지 않도록 챕터를 앞에서부터 나누며,
+    크기는 build_plan의 비용 모델(EPUB_CONTENT_RATIO)로 예상하고 만든 EPUB이 넘으면 실제 크기로
+    다시 나눕니다. (최대 VOLUME_PLAN_ATTEMPTS번)
+    권마다 제목 페이지, 목차, 메타데이터(시리즈 이름과 권 번호)를 따로 만듭니다.
+    원고와 본문 이미지는 한 번만 처리하고, 권별 페이지 쓰기와 EPUB 묶기는 workers개의 프로세스에서
+    병렬로 합니다. 출력 파일은 volume_output_path의 경로(book-1.epub, book-2.epub, ...,
+    10권 이상이면 book-01.epub, book-02.epub, ...)입니다.
+    나머지 인자는 convert_resource_to_epub과 같습니다. (검색 색인과 샘플 빌드는 지원하지 않음)
+    만든 권별 EPUB 경로 목록을 반환하며, 한 권이라도 실패하면 None을 반환합니다.
+    """
+    progress = as_progress(progress)
+    resource_path = Path(resource_dir)
+    metadata = read_metadata(resource_path / "metadata.json")
+
+    started = time.perf_counter()
+    workspace = create_workspace(workspace_dir, VOLUME_WORKSPACE_PREFIX)
+    results = None
+    try:
+        # 원고와 본문 이미지는 모든 권이 함께 쓰도록 한 번만 처리
+        chapters = extract_chapters(
+            process_content_files(
+                find_content_files(resource_path, metadata),
+                None,
+                markdown_engine,
+                content_cache_dir,
+                workers,
+                progress,
+            )
+        )
+        shared_dir = workspace / "shared"
+        chapter_sources = [find_image_sources(content) for _, content in chapters]
+        image_map = process_images(
+            [src for sources in chapter_sources for src in sources],
+            resource_path,
+            shared_dir / IMAGE_DIR_NAME,
+            image_options,
+            image_cache_dir,
+            workers,
+            progress,
+        )
+
+        # 챕터 크기: 본문과 그 챕터에서 처음 쓰인 이미지
+        html_sizes = []
+        image_sizes = []
+        counted_images = set()
+        for (_, content), sources in zip(chapters, chapter_sources):
+            html_sizes.append(len(content.encode("utf-8")))
+            image_size = 0
+            for src in sources:
+                image_file = image_map.get(src)
+                if image_file is not None and image_file not in counted_images:
+                    counted_images.add(image_file)
+                    image_size += (shared_dir / image_file).stat().st_size
+            image_sizes.append(image_size)
+        shared_bytes = shared_asset_bytes(resource_path, fonts_dir)
+        size_target = next((target for target in targets if target != "site"), None)
+
+        # 크기로 나눌 때는 예상 크기로 나눈 뒤, 만든 EPUB이 크기를 넘으면
+        # 실제 크기로 본문 비율을 고쳐 다시 나눔
+        content_ratio = EPUB_CONTENT_RATIO
+        for attempt in range(1, VOLUME_PLAN_ATTEMPTS + 1):
+            chapter_sizes = [
+                int(html_size * content_ratio) + image_size
+                for html_size, image_size in zip(html_sizes, image_sizes)
+            ]
+            try:
+                ranges = plan_volumes(chapter_sizes, volume_options, shared_bytes)
+            except ValueError as e:
+                progress.message(f"권을 나눌 수 없습니다: {e}", "error")
+                return None
+            progress.message(f"챕터 {len(chapters)}개를 {len(ranges)}권으로 나눕니다.")
+
+            jobs = [
+                {
+                    "html_dir": str(workspace / f"pass_{attempt}" / f"volume_{index}"),
+                    "shared_dir": str(shared_dir),
+                    "resource_dir": str(resource_path),
+                    "metadata": volume_metadata(
+                        metadata, index, len(ranges), start, end
+                    ),
+                    "chapters": chapters[start:end],
+                    "image_map": {
+                        src: image_map[src]
+                        for sources in chapter_sources[start:end]
+                        for src in sources
+                        if src in image_map
+                    },
+                    "output_file": str(
+                        volume_output_path(output_file, index, len(ranges))
+                    ),
+                    "page_chars": page_chars,
+                    "toc_options": toc_options,
+                    "fonts_dir": fonts_dir,
+                    "targets": list(targets),
+                    "validate": validate,
+                    "reproducible": reproducible,
+                    "compression": compression,
+                }
+                for index, (start, end) in enumerate(ranges, 1)
+            ]
+            results = _build_volumes(jobs, ranges, chapter_sizes, workers, progress)
+            if volume_options.max_bytes is None or size_target is None:
+                break
+            if not all(results):
+                break
+
+            # 권별 EPUB 크기 (epub3, 없으면 epub2 파일)
+            volume_bytes = [
+                Path(target_output_path(job["output_file"], size_target))
+                .stat()
+                .st_size
+                for job in jobs
+            ]
+            oversized = [
+                (job, size, start, end)
+                for job, size, (start, end) in zip(jobs, volume_bytes, ranges)
+                if size > volume_options.max_bytes
+            ]
+            if not oversized or attempt == VOLUME_PLAN_ATTEMPTS:
+                for job, size, _, _ in oversized:
+                    progress.message(
+                        f"권 크기를 넘었습니다: {job['output_file']} ({size}바이트)",
+                        "warning",
+                    )
+                break
+
+            # 넘은 권 중 가장 큰 본문 비율(EPUB 크기 / 챕터 HTML 크기)로 다시 예상
+            content_ratio = VOLUME_SIZE_MARGIN * max(
+                (size - shared_bytes - sum(image_sizes[start:end]))
+                / max(sum(html_sizes[start:end]), 1)
+                for _, size, start, end in oversized
+            )
+            progress.message(
+                f"{len(oversized)}권이 크기를 넘어 다시 나눕니다. "
+                f"(본문 비율 {content_ratio:.2f})",
+                "warning",
+            )
+            remove_volume_outputs([job["output_file"] for job in jobs], targets)
+
+        if not all(results):
+            progress.message(
+                f"{len(results)}권 중 {results.count(None)}권을 만들지 못했습니다.", "error"
+            )
+            results = None
+    finally:
+        # 성공하면 작업 공간 삭제, 실패하면 원인을 살펴볼 수 있도록 남겨 둠
+        cleanup_workspace(workspace, keep_workspace or not results, progress)
+        record_build(time.perf_counter() - started, bool(results))
+
+    if not results:
+        return None
+    progress.message(f"EPUB {len(results)}권을 만들었습니다: " + ", ".join(results))
+    return results
+
+
+def add_volume_arguments(parser):
+    """
+    여러 권으로 나누기 옵션을 추가합니다.
+    """
+    parser.add_argument(
+        "--split-volumes",
+        type=parse_volume_size,
+        default=None,
+        help="원고를 여러 권의 EPUB으로 나눕니다. 권당 챕터 수(예: 500) 또는 "
+        "권당 크기(예: 80m). 출력은 <이름>-1.epub, <이름>-2.epub, ... "
+        "(10권 이상이면 <이름>-01.epub처럼 권 수의 자리수에 맞춰 0을 채움)",
+    )
+
+
+def volumes_from_args(args):
+    """
+    명령줄 옵션에서 VolumeOptions를 가져옵니다. 나누지 않으면 None을 반환합니다.
+    """
+    return args.split_volumes